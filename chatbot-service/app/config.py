@@ -5,7 +5,7 @@ This module handles all configuration settings including database connections,
 LLM provider settings, authentication, and service-specific configurations.
 """
 
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings
 import os
@@ -30,6 +30,90 @@ class DatabaseSettings(BaseSettings):
         default=20,
         description="Maximum database connection overflow"
     )
+    
+    # SQLite database files
+    sqlite_wal: bool = Field(
+        default=True,
+        description="Use WAL mode with a reader pool and a single writer connection"
+    )
+    sqlite_readers: int = Field(
+        default=4,
+        description="Read-only connections in WAL mode"
+    )
+    sqlite_synchronous: str = Field(
+        default="NORMAL",
+        description="SQLite synchronous pragma (NORMAL is durable across crashes of the process in WAL mode)"
+    )
+    sqlite_busy_timeout: int = Field(
+        default=5000,
+        description="Milliseconds to wait for a lock held by another process"
+    )
+    sqlite_cache_kib: int = Field(
+        default=64 * 1024,
+        description="Page cache size per connection in KiB"
+    )
+    sqlite_mmap_size: int = Field(
+        default=256 * 1024 * 1024,
+        description="Bytes of the database file to memory-map"
+    )
+    
+    # Read replicas
+    replica_urls: List[str] = Field(
+        default=[],
+        description="Read replica URLs serving read-only endpoints"
+    )
+    replica_max_lag: float = Field(
+        default=5.0,
+        description="Replication lag in seconds above which a replica is not used"
+    )
+    replica_check_interval: float = Field(
+        default=5.0,
+        description="Seconds between replica lag and health checks"
+    )
+    replica_read_your_writes: float = Field(
+        default=10.0,
+        description="Seconds a user's reads stay on the primary after their writes"
+    )
+    
+    # User-hash sharding of profiles, sessions and messages
+    shard_urls: List[str] = Field(
+        default=[],
+        description="Shard database URLs holding user data; DB_URL remains the user directory (append new shards at the end)"
+    )
+    shard_virtual_nodes: int = Field(
+        default=64,
+        description="Points per shard on the consistent hash ring"
+    )
+    shard_id_block_size: int = Field(
+        default=1000,
+        description="Row IDs reserved per allocation from the directory"
+    )
+    
+    # Write-behind persistence of assistant replies
+    write_behind: bool = Field(
+        default=False,
+        description="Commit assistant replies after the response is returned (a crash may lose unflushed replies)"
+    )
+    write_behind_queue_size: int = Field(
+        default=1000,
+        description="Maximum queued replies; submitting waits when the queue is full"
+    )
+    write_behind_batch_size: int = Field(
+        default=100,
+        description="Maximum replies committed per batch"
+    )
+    write_behind_flush_interval: float = Field(
+        default=0.05,
+        description="Maximum seconds a reply waits for its batch to fill"
+    )
+    write_behind_max_retries: int = Field(
+        default=3,
+        description="Retries of a failed write-behind batch before its replies are dropped"
+    )
+    write_behind_retry_delay: float = Field(
+        default=0.5,
+        description="Base delay in seconds between write-behind retries"
+    )
 
     class Config:
         env_prefix = "DB_"
@@ -43,10 +127,30 @@ class LLMSettings(BaseSettings):
         default="http://localhost:3001",
         description="AgentWatch proxy URL (intercepts LM Studio requests)"
     )
+    lm_studio_urls: List[str] = Field(
+        default=[],
+        description="LM Studio / OpenAI-compatible backend URLs to load-balance across (defaults to lm_studio_url)"
+    )
+    lm_studio_balancing: str = Field(
+        default="least_outstanding",
+        description="Backend selection strategy (least_outstanding, latency_weighted)"
+    )
+    lm_studio_session_affinity: bool = Field(
+        default=False,
+        description="Keep a conversation on the same backend to reuse its prompt cache"
+    )
     lm_studio_timeout: int = Field(
         default=30,
         description="LM Studio request timeout in seconds"
     )
+    lm_studio_http2: bool = Field(
+        default=False,
+        description="Use HTTP/2 for LM Studio (only if the server supports it)"
+    )
+    lm_studio_max_concurrency: int = Field(
+        default=4,
+        description="Maximum concurrent requests sent to LM Studio"
+    )
     
     # Azure OpenAI Configuration
     azure_openai_endpoint: Optional[str] = Field(
@@ -61,6 +165,144 @@ class LLMSettings(BaseSettings):
         default=None,
         description="Azure OpenAI deployment name"
     )
+    azure_openai_timeout: int = Field(
+        default=30,
+        description="Azure OpenAI request timeout in seconds"
+    )
+    azure_openai_http2: bool = Field(
+        default=True,
+        description="Use HTTP/2 for Azure OpenAI"
+    )
+    azure_openai_max_concurrency: int = Field(
+        default=32,
+        description="Maximum concurrent requests sent to Azure OpenAI"
+    )
+    
+    # HTTP Connection Pool Configuration (per provider)
+    http_max_connections: int = Field(
+        default=100,
+        description="Maximum number of pooled HTTP connections per provider"
+    )
+    http_max_keepalive_connections: int = Field(
+        default=20,
+        description="Maximum number of idle keep-alive connections per provider"
+    )
+    http_keepalive_expiry: float = Field(
+        default=30.0,
+        description="Seconds an idle keep-alive connection is kept open"
+    )
+    
+    # Backend Ejection (load balancing)
+    backend_eject_after_failures: int = Field(
+        default=3,
+        description="Consecutive failures before a backend is ejected"
+    )
+    backend_eject_duration: float = Field(
+        default=30.0,
+        description="Seconds an ejected backend is kept out of rotation"
+    )
+    
+    # Provider Health Checks
+    health_check_interval: float = Field(
+        default=15.0,
+        description="Seconds between background provider health checks"
+    )
+    health_check_timeout: float = Field(
+        default=5.0,
+        description="Provider health check timeout in seconds"
+    )
+    health_stale_after: float = Field(
+        default=60.0,
+        description="Seconds after which a cached provider health state is considered stale"
+    )
+    
+    # Admission Control (per provider)
+    max_queue_size: int = Field(
+        default=32,
+        description="Maximum requests waiting for a provider slot before rejecting with 429"
+    )
+    queue_timeout: float = Field(
+        default=10.0,
+        description="Seconds a request may wait for a provider slot before rejecting with 503"
+    )
+    
+    # Adaptive Concurrency (AIMD, starts from the per-provider max concurrency)
+    adaptive_concurrency: bool = Field(
+        default=True,
+        description="Tune the per-provider concurrency limit from observed latency and errors"
+    )
+    adaptive_min_concurrency: int = Field(
+        default=1,
+        description="Lower bound of the adaptive concurrency limit"
+    )
+    adaptive_max_concurrency: int = Field(
+        default=64,
+        description="Upper bound of the adaptive concurrency limit"
+    )
+    adaptive_latency_tolerance: float = Field(
+        default=2.0,
+        description="Latency ratio over the baseline that triggers a limit decrease"
+    )
+    adaptive_backoff_ratio: float = Field(
+        default=0.9,
+        description="Multiplier applied to the limit on congestion or errors"
+    )
+    
+    # Hedged Requests (profiles opt in with hedging_enabled)
+    hedge_default_delay: float = Field(
+        default=2.0,
+        description="Hedge delay in seconds until enough latency samples exist for a p95"
+    )
+    hedge_min_delay: float = Field(
+        default=0.1,
+        description="Lower bound of the p95-derived hedge delay in seconds"
+    )
+    hedge_min_samples: int = Field(
+        default=20,
+        description="Latency samples required before using the p95 as hedge delay"
+    )
+    
+    # Circuit Breaker (per provider)
+    circuit_failure_threshold: int = Field(
+        default=5,
+        description="Consecutive transient failures that open a provider's circuit"
+    )
+    circuit_recovery_timeout: float = Field(
+        default=30.0,
+        description="Seconds a circuit stays open before a half-open probe is allowed"
+    )
+    
+    # Retries (transient errors, bounded by a global retry budget)
+    retry_max_attempts: int = Field(
+        default=2,
+        description="Maximum retries per provider call"
+    )
+    retry_base_delay: float = Field(
+        default=0.2,
+        description="Base delay in seconds for jittered exponential backoff"
+    )
+    retry_max_delay: float = Field(
+        default=2.0,
+        description="Maximum backoff delay in seconds"
+    )
+    retry_budget_ratio: float = Field(
+        default=0.1,
+        description="Retries allowed per request, as a fraction of traffic"
+    )
+    retry_budget_min_per_second: float = Field(
+        default=1.0,
+        description="Retries per second always allowed regardless of traffic"
+    )
+    retry_budget_max_tokens: float = Field(
+        default=10.0,
+        description="Maximum retries that can be banked in the retry budget"
+    )
+    
+    # Request Coalescing
+    coalesce_requests: bool = Field(
+        default=True,
+        description="Share one upstream call between identical concurrent cacheable requests"
+    )
     
     # Default LLM Provider
     default_provider: str = Field(
@@ -137,6 +379,140 @@ class ServiceSettings(BaseSettings):
         default=100,
         description="Maximum chat history length per conversation"
     )
+    page_size: int = Field(
+        default=50,
+        description="Default number of messages or sessions per page"
+    )
+    max_page_size: int = Field(
+        default=200,
+        description="Maximum number of messages or sessions per page"
+    )
+    
+    # Context Window
+    context_window_tokens: int = Field(
+        default=4096,
+        description="Default model context window in tokens"
+    )
+    context_model_windows: Dict[str, int] = Field(
+        default_factory=dict,
+        description="Context window in tokens per model name, as JSON"
+    )
+    context_tokenizer: str = Field(
+        default="estimate",
+        description="Tokenizer used to count context tokens (estimate, tiktoken)"
+    )
+    context_tiktoken_encoding: str = Field(
+        default="cl100k_base",
+        description="tiktoken encoding used by the tiktoken tokenizer"
+    )
+    context_message_overhead: int = Field(
+        default=4,
+        description="Tokens added per message for role and formatting"
+    )
+    context_token_cache_size: int = Field(
+        default=50000,
+        description="Maximum number of cached per-message token counts"
+    )
+    
+    # Long-Term Memory (profiles opt in with memory_enabled)
+    memory_top_k: int = Field(
+        default=3,
+        description="Maximum older messages recalled by similarity per turn"
+    )
+    memory_min_score: float = Field(
+        default=0.2,
+        description="Minimum cosine similarity of a recalled message"
+    )
+    memory_token_budget: int = Field(
+        default=512,
+        description="Tokens of the context budget reserved for recalled messages"
+    )
+    memory_dim: int = Field(
+        default=512,
+        description="Dimension of the hashing vectorizer"
+    )
+    memory_max_vectors_per_session: int = Field(
+        default=2000,
+        description="Most recent messages indexed per session"
+    )
+    memory_max_bytes: int = Field(
+        default=64 * 1024 * 1024,
+        description="Maximum bytes held by in-memory session indexes"
+    )
+    
+    # Rolling Summarization (profiles opt in with summarization_enabled)
+    summary_keep_messages: int = Field(
+        default=20,
+        description="Most recent messages always sent verbatim, never summarized"
+    )
+    summary_min_batch: int = Field(
+        default=10,
+        description="Unsummarized older messages needed before the summary is updated"
+    )
+    summary_max_tokens: int = Field(
+        default=500,
+        description="Maximum tokens of a session summary"
+    )
+    history_cache_enabled: bool = Field(
+        default=True,
+        description="Cache recent history of active sessions in memory (single process only)"
+    )
+    history_cache_ttl: float = Field(
+        default=600.0,
+        description="Seconds an unused session history stays cached"
+    )
+    history_cache_max_bytes: int = Field(
+        default=32 * 1024 * 1024,
+        description="Maximum bytes held by cached session histories"
+    )
+    
+    # Cold Session Archival
+    archive_enabled: bool = Field(
+        default=False,
+        description="Move the messages of inactive sessions into compressed archive blocks"
+    )
+    archive_after_days: float = Field(
+        default=30.0,
+        description="Days without activity after which a session is archived"
+    )
+    archive_interval: float = Field(
+        default=3600.0,
+        description="Seconds between archival runs"
+    )
+    archive_batch_sessions: int = Field(
+        default=100,
+        description="Sessions selected per archival query"
+    )
+    archive_block_messages: int = Field(
+        default=100,
+        description="Messages compressed together per archive block"
+    )
+    archive_compression_level: int = Field(
+        default=6,
+        description="zlib compression level of archive blocks (1-9)"
+    )
+    
+    # Session Deletion and Retention
+    max_batch_delete: int = Field(
+        default=100,
+        description="Maximum sessions deleted per batch delete request"
+    )
+    retention_days: Optional[float] = Field(
+        default=None,
+        description="Days without activity after which a session is deleted (None keeps sessions)"
+    )
+    retention_interval: float = Field(
+        default=3600.0,
+        description="Seconds between retention purge runs"
+    )
+    retention_batch_sessions: int = Field(
+        default=100,
+        description="Expired sessions selected per retention query"
+    )
+    retention_batch_rows: int = Field(
+        default=1000,
+        description="Messages or archive blocks deleted per retention transaction"
+    )
 
     class Config:
         env_prefix = "SERVICE_"
@@ -158,6 +534,38 @@ class RedisSettings(BaseSettings):
         env_prefix = "REDIS_"
 
 
+class CacheSettings(BaseSettings):
+    """LLM response cache configuration settings."""
+    
+    enabled: bool = Field(
+        default=True,
+        description="Enable the exact-match LLM response cache"
+    )
+    backend: str = Field(
+        default="memory",
+        description="Cache backend (memory, redis)"
+    )
+    ttl: float = Field(
+        default=3600.0,
+        description="Cached response time-to-live in seconds"
+    )
+    max_entries: int = Field(
+        default=1000,
+        description="Maximum number of cached responses (memory backend)"
+    )
+    max_bytes: int = Field(
+        default=50 * 1024 * 1024,
+        description="Maximum size of cached responses in bytes (memory backend)"
+    )
+    max_temperature: float = Field(
+        default=0.3,
+        description="Only cache requests with a temperature at or below this value"
+    )
+
+    class Config:
+        env_prefix = "CACHE_"
+
+
 class Settings(BaseSettings):
     """Main application settings combining all configuration sections."""
     
@@ -183,6 +591,7 @@ class Settings(BaseSettings):
     security: SecuritySettings = SecuritySettings()
     service: ServiceSettings = ServiceSettings()
     redis: RedisSettings = RedisSettings()
+    cache: CacheSettings = CacheSettings()
     
     # Validation will be handled at runtime
 
@@ -0,0 +1,257 @@
+"""
+Prometheus metrics shared across the Chatbot Service.
+
+This module defines the metrics exported on the /metrics endpoint for
+LLM providers and other service components.
+"""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# LLM provider HTTP connection pools
+LLM_HTTP_POOL_CONNECTIONS = Gauge(
+    'llm_http_pool_connections',
+    'Pooled HTTP connections per LLM provider',
+    ['provider', 'state']
+)
+LLM_HTTP_POOL_MAX_CONNECTIONS = Gauge(
+    'llm_http_pool_max_connections',
+    'Configured maximum HTTP connections per LLM provider',
+    ['provider']
+)
+
+# LLM provider backends (load balancing)
+LLM_BACKEND_OUTSTANDING = Gauge(
+    'llm_backend_outstanding_requests',
+    'Requests in flight per LLM provider backend',
+    ['provider', 'backend']
+)
+LLM_BACKEND_HEALTHY = Gauge(
+    'llm_backend_eligible',
+    'Whether the LLM provider backend is healthy and not ejected',
+    ['provider', 'backend']
+)
+LLM_BACKEND_LATENCY = Gauge(
+    'llm_backend_latency_seconds',
+    'Latency moving average per LLM provider backend',
+    ['provider', 'backend']
+)
+
+# LLM provider health
+LLM_PROVIDER_AVAILABLE = Gauge(
+    'llm_provider_available',
+    'Whether the LLM provider passed its last health check',
+    ['provider']
+)
+LLM_PROVIDER_HEALTH_AGE = Gauge(
+    'llm_provider_health_age_seconds',
+    'Seconds since the last LLM provider health check',
+    ['provider']
+)
+
+# LLM request coalescing
+LLM_COALESCED_REQUESTS = Counter(
+    'llm_coalesced_requests_total',
+    'LLM requests served by joining an identical in-flight request',
+    ['provider']
+)
+
+# LLM admission control
+LLM_ADMISSION_IN_FLIGHT = Gauge(
+    'llm_admission_in_flight',
+    'LLM requests holding an admission slot',
+    ['provider']
+)
+LLM_ADMISSION_QUEUE_DEPTH = Gauge(
+    'llm_admission_queue_depth',
+    'LLM requests waiting for an admission slot',
+    ['provider']
+)
+LLM_ADMISSION_WAIT = Histogram(
+    'llm_admission_wait_seconds',
+    'Time LLM requests waited for an admission slot',
+    ['provider']
+)
+LLM_ADMISSION_REJECTED = Counter(
+    'llm_admission_rejected_total',
+    'LLM requests rejected by admission control',
+    ['provider', 'reason']
+)
+LLM_ADAPTIVE_LIMIT = Gauge(
+    'llm_adaptive_concurrency_limit',
+    'Current adaptive concurrency limit per LLM provider',
+    ['provider']
+)
+LLM_ADAPTIVE_LIMIT_DECISIONS = Counter(
+    'llm_adaptive_concurrency_decisions_total',
+    'Adaptive concurrency limit decisions per LLM provider',
+    ['provider', 'decision']
+)
+
+# LLM failover and hedging
+LLM_FAILOVERS = Counter(
+    'llm_failovers_total',
+    'LLM requests that failed on a provider and moved to the next one in the chain',
+    ['provider']
+)
+LLM_HEDGED_REQUESTS = Counter(
+    'llm_hedged_requests_total',
+    'LLM requests hedged because the provider exceeded its p95 latency',
+    ['provider']
+)
+
+# LLM circuit breakers and retries
+LLM_CIRCUIT_STATE = Gauge(
+    'llm_circuit_state',
+    'Circuit breaker state per LLM provider (0=closed, 1=half-open, 2=open)',
+    ['provider']
+)
+LLM_CIRCUIT_TRANSITIONS = Counter(
+    'llm_circuit_transitions_total',
+    'Circuit breaker state transitions per LLM provider',
+    ['provider', 'state']
+)
+LLM_RETRIES = Counter(
+    'llm_retries_total',
+    'Retried LLM provider calls',
+    ['provider']
+)
+LLM_RETRY_BUDGET_EXHAUSTED = Counter(
+    'llm_retry_budget_exhausted_total',
+    'Retries skipped because the global retry budget was exhausted'
+)
+
+# LLM streaming
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    'llm_time_to_first_token_seconds',
+    'Time from request to first streamed token per LLM provider',
+    ['provider']
+)
+
+# LLM response cache
+LLM_CACHE_REQUESTS = Counter(
+    'llm_cache_requests_total',
+    'LLM response cache lookups',
+    ['result']
+)
+LLM_CACHE_EVICTIONS = Counter(
+    'llm_cache_evictions_total',
+    'LLM response cache evictions',
+    ['reason']
+)
+LLM_CACHE_ENTRIES = Gauge(
+    'llm_cache_entries',
+    'Entries held by the in-process LLM response cache'
+)
+LLM_CACHE_BYTES = Gauge(
+    'llm_cache_bytes',
+    'Bytes held by the in-process LLM response cache'
+)
+
+# Chat context window
+CHAT_CONTEXT_TOKENS = Histogram(
+    'chat_context_tokens',
+    'Tokens of system prompt and history sent to the LLM per chat turn',
+    buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072)
+)
+CHAT_CONTEXT_MESSAGES_DROPPED = Counter(
+    'chat_context_messages_dropped_total',
+    'History messages left out of the context window to fit the token budget'
+)
+CHAT_SUMMARY_UPDATES = Counter(
+    'chat_summary_updates_total',
+    'Background session summary updates',
+    ['result']
+)
+
+# Chat long-term memory
+CHAT_MEMORY_INDEX_SESSIONS = Gauge(
+    'chat_memory_index_sessions',
+    'Session vector indexes held in memory'
+)
+CHAT_MEMORY_INDEX_BYTES = Gauge(
+    'chat_memory_index_bytes',
+    'Bytes held by in-memory session vector indexes'
+)
+CHAT_MEMORY_RECALLED = Counter(
+    'chat_memory_recalled_total',
+    'Older messages recalled into the context by similarity'
+)
+
+# Chat history cache
+CHAT_HISTORY_CACHE_REQUESTS = Counter(
+    'chat_history_cache_requests_total',
+    'Session history cache lookups',
+    ['result']
+)
+CHAT_HISTORY_CACHE_SESSIONS = Gauge(
+    'chat_history_cache_sessions',
+    'Session histories held in memory'
+)
+CHAT_HISTORY_CACHE_BYTES = Gauge(
+    'chat_history_cache_bytes',
+    'Bytes held by cached session histories'
+)
+
+# Chat session archive
+CHAT_ARCHIVE_SESSIONS = Counter(
+    'chat_archive_sessions_total',
+    'Sessions moved into or restored from the message archive',
+    ['operation']
+)
+CHAT_ARCHIVE_BYTES = Counter(
+    'chat_archive_bytes_total',
+    'Bytes of archived messages before and after compression',
+    ['kind']
+)
+CHAT_ARCHIVE_READ_LATENCY = Histogram(
+    'chat_archive_read_seconds',
+    'Time to read a page of archived history'
+)
+
+# Chat session deletion
+CHAT_SESSIONS_DELETED = Counter(
+    'chat_sessions_deleted_total',
+    'Chat sessions deleted by users or by the retention purge',
+    ['reason']
+)
+CHAT_ROWS_PURGED = Counter(
+    'chat_rows_purged_total',
+    'Rows of expired sessions deleted by the retention purge',
+    ['table']
+)
+
+# Write-behind message persistence
+WRITE_BEHIND_QUEUE_DEPTH = Gauge(
+    'write_behind_queue_depth',
+    'Assistant messages waiting in the write-behind queue'
+)
+WRITE_BEHIND_BATCH_SIZE = Histogram(
+    'write_behind_batch_size',
+    'Assistant messages committed per write-behind batch',
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+WRITE_BEHIND_LAG = Histogram(
+    'write_behind_lag_seconds',
+    'Time from queuing an assistant message to its commit'
+)
+WRITE_BEHIND_DROPPED = Counter(
+    'write_behind_dropped_total',
+    'Assistant messages dropped after repeated write-behind failures'
+)
+
+# Database read replicas
+DB_REPLICA_HEALTHY = Gauge(
+    'db_replica_healthy',
+    'Whether the read replica is in rotation',
+    ['replica']
+)
+DB_REPLICA_LAG = Gauge(
+    'db_replica_lag_seconds',
+    'Replication lag measured on the read replica',
+    ['replica']
+)
+DB_READS_ROUTED = Counter(
+    'db_reads_routed_total',
+    'Read-only queries by the database serving them',
+    ['target', 'reason']
+)
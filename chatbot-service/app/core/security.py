@@ -11,9 +11,10 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import get_settings
-from app.database.session import get_db
+from app.database.session import AsyncSessionLocal, get_read_db, use_user_shard
 from app.models.user import User
 
 # Get settings
@@ -94,7 +95,7 @@ def verify_token(token: str) -> Optional[dict]:
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> User:
     """
     Get the current authenticated user.
@@ -127,20 +128,44 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.username == username).first()
+    user = await get_user_by_username(db, username)
+    if user is None and "replica" in db.info:
+        # A new user may not have reached the replica yet
+        async with AsyncSessionLocal() as primary_db:
+            user = await get_user_by_username(primary_db, username)
     if user is None:
         raise credentials_exception
     
+    # Keep this user's reads on the primary right after their writes
+    db.info["user_id"] = user.id
+    
     if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Inactive user"
         )
     
+    # Route the user's profiles, sessions and messages to their shard
+    await use_user_shard(user)
     return user
 
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
+    """
+    Get a user by username.
+    
+    Args:
+        db: Database session
+        username: Username
+        
+    Returns:
+        Optional[User]: User or None if not found
+    """
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
+
+
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[User]:
     """
     Authenticate a user with username and password.
     
@@ -152,9 +177,35 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[Use
     Returns:
         Optional[User]: Authenticated user or None if authentication fails
     """
-    user = db.query(User).filter(User.username == username).first()
+    user = await get_user_by_username(db, username)
     if not user:
         return None
     if not verify_password(password, user.hashed_password):
         return None
-    return user 
\ No newline at end of file
+    return user
+
+
+async def authenticate_token(db: AsyncSession, token: str) -> Optional[User]:
+    """
+    Authenticate a user with a JWT access token.
+    
+    Args:
+        db: Database session
+        token: JWT access token
+        
+    Returns:
+        Optional[User]: Active authenticated user or None if authentication fails
+    """
+    payload = verify_token(token)
+    if payload is None:
+        return None
+    
+    username = payload.get("sub")
+    if username is None:
+        return None
+    
+    user = await get_user_by_username(db, username)
+    if not user or not user.is_active:
+        return None
+    await use_user_shard(user)
+    return user
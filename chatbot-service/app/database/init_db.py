@@ -8,7 +8,8 @@ and sample data seeding for development and testing.
 import uuid
 from sqlalchemy.orm import Session
 from app.models import User, Profile, Session as ChatSession
-from app.core.security import get_password_hash
+from app.database.session import shard_engines, shard_ring
+from app.database.sharding import copy_rows
 
 
 def init_db(db: Session) -> None:
@@ -17,11 +18,14 @@ def init_db(db: Session) -> None:
     
     Args:
         db: Database session
-        
+    
     Note:
         This function creates sample users and profiles for development.
         It should not be used in production.
     """
+    # Imported here to avoid a circular import: app.core.security needs app.database
+    from app.core.security import get_password_hash
+    
     # Create sample user
     user = db.query(User).filter(User.username == "demo_user").first()
     if not user:
@@ -35,6 +39,15 @@ def init_db(db: Session) -> None:
         db.commit()
         db.refresh(user)
     
+    # Place a new demo user on their shard, and create the profiles there
+    if shard_ring is not None:
+        if user.shard is None and not db.query(Profile).filter(Profile.user_id == user.id).first():
+            user.shard = shard_ring.shard_for(user.id)
+            with shard_engines[user.shard].begin() as connection:
+                copy_rows(connection, User.__table__, [user.to_dict()])
+            db.commit()
+        db.info["shard"] = user.shard
+    
     # Create sample profiles
     profiles_data = [
         {
@@ -94,7 +107,7 @@ def create_sample_session(db: Session, user_id: int, profile_id: int) -> ChatSes
         db: Database session
         user_id: User ID
         profile_id: Profile ID
-        
+    
     Returns:
         ChatSession: Created session
     """
@@ -0,0 +1,54 @@
+"""
+Database schema migrations.
+
+This module applies the Alembic migrations in app/database/migrations at
+startup, so schema changes such as new indexes reach existing databases
+(the directory and every shard).
+"""
+
+from pathlib import Path
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+from app.database.session import engine, shard_engines
+
+# Revision matching the schema created by create_tables() before migrations
+BASELINE_REVISION = "0001"
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+
+
+def get_alembic_config() -> Config:
+    """Get an Alembic configuration for the application's migrations."""
+    config = Config()
+    config.set_main_option("script_location", str(MIGRATIONS_DIR))
+    return config
+
+
+def run_migrations() -> None:
+    """
+    Upgrade the database schema to the latest revision.
+    
+    Databases created by create_tables() before migrations existed have no
+    revision recorded; they are stamped with the baseline revision first.
+    """
+    config = get_alembic_config()
+    for database_engine in [engine, *shard_engines.values()]:
+        with database_engine.connect() as connection:
+            # SQLite batch migrations recreate tables, which must not
+            # cascade deletes to the rows referencing them
+            sqlite = connection.dialect.name == "sqlite"
+            if sqlite:
+                connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+                connection.commit()
+            try:
+                with connection.begin():
+                    config.attributes["connection"] = connection
+                    tables = inspect(connection).get_table_names()
+                    if "users" in tables and "alembic_version" not in tables:
+                        command.stamp(config, BASELINE_REVISION)
+                    command.upgrade(config, "head")
+            finally:
+                if sqlite:
+                    connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+                    connection.commit()
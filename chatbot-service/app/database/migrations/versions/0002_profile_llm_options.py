@@ -0,0 +1,38 @@
+"""Add profile LLM routing, caching and context options
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('profiles') as batch_op:
+        batch_op.add_column(sa.Column('fallback_providers', sa.String(length=200), nullable=True))
+        batch_op.add_column(sa.Column('hedging_enabled', sa.Boolean(), nullable=True))
+        batch_op.add_column(sa.Column('context_token_budget', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('summarization_enabled', sa.Boolean(), nullable=True))
+        batch_op.add_column(sa.Column('memory_enabled', sa.Boolean(), nullable=True))
+        batch_op.add_column(sa.Column('response_cache_enabled', sa.Boolean(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('profiles') as batch_op:
+        batch_op.drop_column('response_cache_enabled')
+        batch_op.drop_column('memory_enabled')
+        batch_op.drop_column('summarization_enabled')
+        batch_op.drop_column('context_token_budget')
+        batch_op.drop_column('hedging_enabled')
+        batch_op.drop_column('fallback_providers')
@@ -0,0 +1,30 @@
+"""Add composite indexes for hot query shapes
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_messages_session_id_created_at', 'messages', ['session_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_sessions_user_id_last_activity', 'sessions', ['user_id', 'last_activity'], unique=False)
+    op.create_index('ix_profiles_user_id_is_default', 'profiles', ['user_id', 'is_default'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_profiles_user_id_is_default', table_name='profiles')
+    op.drop_index('ix_sessions_user_id_last_activity', table_name='sessions')
+    op.drop_index('ix_messages_session_id_created_at', table_name='messages')
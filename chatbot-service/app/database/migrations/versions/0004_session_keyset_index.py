@@ -0,0 +1,28 @@
+"""Add the session id to the sessions activity index for keyset paging
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_index('ix_sessions_user_id_last_activity', table_name='sessions')
+    op.create_index('ix_sessions_user_id_last_activity_id', 'sessions', ['user_id', 'last_activity', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sessions_user_id_last_activity_id', table_name='sessions')
+    op.create_index('ix_sessions_user_id_last_activity', 'sessions', ['user_id', 'last_activity'], unique=False)
@@ -0,0 +1,52 @@
+"""Add user shard placement and cross-shard ID blocks
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16 00:00:00
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('shard', sa.String(length=50), nullable=True))
+    
+    op.create_table('id_blocks',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('next_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    # Reservations start above the rows already in the directory
+    op.bulk_insert(
+        sa.table(
+            'id_blocks',
+            sa.column('name', sa.String),
+            sa.column('next_id', sa.Integer),
+            sa.column('created_at', sa.DateTime),
+            sa.column('updated_at', sa.DateTime)
+        ),
+        [
+            {'name': table, 'next_id': 1, 'created_at': datetime.utcnow(), 'updated_at': datetime.utcnow()}
+            for table in ('profiles', 'sessions', 'messages')
+        ]
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('id_blocks')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('shard')
@@ -0,0 +1,63 @@
+"""Add compressed message archives of cold sessions
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-16 00:00:00
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('sessions') as batch_op:
+        batch_op.add_column(sa.Column('archived_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_sessions_archived_at_last_activity', 'sessions', ['archived_at', 'last_activity'], unique=False)
+    
+    op.create_table('message_archives',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('first_created_at', sa.DateTime(), nullable=False),
+    sa.Column('first_message_id', sa.Integer(), nullable=False),
+    sa.Column('last_created_at', sa.DateTime(), nullable=False),
+    sa.Column('last_message_id', sa.Integer(), nullable=False),
+    sa.Column('message_count', sa.Integer(), nullable=False),
+    sa.Column('raw_size', sa.Integer(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['session_id'], ['sessions.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_message_archives_session_id_first', 'message_archives', ['session_id', 'first_created_at', 'first_message_id'], unique=False)
+    
+    # Archive blocks are sharded like the messages they hold
+    op.bulk_insert(
+        sa.table(
+            'id_blocks',
+            sa.column('name', sa.String),
+            sa.column('next_id', sa.Integer),
+            sa.column('created_at', sa.DateTime),
+            sa.column('updated_at', sa.DateTime)
+        ),
+        [{'name': 'message_archives', 'next_id': 1, 'created_at': datetime.utcnow(), 'updated_at': datetime.utcnow()}]
+    )
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM id_blocks WHERE name = 'message_archives'")
+    op.drop_index('ix_message_archives_session_id_first', table_name='message_archives')
+    op.drop_table('message_archives')
+    op.drop_index('ix_sessions_archived_at_last_activity', table_name='sessions')
+    with op.batch_alter_table('sessions') as batch_op:
+        batch_op.drop_column('archived_at')
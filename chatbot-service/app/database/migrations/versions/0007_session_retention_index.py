@@ -0,0 +1,25 @@
+"""Add an index of sessions by last activity for the retention purge
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-16 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_sessions_last_activity_id', 'sessions', ['last_activity', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sessions_last_activity_id', table_name='sessions')
@@ -0,0 +1,37 @@
+"""Add the heartbeat row used to measure read replica lag
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-16 00:00:00
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    heartbeats = op.create_table('replica_heartbeats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('beat_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(
+        heartbeats,
+        [{'id': 1, 'beat_at': datetime.utcnow(), 'created_at': datetime.utcnow(), 'updated_at': datetime.utcnow()}]
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('replica_heartbeats')
@@ -0,0 +1,235 @@
+"""
+Online rebalancing of users across database shards.
+
+This module moves users whose data is not on the shard the hash ring
+assigns them, such as after shards are added or when sharding is enabled
+on an existing database, while the service keeps running:
+
+    python -m app.database.rebalance [--dry-run] [--grace SECONDS]
+"""
+
+import argparse
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import Table, bindparam, delete, select, update
+from sqlalchemy.engine import Connection, Engine
+from app.database.migrate import run_migrations
+from app.database.session import engine, id_allocator, shard_engines, shard_ring
+from app.database.sharding import copy_rows
+from app.models import Message, MessageArchive, Profile, Session as ChatSession, User
+
+# Rows read and written per statement
+BATCH_SIZE = 500
+
+# User data tables, in foreign key order
+PROFILES = Profile.__table__
+SESSIONS = ChatSession.__table__
+MESSAGES = Message.__table__
+ARCHIVES = MessageArchive.__table__
+
+# Foreign keys of the user data tables to other user data tables
+PARENTS = {
+    SESSIONS.name: [(SESSIONS.c.profile_id, PROFILES)],
+    MESSAGES.name: [(MESSAGES.c.session_id, SESSIONS), (MESSAGES.c.profile_id, PROFILES)],
+    ARCHIVES.name: [(ARCHIVES.c.session_id, SESSIONS)],
+}
+
+# A user to move: ID, source shard (None for the directory) and target shard
+Move = Tuple[int, Optional[str], str]
+
+
+def get_moves() -> List[Move]:
+    """Get the users whose data is not on the shard the hash ring assigns them."""
+    with engine.connect() as connection:
+        users = connection.execute(select(User.id, User.shard).order_by(User.id)).all()
+    return [
+        (user_id, shard, shard_ring.shard_for(user_id))
+        for user_id, shard in users
+        if shard != shard_ring.shard_for(user_id)
+    ]
+
+
+def get_engine(shard: Optional[str]) -> Engine:
+    """Get the engine of a shard, or of the directory for None."""
+    return engine if shard is None else shard_engines[shard]
+
+
+def iter_rows(connection: Connection, table: Table, *conditions: Any) -> Iterator[List[Dict[str, Any]]]:
+    """Read matching rows in batches, in ID order."""
+    last_id = 0
+    while True:
+        rows = [dict(row) for row in connection.execute(
+            select(table).where(*conditions, table.c.id > last_id).order_by(table.c.id).limit(BATCH_SIZE)
+        ).mappings()]
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]["id"]
+
+
+def user_conditions(user_id: int) -> List[Tuple[Table, Tuple[Any, ...]]]:
+    """Get the user data tables with the conditions selecting a user's rows."""
+    session_ids = select(SESSIONS.c.id).where(SESSIONS.c.user_id == user_id)
+    return [
+        (PROFILES, (PROFILES.c.user_id == user_id,)),
+        (SESSIONS, (SESSIONS.c.user_id == user_id,)),
+        (MESSAGES, (MESSAGES.c.session_id.in_(session_ids),)),
+        (ARCHIVES, (ARCHIVES.c.session_id.in_(session_ids),)),
+    ]
+
+
+def refresh_rows(connection: Connection, table: Table, rows: List[Dict[str, Any]]) -> int:
+    """Overwrite rows on a database with the given rows where those were updated later."""
+    statement = update(table).where(
+        table.c.id == bindparam("_id"),
+        table.c.updated_at < bindparam("_updated_at")
+    )
+    result = connection.execute(statement, [
+        {**row, "_id": row["id"], "_updated_at": row["updated_at"]}
+        for row in rows
+    ])
+    return max(result.rowcount, 0)
+
+
+def drop_orphans(connection: Connection, table: Table, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop the rows whose parent rows no longer exist on a database."""
+    for column, parent in PARENTS.get(table.name, []):
+        parent_ids = {row[column.name] for row in rows if row[column.name] is not None}
+        existing = set(connection.scalars(select(parent.c.id).where(parent.c.id.in_(parent_ids))))
+        rows = [row for row in rows if row[column.name] is None or row[column.name] in existing]
+    return rows
+
+
+def copy_user(
+    move: Move,
+    user_row: Dict[str, Any],
+    copied_ids: Dict[str, Set[int]],
+    catch_up: bool = False
+) -> Dict[str, int]:
+    """
+    Copy a user's rows from the source database to the target shard, keeping their IDs.
+    
+    The first copy records the IDs of the rows it read. The catch-up only
+    inserts rows created on the source since then, and updates the target
+    rows the source has newer versions of: rows the target no longer has,
+    such as sessions the user deleted or messages moved into archive
+    blocks, are never inserted again.
+    
+    Args:
+        move: User to move
+        user_row: User's row in the directory, copied for foreign keys
+        copied_ids: IDs read by the first copy per table, filled by the first copy
+        catch_up: Whether this is the catch-up after the grace period
+    
+    Returns:
+        Dict[str, int]: Rows inserted or updated per table
+    """
+    user_id, source, target = move
+    copied = {}
+    with get_engine(source).connect() as source_connection:
+        with get_engine(target).begin() as target_connection:
+            copy_rows(target_connection, User.__table__, [user_row])
+        
+        for table, conditions in user_conditions(user_id):
+            copied[table.name] = 0
+            seen = copied_ids.setdefault(table.name, set())
+            for rows in iter_rows(source_connection, table, *conditions):
+                with get_engine(target).begin() as target_connection:
+                    if catch_up:
+                        copied[table.name] += refresh_rows(target_connection, table, rows)
+                        rows = drop_orphans(
+                            target_connection, table, [row for row in rows if row["id"] not in seen]
+                        )
+                    else:
+                        seen.update(row["id"] for row in rows)
+                    copied[table.name] += copy_rows(target_connection, table, rows)
+    return copied
+
+
+def delete_user(move: Move) -> None:
+    """Delete a moved user's rows from the source database, in reverse foreign key order."""
+    user_id, source, _ = move
+    with get_engine(source).begin() as connection:
+        for table, conditions in reversed(user_conditions(user_id)):
+            connection.execute(delete(table).where(*conditions))
+        if source is not None:
+            connection.execute(delete(User.__table__).where(User.id == user_id))
+
+
+def rebalance(dry_run: bool, grace: float) -> None:
+    """
+    Move users onto the shards the hash ring assigns them.
+    
+    Each user's rows are copied to the target shard and the user's shard is
+    switched in the directory, so new requests use the target. After the
+    grace period, rows created or updated on the source by requests that
+    started before the switch are copied as well, unless their session was
+    deleted on the target meanwhile, and the source rows are deleted. The grace period must exceed the longest request and the
+    replication lag of any read replica of the directory, and every service
+    process must already be configured with all shards.
+    
+    Args:
+        dry_run: Only print the users that would be moved
+        grace: Seconds to wait between switching and deleting the source rows
+    """
+    moves = get_moves()
+    print(f"{len(moves)} users to move")
+    if dry_run:
+        for user_id, source, target in moves:
+            print(f"User {user_id}: {source or 'directory'} -> {target}")
+        return
+    
+    with engine.connect() as connection:
+        user_rows = {
+            row["id"]: dict(row)
+            for row in connection.execute(select(User.__table__)).mappings()
+        }
+    
+    # Later IDs must stay above those of the rows leaving the directory
+    id_allocator.reserve_all()
+    
+    switched = []
+    copied_ids: Dict[int, Dict[str, Set[int]]] = {}
+    for move in moves:
+        user_id, source, target = move
+        copied_ids[user_id] = {}
+        copied = copy_user(move, user_rows[user_id], copied_ids[user_id])
+        with engine.begin() as connection:
+            current = User.shard.is_(None) if source is None else User.shard == source
+            result = connection.execute(
+                update(User).where(User.id == user_id, current).values(shard=target)
+            )
+        if result.rowcount == 1:
+            switched.append(move)
+            print(f"User {user_id}: {source or 'directory'} -> {target}, copied {copied}")
+        else:
+            print(f"User {user_id}: moved concurrently, skipped")
+    
+    if not switched:
+        return
+    print(f"Waiting {grace:g}s for requests in flight")
+    time.sleep(grace)
+    
+    for move in switched:
+        copied = copy_user(move, user_rows[move[0]], copied_ids[move[0]], catch_up=True)
+        delete_user(move)
+        print(f"User {move[0]}: caught up {copied}, source rows deleted")
+
+
+def main() -> None:
+    """Run the rebalance tool from the command line."""
+    parser = argparse.ArgumentParser(description="Move users onto the shards the hash ring assigns them")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the users to move")
+    parser.add_argument("--grace", type=float, default=30.0, help="Seconds before source rows are deleted")
+    args = parser.parse_args()
+    
+    if shard_ring is None:
+        parser.error("No shards configured (DB_SHARD_URLS)")
+    
+    # New shards get their schema before rows are copied to them
+    run_migrations()
+    rebalance(dry_run=args.dry_run, grace=args.grace)
+
+
+if __name__ == "__main__":
+    main()
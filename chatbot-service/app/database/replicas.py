@@ -0,0 +1,222 @@
+"""
+Read replica routing for read-only database sessions.
+
+This module spreads the reads of read-only endpoints over replica
+databases, keeps a user's reads on the primary right after their own
+writes, and takes replicas that lag or fail out of rotation.
+"""
+
+import asyncio
+import itertools
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, List, Optional
+from sqlalchemy import select, text, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+import structlog
+from app.core.metrics import DB_REPLICA_HEALTHY, DB_REPLICA_LAG, DB_READS_ROUTED
+from app.models.replica_heartbeat import ReplicaHeartbeat
+
+logger = structlog.get_logger(__name__)
+
+# Replication lag in seconds per database backend; 0 when fully replayed.
+# Other backends are measured by the age of their heartbeat row.
+LAG_QUERIES = {
+    "postgresql": (
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+    ),
+}
+
+
+class Replica:
+    """A single read replica database."""
+    
+    def __init__(self, name: str, engine: AsyncEngine):
+        self.name = name
+        self.engine = engine
+        self.healthy = True
+        self.lag: Optional[float] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the replica state to a dictionary."""
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "lag": self.lag
+        }
+
+
+class ReplicaRouter:
+    """
+    Router of read-only sessions over read replicas.
+    
+    Replicas are used round-robin while healthy. A background check measures
+    each replica's lag every ``check_interval`` seconds and takes it out of
+    rotation while the lag exceeds ``max_lag`` or the check fails; a replica
+    that fails a query is also taken out until the next check, and the
+    query is retried on the primary. Reads then fall back to the primary.
+    
+    Each check first writes a heartbeat row on the primary; on backends
+    without a lag query, a replica's lag is the time since the first
+    heartbeat it has not replayed. A replica that has replayed all but the
+    heartbeat just written thus measures the time since that write, not
+    the heartbeat period.
+    
+    For ``read_your_writes`` seconds after a user's write is committed,
+    their reads go to the primary. Writes are only seen by this process.
+    """
+    
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        engines: List[AsyncEngine],
+        max_lag: float,
+        check_interval: float,
+        read_your_writes: float
+    ):
+        self.primary = primary
+        self.replicas = [Replica(str(index), engine) for index, engine in enumerate(engines)]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.read_your_writes = read_your_writes
+        self._next = itertools.count()
+        self._beats: Deque[datetime] = deque(maxlen=32)
+        self._last_write: "OrderedDict[int, float]" = OrderedDict()
+        self._checker: Optional[asyncio.Task] = None
+        for replica in self.replicas:
+            self._update_gauges(replica)
+    
+    def choose(self, user_id: Optional[int] = None) -> Optional[Replica]:
+        """
+        Choose the replica to read from.
+        
+        Args:
+            user_id: ID of the user the reads are for, if known
+        
+        Returns:
+            Optional[Replica]: Healthy replica, or None to read from the primary
+        """
+        if user_id is not None and user_id in self._last_write:
+            if time.monotonic() - self._last_write[user_id] < self.read_your_writes:
+                DB_READS_ROUTED.labels(target="primary", reason="read_your_writes").inc()
+                return None
+        
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            DB_READS_ROUTED.labels(target="primary", reason="no_replica").inc()
+            return None
+        DB_READS_ROUTED.labels(target="replica", reason="healthy").inc()
+        return healthy[next(self._next) % len(healthy)]
+    
+    def record_writes(self, user_ids: Iterable[int]) -> None:
+        """Record committed writes of users, so their reads go to the primary."""
+        now = time.monotonic()
+        for user_id in user_ids:
+            self._last_write[user_id] = now
+            self._last_write.move_to_end(user_id)
+        
+        # Entries are ordered by write time; drop the expired ones
+        while self._last_write:
+            user_id, written_at = next(iter(self._last_write.items()))
+            if now - written_at < self.read_your_writes:
+                break
+            del self._last_write[user_id]
+    
+    def mark_failed(self, name: str) -> None:
+        """Take a replica out of rotation until its next successful check."""
+        for replica in self.replicas:
+            if replica.name == name and replica.healthy:
+                logger.warning("Database replica failed, reading from the primary", replica=name)
+                replica.healthy = False
+                self._update_gauges(replica)
+    
+    def start(self) -> None:
+        """Start the background replica checks."""
+        if self._checker is None or self._checker.done():
+            self._checker = asyncio.create_task(self._run())
+    
+    async def shutdown(self) -> None:
+        """Stop the background replica checks."""
+        if self._checker is not None:
+            self._checker.cancel()
+            await asyncio.gather(self._checker, return_exceptions=True)
+            self._checker = None
+    
+    def status(self) -> List[Dict[str, Any]]:
+        """Get the state of all replicas."""
+        return [replica.to_dict() for replica in self.replicas]
+    
+    async def check(self) -> None:
+        """Write a heartbeat on the primary, then check all replicas."""
+        await self._beat()
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+    
+    async def _run(self) -> None:
+        """Check the replicas periodically."""
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
+    
+    async def _beat(self) -> None:
+        """Write the heartbeat row on the primary."""
+        beat_at = datetime.utcnow()
+        try:
+            async with self.primary.begin() as connection:
+                await connection.execute(
+                    update(ReplicaHeartbeat).where(ReplicaHeartbeat.id == 1).values(beat_at=beat_at)
+                )
+            self._beats.append(beat_at)
+        except Exception as e:
+            logger.warning("Database replica heartbeat failed", error=str(e))
+    
+    async def _check(self, replica: Replica) -> None:
+        """Measure the lag of a replica and update its health."""
+        query = LAG_QUERIES.get(replica.engine.dialect.name)
+        try:
+            async with replica.engine.connect() as connection:
+                if query is not None:
+                    lag = float(await connection.scalar(text(query)) or 0)
+                else:
+                    beat_at = await connection.scalar(
+                        select(ReplicaHeartbeat.beat_at).where(ReplicaHeartbeat.id == 1)
+                    )
+                    if beat_at is None:
+                        raise RuntimeError("no heartbeat row")
+                    lag = self._lag_since(beat_at)
+            replica.lag = lag
+            healthy = replica.lag <= self.max_lag
+        except Exception as e:
+            logger.warning("Database replica check failed", replica=replica.name, error=str(e))
+            replica.lag = None
+            healthy = False
+        
+        if healthy != replica.healthy:
+            if healthy:
+                logger.info("Database replica back in rotation", replica=replica.name, lag=replica.lag)
+            else:
+                logger.warning("Database replica out of rotation", replica=replica.name, lag=replica.lag)
+        replica.healthy = healthy
+        self._update_gauges(replica)
+    
+    def _lag_since(self, seen: datetime) -> float:
+        """
+        Estimate the lag of a replica from the last heartbeat it replayed.
+        
+        The replica lacks every later heartbeat, so it is at least as old as
+        the first of those this process wrote, and, with a heartbeat written
+        every ``check_interval`` seconds, as the next one after ``seen``.
+        """
+        now = datetime.utcnow()
+        lag = (now - seen).total_seconds() - self.check_interval
+        missed = next((beat for beat in self._beats if beat > seen), None)
+        if missed is not None:
+            lag = max(lag, (now - missed).total_seconds())
+        return max(lag, 0.0)
+    
+    def _update_gauges(self, replica: Replica) -> None:
+        """Update Prometheus gauges with a replica's state."""
+        DB_REPLICA_HEALTHY.labels(replica=replica.name).set(1 if replica.healthy else 0)
+        if replica.lag is not None:
+            DB_REPLICA_LAG.labels(replica=replica.name).set(replica.lag)
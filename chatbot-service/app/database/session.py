@@ -2,56 +2,542 @@
 Database session management and configuration.
 
 This module handles database connection setup, session creation,
-and connection pooling for the chatbot service.
+and connection pooling for the chatbot service. Request handlers use the
+async engine (aiosqlite for SQLite, asyncpg for PostgreSQL); the sync
+engine is kept for schema creation, seeding and scripts.
+
+SQLite database files run in WAL mode with a pool of read-only connections
+and a single writer connection, so reads proceed concurrently with a write.
+Read-only endpoints can be served by read replicas (DB_REPLICA_URLS).
+
+With shards configured (DB_SHARD_URLS), DB_URL is the user directory and
+each user's profiles, sessions and messages live on the shard recorded in
+``users.shard``; sessions route them to the shard of the current user.
 """
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import StaticPool
+import itertools
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterable, Optional, Tuple, Union
+from sqlalchemy import Select, create_engine, event, select, update
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 from app.config import get_settings
+from app.database.sharding import SHARDED_TABLES, HashRing, IdAllocator, copy_rows, current_shard
 from app.models.base import Base
+from app.models.profile import Profile
+from app.models.user import User
+
+if TYPE_CHECKING:
+    from app.database.replicas import ReplicaRouter
 
 # Get settings
 settings = get_settings()
 
-# Create database engine
-if settings.database.url.startswith("sqlite"):
-    # SQLite configuration for development
-    engine = create_engine(
-        settings.database.url,
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-        echo=settings.database.echo
-    )
-else:
+# Async drivers per database backend
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
+
+
+def get_async_url(url: str) -> str:
+    """
+    Get the async driver URL for a database URL.
+    
+    Args:
+        url: Database URL, with or without a driver
+    
+    Returns:
+        str: URL using the backend's async driver
+    """
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        return url
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+def configure_sqlite(engine: Engine, query_only: bool = False) -> None:
+    """
+    Apply the SQLite pragmas to every new connection of an engine.
+    
+    Args:
+        engine: Engine connecting to a SQLite database file
+        query_only: Whether connections must reject writes
+    """
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={settings.database.sqlite_synchronous}",
+        f"PRAGMA busy_timeout={settings.database.sqlite_busy_timeout}",
+        f"PRAGMA cache_size=-{settings.database.sqlite_cache_kib}",
+        f"PRAGMA mmap_size={settings.database.sqlite_mmap_size}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    if query_only:
+        pragmas.append("PRAGMA query_only=ON")
+    
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def enforce_foreign_keys(engine: Engine) -> None:
+    """
+    Enforce foreign keys on every new connection of a SQLite engine.
+    
+    SQLite ignores foreign keys, including their ON DELETE CASCADE, unless
+    enabled per connection.
+    
+    Args:
+        engine: Engine connecting to a SQLite database
+    """
+    @event.listens_for(engine, "connect")
+    def set_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def uses_wal(url: str) -> bool:
+    """Whether a database URL gets WAL mode and a separate reader pool."""
+    return url.startswith("sqlite") and ":memory:" not in url and settings.database.sqlite_wal
+
+
+def create_sync_engine(url: str) -> Engine:
+    """
+    Create the sync engine of a database.
+    
+    Args:
+        url: Database URL
+    
+    Returns:
+        Engine: Engine for schema migrations, seeding and scripts
+    """
+    if url.startswith("sqlite"):
+        # In-memory SQLite databases must share a single connection
+        sync_engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool if ":memory:" in url else None,
+            echo=settings.database.echo
+        )
+        enforce_foreign_keys(sync_engine)
+        if uses_wal(url):
+            configure_sqlite(sync_engine)
+        return sync_engine
+    
     # PostgreSQL configuration for production
-    engine = create_engine(
-        settings.database.url,
+    return create_engine(
+        url,
         pool_size=settings.database.pool_size,
         max_overflow=settings.database.max_overflow,
         echo=settings.database.echo
     )
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def create_async_engines(url: str) -> Tuple[AsyncEngine, Optional[AsyncEngine]]:
+    """
+    Create the async engines of a database.
+    
+    Args:
+        url: Database URL
+    
+    Returns:
+        Tuple[AsyncEngine, Optional[AsyncEngine]]: Writer engine, and reader
+        engine in WAL mode
+    """
+    async_url = get_async_url(url)
+    if uses_wal(url):
+        # SQLite allows one writer at a time: writes queue for a single
+        # connection instead of contending for the database lock
+        writer = create_async_engine(
+            async_url,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+            echo=settings.database.echo
+        )
+        enforce_foreign_keys(writer.sync_engine)
+        configure_sqlite(writer.sync_engine)
+        
+        # WAL readers see the last commit and never block the writer
+        reader = create_async_engine(
+            async_url,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.database.sqlite_readers,
+            max_overflow=0,
+            echo=settings.database.echo
+        )
+        configure_sqlite(reader.sync_engine, query_only=True)
+        return writer, reader
+    
+    if url.startswith("sqlite"):
+        # In-memory SQLite databases must share a single connection
+        writer = create_async_engine(
+            async_url,
+            poolclass=StaticPool if ":memory:" in async_url else None,
+            echo=settings.database.echo
+        )
+        enforce_foreign_keys(writer.sync_engine)
+        return writer, None
+    
+    return create_async_engine(
+        async_url,
+        pool_size=settings.database.pool_size,
+        max_overflow=settings.database.max_overflow,
+        echo=settings.database.echo
+    ), None
 
 
-def get_db() -> Session:
+class RoutingSession(Session):
     """
-    Get database session.
+    Session sending reads of read-only sessions to the reader engine and
+    everything else to the writer engine.
     
-    Yields:
-        Session: SQLAlchemy database session
+    Read-write sessions (``get_db``) keep their reads on the writer, so a
+    handler that reads then writes sees a single snapshot. Read-only
+    sessions (``get_read_db``) read from a read replica when configured,
+    unless the user in ``info["user_id"]`` has just written, or else from
+    the reader engine; a read failing on a replica takes it out of rotation
+    and is retried on the primary. Once a transaction has written, its later
+    statements also go to the writer, so they see its uncommitted changes.
+    
+    With shards, the sharded tables go to the writer and reader engines of
+    the shard in ``info["shard"]``, or else of the current user's shard
+    (``current_shard``); without a shard they stay on the directory.
+    """
+    
+    def __init__(
+        self,
+        *args: Any,
+        reader: Optional[Engine] = None,
+        read_only: bool = False,
+        shards: Optional[Dict[str, Tuple[Engine, Optional[Engine]]]] = None,
+        **kwargs: Any
+    ):
+        super().__init__(*args, **kwargs)
+        self.reader = reader
+        self.read_only = read_only
+        self.shards = shards or {}
+        self.writing = False
+    
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        shard = None
+        if self.shards and mapper is not None and mapper.local_table.name in SHARDED_TABLES:
+            shard = self.info["shard"] if "shard" in self.info else current_shard.get()
+        if shard is not None:
+            writer, reader = self.shards[shard]
+            if reader is not None and self._reads_from_reader(clause):
+                return reader
+            self.writing = True
+            return writer
         
+        if self._reads_from_reader(clause):
+            replicas = get_replica_router() if "replica_failed" not in self.info else None
+            if replicas is not None:
+                replica = replicas.choose(self.info.get("user_id"))
+                if replica is not None:
+                    self.info["replica"] = replica.name
+                    return replica.engine.sync_engine
+            if self.reader is not None:
+                return self.reader
+        self.writing = True
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+    
+    def _reads_from_reader(self, clause: Any) -> bool:
+        """Whether a statement of this session may go to a reader or replica."""
+        return self.read_only and not self.writing and not self._flushing and isinstance(clause, Select)
+    
+    def execute(self, *args: Any, **kwargs: Any) -> Any:
+        return self._with_failover(super().execute, *args, **kwargs)
+    
+    def scalar(self, *args: Any, **kwargs: Any) -> Any:
+        return self._with_failover(super().scalar, *args, **kwargs)
+    
+    def scalars(self, *args: Any, **kwargs: Any) -> Any:
+        return self._with_failover(super().scalars, *args, **kwargs)
+    
+    def _with_failover(self, method: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a statement, retrying it on the primary if the replica it was routed to fails."""
+        self.info.pop("replica", None)
+        try:
+            return method(*args, **kwargs)
+        except DBAPIError:
+            replica = self.info.pop("replica", None)
+            if replica is None:
+                raise
+            get_replica_router().mark_failed(replica)
+            # The session's later reads stay on the primary as well
+            self.info["replica_failed"] = True
+            return method(*args, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _reset_routing(session: RoutingSession, transaction) -> None:
+    """Route reads to the reader again once a transaction ends."""
+    if transaction.parent is None:
+        session.writing = False
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _assign_ids(session: RoutingSession, flush_context, instances) -> None:
+    """Give new rows of sharded tables IDs unique across shards."""
+    if id_allocator is None:
+        return
+    for instance in session.new:
+        table = instance.__table__.name
+        if table in SHARDED_TABLES and instance.id is None:
+            instance.id = id_allocator.next_id(table)
+
+
+class RoutingAsyncSession(AsyncSession):
+    """
+    Async session that reserves IDs for its new rows before flushing.
+    
+    Reservations run in a thread, so ``_assign_ids`` never blocks the event
+    loop on the directory database.
+    """
+    
+    async def flush(self, objects: Optional[Any] = None) -> None:
+        await self._prepare_ids()
+        await super().flush(objects)
+    
+    async def commit(self) -> None:
+        await self._prepare_ids()
+        await super().commit()
+    
+    async def _prepare_ids(self) -> None:
+        """Reserve enough IDs for the new rows of sharded tables."""
+        if id_allocator is None:
+            return
+        counts: Dict[str, int] = {}
+        for instance in self.sync_session.new:
+            table = instance.__table__.name
+            if table in SHARDED_TABLES and instance.id is None:
+                counts[table] = counts.get(table, 0) + 1
+        if counts:
+            await id_allocator.prepare(counts)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _collect_writers(session: RoutingSession, flush_context) -> None:
+    """Collect the users whose rows the transaction writes."""
+    if not replica_engines:
+        return
+    writers = session.info.setdefault("writers", set())
+    for instance in itertools.chain(session.new, session.dirty, session.deleted):
+        user_id = getattr(instance, "user_id", None)
+        if user_id is not None:
+            writers.add(user_id)
+
+
+def record_writers(session: Union[Session, AsyncSession], user_ids: Iterable[int]) -> None:
+    """
+    Record the users whose rows a transaction writes with Core statements.
+    
+    Flushed ORM instances are collected automatically; bulk UPDATE and
+    DELETE statements are not, so their callers record the users here.
+    
+    Args:
+        session: Database session running the statements
+        user_ids: IDs of the users owning the written rows
+    """
+    if replica_engines:
+        session.info.setdefault("writers", set()).update(user_ids)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _record_writers(session: RoutingSession) -> None:
+    """Keep the reads of users who just wrote on the primary."""
+    writers = session.info.pop("writers", None)
+    if writers:
+        get_replica_router().record_writes(writers)
+
+
+@event.listens_for(RoutingSession, "after_soft_rollback")
+def _discard_writers(session: RoutingSession, previous_transaction) -> None:
+    """Forget the writers of a rolled back transaction."""
+    session.info.pop("writers", None)
+
+
+# SQLite database files get WAL mode and a separate reader pool
+sqlite_wal = uses_wal(settings.database.url)
+
+# Create database engines
+engine = create_sync_engine(settings.database.url)
+async_engine, async_read_engine = create_async_engines(settings.database.url)
+
+# Create read replica engines
+replica_engines = []
+for replica_url in settings.database.replica_urls:
+    replica_async_url = get_async_url(replica_url)
+    if replica_url.startswith("sqlite"):
+        replica_engine = create_async_engine(
+            replica_async_url,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.database.sqlite_readers,
+            max_overflow=0,
+            echo=settings.database.echo
+        )
+    else:
+        replica_engine = create_async_engine(
+            replica_async_url,
+            pool_size=settings.database.pool_size,
+            max_overflow=settings.database.max_overflow,
+            pool_pre_ping=True,
+            echo=settings.database.echo
+        )
+    replica_engines.append(replica_engine)
+
+# Create shard engines, named by their position in DB_SHARD_URLS
+shard_engines: Dict[str, Engine] = {}
+async_shard_engines: Dict[str, Tuple[AsyncEngine, Optional[AsyncEngine]]] = {}
+for index, shard_url in enumerate(settings.database.shard_urls):
+    shard_engines[str(index)] = create_sync_engine(shard_url)
+    async_shard_engines[str(index)] = create_async_engines(shard_url)
+
+shard_ring: Optional[HashRing] = None
+id_allocator: Optional[IdAllocator] = None
+if shard_engines:
+    shard_ring = HashRing(list(shard_engines), settings.database.shard_virtual_nodes)
+    id_allocator = IdAllocator(engine, settings.database.shard_id_block_size)
+
+# Routing sessions get the sync engines behind the async ones
+async_shards = {
+    name: (writer.sync_engine, reader.sync_engine if reader is not None else None)
+    for name, (writer, reader) in async_shard_engines.items()
+}
+
+# Create session factories
+SessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
+    class_=RoutingSession,
+    shards={name: (shard_engine, None) for name, shard_engine in shard_engines.items()}
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=RoutingAsyncSession,
+    sync_session_class=RoutingSession,
+    reader=async_read_engine.sync_engine if async_read_engine is not None else None,
+    shards=async_shards,
+    autoflush=False,
+    expire_on_commit=False
+)
+AsyncReadSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=RoutingAsyncSession,
+    sync_session_class=RoutingSession,
+    reader=async_read_engine.sync_engine if async_read_engine is not None else None,
+    read_only=True,
+    shards=async_shards,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+
+async def get_db() -> AsyncIterator[AsyncSession]:
+    """
+    Get async database session.
+    
+    Yields:
+        AsyncSession: SQLAlchemy async database session
+    
     Note:
         This function is designed to be used as a dependency in FastAPI.
         It automatically handles session cleanup.
     """
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_read_db() -> AsyncIterator[AsyncSession]:
+    """
+    Get async database session for read-only endpoints.
+    
+    Reads are served by a read replica when configured; a query failing on
+    a replica is retried on the primary, and the replica is taken out of
+    rotation until its next successful check.
+    
+    Yields:
+        AsyncSession: SQLAlchemy async database session
+    """
+    async with AsyncReadSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+_replica_router: Optional["ReplicaRouter"] = None
+
+
+def get_replica_router() -> Optional["ReplicaRouter"]:
+    """Get the global read replica router, or None without replicas."""
+    global _replica_router
+    if _replica_router is None and replica_engines:
+        # Imported here to avoid a circular import with app.core
+        from app.database.replicas import ReplicaRouter
+        _replica_router = ReplicaRouter(
+            async_engine,
+            replica_engines,
+            max_lag=settings.database.replica_max_lag,
+            check_interval=settings.database.replica_check_interval,
+            read_your_writes=settings.database.replica_read_your_writes
+        )
+    return _replica_router
+
+
+async def use_user_shard(user: User) -> None:
+    """
+    Route the sharded tables of the current request or task to a user's shard.
+    
+    Users without a shard are placed on the shard chosen by the hash ring,
+    with a copy of their user row for foreign keys; users whose data is
+    still in the directory stay there until moved by the rebalance tool.
+    
+    Args:
+        user: Authenticated user
+    """
+    if shard_ring is None:
+        return
+    if user.shard is None:
+        await _place_user(user)
+    current_shard.set(user.shard)
+
+
+async def _place_user(user: User) -> None:
+    """Place a user without data on their shard."""
+    async with AsyncSessionLocal(info={"shard": None}) as db:
+        if await db.scalar(select(Profile.id).where(Profile.user_id == user.id).limit(1)) is not None:
+            return
+    
+    shard = shard_ring.shard_for(user.id)
+    writer, _ = async_shard_engines[shard]
+    async with writer.begin() as connection:
+        await connection.run_sync(copy_rows, User.__table__, [user.to_dict()])
+    async with async_engine.begin() as connection:
+        await connection.execute(
+            update(User).where(User.id == user.id, User.shard.is_(None)).values(shard=shard)
+        )
+    set_committed_value(user, "shard", shard)
+
+
+async def dispose_engines() -> None:
+    """Close the connections of the async engines."""
+    await async_engine.dispose()
+    if async_read_engine is not None:
+        await async_read_engine.dispose()
+    for replica_engine in replica_engines:
+        await replica_engine.dispose()
+    for writer, reader in async_shard_engines.values():
+        await writer.dispose()
+        if reader is not None:
+            await reader.dispose()
 
 
 def create_tables():
@@ -0,0 +1,199 @@
+"""
+User-hash sharding of user data across databases.
+
+This module places each user's profiles, sessions and messages on one of
+several shard databases by consistent hashing of the user ID, and hands
+out row IDs that are unique across shards so rows keep their IDs when a
+user is moved to another shard.
+"""
+
+import asyncio
+import bisect
+import hashlib
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+from sqlalchemy import Table, case, func, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+import structlog
+from app.models.id_block import IdBlock
+
+logger = structlog.get_logger(__name__)
+
+# Tables whose rows live on the shard of the user owning them
+SHARDED_TABLES = frozenset({"profiles", "sessions", "messages", "message_archives"})
+
+# Shard of the user the current request or task works for
+current_shard: ContextVar[Optional[str]] = ContextVar("current_shard", default=None)
+
+
+def _hash(key: str) -> int:
+    """Hash a key to a position on the ring."""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping user IDs to shards.
+    
+    Each shard is placed on the ring at ``virtual_nodes`` points, so adding a
+    shard only moves about 1/N of the users, spread over all other shards.
+    """
+    
+    def __init__(self, shards: List[str], virtual_nodes: int):
+        self.shards = list(shards)
+        points = sorted(
+            (_hash(f"{shard}#{index}"), shard)
+            for shard in shards
+            for index in range(virtual_nodes)
+        )
+        self._keys = [key for key, _ in points]
+        self._shards = [shard for _, shard in points]
+    
+    def shard_for(self, user_id: int) -> str:
+        """
+        Get the shard a user belongs on.
+        
+        Args:
+            user_id: User ID
+        
+        Returns:
+            str: Shard name
+        """
+        index = bisect.bisect(self._keys, _hash(f"user:{user_id}")) % len(self._keys)
+        return self._shards[index]
+
+
+class IdAllocator:
+    """
+    Hi/lo allocator of row IDs unique across shards.
+    
+    Blocks of ``block_size`` IDs per table are reserved from the id_blocks
+    table of the directory database, so a reservation costs one short
+    transaction per block rather than per row. Async sessions call
+    ``prepare`` before flushing, which reserves any missing IDs in a thread,
+    so flushes on the event loop never wait for the directory (or for a lock
+    their own transaction holds on it). Once half of a block is used, the
+    next one is reserved in the background as well.
+    """
+    
+    def __init__(self, engine: Engine, block_size: int):
+        self.engine = engine
+        self.block_size = block_size
+        self._ranges: Dict[str, Deque[Tuple[int, int]]] = defaultdict(deque)
+        self._prefetching: Set[str] = set()
+    
+    def reserve_all(self) -> None:
+        """
+        Reserve a fresh block of every sharded table.
+        
+        Run at startup, so flushes do not reserve while holding a lock on the
+        directory, and before rows move out of the directory, so later IDs
+        stay above theirs.
+        """
+        for table in SHARDED_TABLES:
+            self._ranges[table] = deque([self._reserve(table, self.block_size)])
+    
+    def available(self, table: str) -> int:
+        """Get the number of reserved, unused IDs of a table."""
+        return sum(end - start for start, end in self._ranges[table])
+    
+    async def prepare(self, counts: Dict[str, int]) -> None:
+        """
+        Reserve enough IDs for the rows about to be flushed, in a thread.
+        
+        Args:
+            counts: Number of new rows per table
+        """
+        loop = asyncio.get_running_loop()
+        for table, count in counts.items():
+            missing = count - self.available(table)
+            if missing > 0:
+                reserved = await loop.run_in_executor(None, self._reserve, table, max(missing, self.block_size))
+                self._ranges[table].append(reserved)
+    
+    def next_id(self, table: str) -> int:
+        """
+        Get the next unused ID of a table.
+        
+        Without IDs reserved by ``prepare`` or in the background, a block is
+        reserved synchronously, which is only meant for sync sessions.
+        
+        Args:
+            table: Table name
+        
+        Returns:
+            int: Row ID
+        """
+        ranges = self._ranges[table]
+        while ranges and ranges[0][0] >= ranges[0][1]:
+            ranges.popleft()
+        if not ranges:
+            ranges.append(self._reserve(table, self.block_size))
+        
+        next_id, end = ranges[0]
+        ranges[0] = (next_id + 1, end)
+        if self.available(table) <= self.block_size // 2:
+            self._prefetch(table)
+        return next_id
+    
+    def _prefetch(self, table: str) -> None:
+        """Reserve the next block of a table in a thread, when in an event loop."""
+        if table in self._prefetching:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        
+        self._prefetching.add(table)
+        future = loop.run_in_executor(None, self._reserve, table, self.block_size)
+        future.add_done_callback(lambda future: self._prefetched(table, future))
+    
+    def _prefetched(self, table: str, future: "asyncio.Future[Tuple[int, int]]") -> None:
+        """Keep a block reserved in the background for later allocations."""
+        self._prefetching.discard(table)
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            logger.error("ID block reservation failed", table=table, error=str(future.exception()))
+            return
+        self._ranges[table].append(future.result())
+    
+    def _reserve(self, table: str, size: int) -> Tuple[int, int]:
+        """Reserve the next ``size`` IDs of a table, above the directory's own rows."""
+        # Rows written to the directory while sharding was off took IDs of their own
+        id_column = IdBlock.metadata.tables[table].c.id
+        floor = select(func.coalesce(func.max(id_column), 0) + 1).scalar_subquery()
+        start = case((IdBlock.next_id > floor, IdBlock.next_id), else_=floor)
+        with self.engine.begin() as connection:
+            connection.execute(update(IdBlock).where(IdBlock.name == table).values(
+                next_id=start + size
+            ))
+            end = connection.scalar(select(IdBlock.next_id).where(IdBlock.name == table))
+        if end is None:
+            raise RuntimeError(f"No ID block row for table {table}")
+        return end - size, end
+
+
+def copy_rows(connection: Connection, table: Table, rows: List[Dict[str, Any]]) -> int:
+    """
+    Insert the rows missing from a database, keeping their IDs.
+    
+    Args:
+        connection: Connection to the target database
+        table: Table of the rows
+        rows: Rows keyed by column name
+    
+    Returns:
+        int: Number of rows inserted
+    """
+    if not rows:
+        return 0
+    existing = set(connection.scalars(
+        select(table.c.id).where(table.c.id.in_([row["id"] for row in rows]))
+    ))
+    missing = [row for row in rows if row["id"] not in existing]
+    if missing:
+        connection.execute(insert(table), missing)
+    return len(missing)
@@ -14,8 +14,14 @@ from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_
 from starlette.responses import Response
 
 from app.config import get_settings
-from app.database.session import create_tables
+from app.database.migrate import run_migrations
+from app.database.session import dispose_engines, get_replica_router, id_allocator
 from app.database.init_db import init_db
+from app.services.llm_service import get_llm_service
+from app.services.archiver import get_session_archiver
+from app.services.retention import get_retention_purger
+from app.services.persistence import get_message_writer
+from app.services.summarizer import get_session_summarizer
 from app.routers import auth, health, chat, profiles
 
 # Get settings
@@ -53,9 +59,13 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Chatbot Service", version=settings.version)
     
-    # Create database tables
-    create_tables()
-    logger.info("Database tables created")
+    # Apply database migrations
+    run_migrations()
+    logger.info("Database migrations applied")
+    
+    # Reserve the first row IDs of sharded tables
+    if id_allocator is not None:
+        id_allocator.reserve_all()
     
     # Initialize sample data in development
     if settings.environment == "development":
@@ -67,10 +77,40 @@ async def lifespan(app: FastAPI):
         finally:
             db.close()
     
+    # Open LLM provider connection pools
+    llm_service = get_llm_service()
+    await llm_service.startup()
+    logger.info("LLM provider connection pools opened")
+    
+    # Start the write-behind message writer
+    if settings.database.write_behind:
+        get_message_writer().start()
+    
+    # Start archiving cold sessions
+    if settings.service.archive_enabled:
+        get_session_archiver().start()
+    
+    # Start purging expired sessions
+    if settings.service.retention_days is not None:
+        get_retention_purger().start()
+    
+    # Start the read replica checks
+    if get_replica_router() is not None:
+        get_replica_router().start()
+    
     yield
     
     # Shutdown
     logger.info("Shutting down Chatbot Service")
+    await get_retention_purger().shutdown()
+    await get_session_archiver().shutdown()
+    await get_message_writer().shutdown()
+    await get_session_summarizer().shutdown()
+    await llm_service.shutdown()
+    if get_replica_router() is not None:
+        await get_replica_router().shutdown()
+    await dispose_engines()
+    logger.info("LLM provider connection pools closed")
 
 
 # Create FastAPI application
@@ -161,6 +201,7 @@ async def root():
 @app.get("/metrics")
 async def metrics():
     """Prometheus metrics endpoint."""
+    get_llm_service().export_metrics()
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
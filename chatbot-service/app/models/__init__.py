@@ -10,11 +10,17 @@ from .user import User
 from .profile import Profile
 from .message import Message
 from .session import Session
+from .id_block import IdBlock
+from .message_archive import MessageArchive
+from .replica_heartbeat import ReplicaHeartbeat
 
 __all__ = [
     "Base",
     "User", 
     "Profile",
     "Message",
-    "Session"
+    "Session",
+    "IdBlock",
+    "MessageArchive",
+    "ReplicaHeartbeat"
 ] 
\ No newline at end of file
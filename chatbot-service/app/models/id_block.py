@@ -0,0 +1,30 @@
+"""
+ID block model for allocating row IDs across database shards.
+
+This module defines the IdBlock model which holds, per table, the next
+row ID to hand out when user data is sharded across databases.
+"""
+
+from sqlalchemy import Column, Integer, String
+from .base import Base
+
+
+class IdBlock(Base):
+    """ID block model holding the next unallocated row ID of a table."""
+    
+    __tablename__ = "id_blocks"
+    
+    name = Column(
+        String(50), 
+        primary_key=True,
+        doc="Name of the table the IDs are allocated for"
+    )
+    next_id = Column(
+        Integer, 
+        nullable=False,
+        doc="First row ID not yet reserved"
+    )
+    
+    def __repr__(self) -> str:
+        """String representation of the IdBlock instance."""
+        return f"<IdBlock(name='{self.name}', next_id={self.next_id})>"
@@ -5,7 +5,7 @@ This module defines the Message model which handles individual chat messages,
 their content, metadata, and relationships to sessions and users.
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -14,6 +14,10 @@ class Message(Base):
     """Message model for storing chat messages and conversation history."""
     
     __tablename__ = "messages"
+    __table_args__ = (
+        # Session history in chronological order
+        Index("ix_messages_session_id_created_at", "session_id", "created_at", "id"),
+    )
     
     id = Column(
         Integer, 
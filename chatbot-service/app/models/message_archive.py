@@ -0,0 +1,76 @@
+"""
+Message archive model for compressed history of cold sessions.
+
+This module defines the MessageArchive model which holds the messages of
+archived sessions as compressed blocks, in chronological order.
+"""
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, LargeBinary
+from sqlalchemy.orm import relationship
+from .base import Base
+
+
+class MessageArchive(Base):
+    """Message archive model holding a compressed block of a session's messages."""
+    
+    __tablename__ = "message_archives"
+    __table_args__ = (
+        # Blocks of a session in chronological order
+        Index("ix_message_archives_session_id_first", "session_id", "first_created_at", "first_message_id"),
+    )
+    
+    id = Column(
+        Integer, 
+        primary_key=True,
+        doc="Unique archive block identifier"
+    )
+    first_created_at = Column(
+        DateTime, 
+        nullable=False,
+        doc="Creation time of the first message in the block"
+    )
+    first_message_id = Column(
+        Integer, 
+        nullable=False,
+        doc="Primary key of the first message in the block"
+    )
+    last_created_at = Column(
+        DateTime, 
+        nullable=False,
+        doc="Creation time of the last message in the block"
+    )
+    last_message_id = Column(
+        Integer, 
+        nullable=False,
+        doc="Primary key of the last message in the block"
+    )
+    message_count = Column(
+        Integer, 
+        nullable=False,
+        doc="Number of messages in the block"
+    )
+    raw_size = Column(
+        Integer, 
+        nullable=False,
+        doc="Size in bytes of the block before compression"
+    )
+    data = Column(
+        LargeBinary, 
+        nullable=False,
+        doc="zlib-compressed JSON array of the messages' column values"
+    )
+    
+    # Foreign Keys
+    session_id = Column(
+        Integer, 
+        ForeignKey("sessions.id", ondelete="CASCADE"), 
+        nullable=False,
+        doc="Session the archived messages belong to"
+    )
+    
+    # Relationships
+    session = relationship("Session", back_populates="archives")
+    
+    def __repr__(self) -> str:
+        """String representation of the MessageArchive instance."""
+        return f"<MessageArchive(id={self.id}, session_id={self.session_id}, message_count={self.message_count})>"
@@ -5,7 +5,7 @@ This module defines the Profile model which handles different chatbot
 personalities, system instructions, and LLM provider configurations.
 """
 
-from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -14,6 +14,10 @@ class Profile(Base):
     """Profile model for managing chatbot personalities and configurations."""
     
     __tablename__ = "profiles"
+    __table_args__ = (
+        # A user's default profile
+        Index("ix_profiles_user_id_is_default", "user_id", "is_default"),
+    )
     
     id = Column(
         Integer, 
@@ -47,6 +51,16 @@ class Profile(Base):
         nullable=True,
         doc="Specific LLM model to use"
     )
+    fallback_providers = Column(
+        String(200), 
+        nullable=True,
+        doc="Comma-separated ordered fallback providers (e.g. azure_openai)"
+    )
+    hedging_enabled = Column(
+        Boolean, 
+        default=False,
+        doc="Whether slow requests are hedged with the first fallback provider"
+    )
     temperature = Column(
         String(10), 
         default="0.7",
@@ -57,6 +71,26 @@ class Profile(Base):
         default=1000,
         doc="Maximum tokens for LLM responses"
     )
+    context_token_budget = Column(
+        Integer, 
+        nullable=True,
+        doc="Prompt token budget for system instructions and history (defaults to the model's context window minus max_tokens)"
+    )
+    summarization_enabled = Column(
+        Boolean, 
+        default=False,
+        doc="Whether older turns of long sessions are replaced by a rolling summary"
+    )
+    memory_enabled = Column(
+        Boolean, 
+        default=False,
+        doc="Whether relevant older messages are recalled into the context by similarity"
+    )
+    response_cache_enabled = Column(
+        Boolean, 
+        default=False,
+        doc="Whether deterministic responses for this profile may be served from the response cache"
+    )
     is_default = Column(
         Boolean, 
         default=False,
@@ -78,8 +112,8 @@ class Profile(Base):
     
     # Relationships
     user = relationship("User", back_populates="profiles")
-    sessions = relationship("Session", back_populates="profile", cascade="all, delete-orphan")
-    messages = relationship("Message", back_populates="profile", cascade="all, delete-orphan")
+    sessions = relationship("Session", back_populates="profile", cascade="all, delete-orphan", passive_deletes=True)
+    messages = relationship("Message", back_populates="profile", cascade="all, delete-orphan", passive_deletes=True)
     
     def __repr__(self) -> str:
         """String representation of the Profile instance."""
@@ -0,0 +1,31 @@
+"""
+Replica heartbeat model for measuring read replica lag.
+
+This module defines the ReplicaHeartbeat model, a single row the primary
+database updates periodically so each read replica's lag can be read from
+how old its copy of the row is.
+"""
+
+from sqlalchemy import Column, DateTime, Integer
+from .base import Base
+
+
+class ReplicaHeartbeat(Base):
+    """Replica heartbeat model holding the time of the primary's last beat."""
+    
+    __tablename__ = "replica_heartbeats"
+    
+    id = Column(
+        Integer, 
+        primary_key=True,
+        doc="Heartbeat row identifier (a single row with ID 1)"
+    )
+    beat_at = Column(
+        DateTime, 
+        nullable=False,
+        doc="When the primary last wrote the heartbeat"
+    )
+    
+    def __repr__(self) -> str:
+        """String representation of the ReplicaHeartbeat instance."""
+        return f"<ReplicaHeartbeat(id={self.id}, beat_at={self.beat_at})>"
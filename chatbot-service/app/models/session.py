@@ -6,7 +6,7 @@ conversation tracking, and session-specific metadata.
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -15,6 +15,14 @@ class Session(Base):
     """Session model for managing chat sessions and conversations."""
     
     __tablename__ = "sessions"
+    __table_args__ = (
+        # A user's sessions by most recent activity, keyset-paginated
+        Index("ix_sessions_user_id_last_activity_id", "user_id", "last_activity", "id"),
+        # Cold sessions waiting to be archived
+        Index("ix_sessions_archived_at_last_activity", "archived_at", "last_activity"),
+        # Expired sessions waiting to be purged
+        Index("ix_sessions_last_activity_id", "last_activity", "id"),
+    )
     
     id = Column(
         Integer, 
@@ -56,6 +64,11 @@ class Session(Base):
         nullable=True,
         doc="JSON metadata for the session"
     )
+    archived_at = Column(
+        DateTime, 
+        nullable=True,
+        doc="When the session's messages were moved to the archive, if archived"
+    )
     
     # Foreign Keys
     user_id = Column(
@@ -74,7 +87,8 @@ class Session(Base):
     # Relationships
     user = relationship("User", back_populates="sessions")
     profile = relationship("Profile", back_populates="sessions")
-    messages = relationship("Message", back_populates="session", cascade="all, delete-orphan")
+    messages = relationship("Message", back_populates="session", cascade="all, delete-orphan", passive_deletes=True)
+    archives = relationship("MessageArchive", back_populates="session", cascade="all, delete-orphan", passive_deletes=True)
     
     def __repr__(self) -> str:
         """String representation of the Session instance."""
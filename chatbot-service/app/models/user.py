@@ -56,11 +56,16 @@ class User(Base):
         nullable=True,
         doc="Timestamp of last login"
     )
+    shard = Column(
+        String(50), 
+        nullable=True,
+        doc="Database shard holding the user's data, when sharding is enabled"
+    )
     
     # Relationships
-    profiles = relationship("Profile", back_populates="user", cascade="all, delete-orphan")
-    sessions = relationship("Session", back_populates="user", cascade="all, delete-orphan")
-    messages = relationship("Message", back_populates="user", cascade="all, delete-orphan")
+    profiles = relationship("Profile", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    sessions = relationship("Session", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    messages = relationship("Message", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
     
     def __repr__(self) -> str:
         """String representation of the User instance."""
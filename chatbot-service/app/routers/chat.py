@@ -5,22 +5,41 @@ This module provides endpoints for sending messages, retrieving chat history,
 and managing chat sessions.
 """
 
+import asyncio
+import base64
+import binascii
+import json
 import uuid
+from collections import Counter
 from datetime import datetime
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
-from pydantic import BaseModel, Field
-from app.core.security import get_current_user
-from app.database.session import get_db
+from typing import Any, Dict, List, Optional, Tuple, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, status, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, delete, select, tuple_
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, Field, ValidationError
+from app.config import get_settings
+from app.core.metrics import CHAT_MEMORY_RECALLED, CHAT_SESSIONS_DELETED
+from app.core.security import authenticate_token, get_current_user
+from app.database.session import AsyncSessionLocal, get_db, get_read_db, record_writers, shard_ring, use_user_shard
 from app.models.user import User
 from app.models.profile import Profile
 from app.models.session import Session as ChatSession
 from app.models.message import Message
-from app.services.llm_service import LLMService
+from app.services.admission import AdmissionRejected
+from app.services.archiver import get_session_archiver
+from app.services.resilience import CircuitOpenError
+from app.services.context_builder import get_context_builder
+from app.services.history_cache import get_history_cache
+from app.services.llm_service import get_llm_service
+from app.services.memory_index import get_memory_index
+from app.services.persistence import get_message_writer
+from app.services.summarizer import get_session_summarizer, get_session_summary, is_summarized
 
 router = APIRouter()
-llm_service = LLMService()
+settings = get_settings()
+llm_service = get_llm_service()
 
 
 class MessageRequest(BaseModel):
@@ -43,6 +62,7 @@ class SimpleMessageResponse(BaseModel):
     """Simple message response model for testing."""
     response: str
     status: str = "success"
+    provider: Optional[str] = None
 
 
 class MessageResponse(BaseModel):
@@ -53,15 +73,19 @@ class MessageResponse(BaseModel):
     timestamp: datetime
     tokens_used: Optional[int] = None
     response_time: Optional[float] = None
+    provider: Optional[str] = None
 
 
 class ChatHistoryResponse(BaseModel):
-    """Chat history response model."""
+    """Chat history response model, with all messages or one page of them, oldest first."""
     session_id: str
     title: str
     messages: List[MessageResponse]
     created_at: datetime
     last_activity: datetime
+    has_more: bool = False
+    before_cursor: Optional[str] = None
+    after_cursor: Optional[str] = None
 
 
 class SessionResponse(BaseModel):
@@ -74,6 +98,25 @@ class SessionResponse(BaseModel):
     profile_id: int
 
 
+class SessionListResponse(BaseModel):
+    """Session list response model, one page of sessions most recent first."""
+    sessions: List[SessionResponse]
+    has_more: bool = False
+    before_cursor: Optional[str] = None
+    after_cursor: Optional[str] = None
+
+
+class DeleteSessionsRequest(BaseModel):
+    """Batch session deletion request model."""
+    session_ids: List[str] = Field(..., min_length=1, max_length=settings.service.max_batch_delete)
+
+
+class DeleteSessionsResponse(BaseModel):
+    """Batch session deletion response model."""
+    deleted: List[str]
+    not_found: List[str]
+
+
 @router.post("/send", response_model=SimpleMessageResponse)
 async def send_message_simple(request: SimpleMessageRequest):
     """
@@ -81,7 +124,7 @@ async def send_message_simple(request: SimpleMessageRequest):
     
     Args:
         request: Simple message request
-        
+    
     Returns:
         SimpleMessageResponse: AI response message
     """
@@ -96,6 +139,7 @@ async def send_message_simple(request: SimpleMessageRequest):
             name=request.profile,
             system_instructions=request.system_prompt,
             llm_provider="lm_studio",
+            response_cache_enabled=True,
             user_id=1
         )
         
@@ -109,7 +153,14 @@ async def send_message_simple(request: SimpleMessageRequest):
         
         return SimpleMessageResponse(
             response=llm_response.content,
-            status="success"
+            status="success",
+            provider=llm_response.provider
+        )
+    except (AdmissionRejected, CircuitOpenError) as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
         )
     except Exception as e:
         return SimpleMessageResponse(
@@ -118,164 +169,752 @@ async def send_message_simple(request: SimpleMessageRequest):
         )
 
 
-@router.post("/send-auth", response_model=MessageResponse)
-async def send_message(
+async def _prepare_turn(
     request: MessageRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+    current_user: User,
+    db: AsyncSession
+) -> Tuple[ChatSession, Profile, List[Dict[str, str]]]:
     """
-    Send a message and get AI response.
+    Resolve the session and profile for a chat turn and save the user message.
     
     Args:
         request: Message request
         current_user: Current authenticated user
         db: Database session
-        
+    
     Returns:
-        MessageResponse: AI response message
-        
+        Tuple[ChatSession, Profile, List[Dict[str, str]]]: Session, profile and
+        the conversation history to send to the LLM
+    
     Raises:
-        HTTPException: If message processing fails
+        HTTPException: If the session or profile cannot be found
     """
-    try:
-        # Get or create session
-        if request.session_id:
-            session = db.query(ChatSession).filter(
-                ChatSession.session_id == request.session_id,
-                ChatSession.user_id == current_user.id
-            ).first()
-            if not session:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Session not found"
-                )
-        else:
-            # Get default profile if no profile specified
-            if not request.profile_id:
-                profile = db.query(Profile).filter(
-                    Profile.user_id == current_user.id,
-                    Profile.is_default == True
-                ).first()
-                if not profile:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="No default profile found"
-                    )
-                request.profile_id = profile.id
-            
-            # Create new session
-            session = ChatSession(
-                session_id=str(uuid.uuid4()),
-                user_id=current_user.id,
-                profile_id=request.profile_id,
-                title=f"Chat {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}",
-                is_active=True
-            )
-            db.add(session)
-            db.commit()
-            db.refresh(session)
-        
-        # Get profile
-        profile = db.query(Profile).filter(
-            Profile.id == session.profile_id,
-            Profile.user_id == current_user.id
-        ).first()
-        if not profile:
+    # Wait for write-behind replies of this session so history includes them
+    if request.session_id and settings.database.write_behind:
+        await get_message_writer().wait_for_session(request.session_id)
+    
+    # Get or create session
+    if request.session_id:
+        result = await db.execute(select(ChatSession).where(
+            ChatSession.session_id == request.session_id,
+            ChatSession.user_id == current_user.id
+        ))
+        session = result.scalars().first()
+        if not session:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail="Profile not found"
+                detail="Session not found"
             )
         
-        # Save user message
-        user_message = Message(
-            message_id=str(uuid.uuid4()),
-            content=request.content,
-            role="user",
-            is_user_message=True,
+        # A revived session gets its archived messages back
+        if session.archived_at is not None:
+            await get_session_archiver().restore(db, session)
+    else:
+        # Get default profile if no profile specified
+        if not request.profile_id:
+            result = await db.execute(select(Profile).where(
+                Profile.user_id == current_user.id,
+                Profile.is_default == True
+            ))
+            profile = result.scalars().first()
+            if not profile:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="No default profile found"
+                )
+            request.profile_id = profile.id
+        
+        # Create new session
+        session = ChatSession(
+            session_id=str(uuid.uuid4()),
             user_id=current_user.id,
-            session_id=session.id,
-            profile_id=profile.id
+            profile_id=request.profile_id,
+            title=f"Chat {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}",
+            is_active=True
+        )
+        db.add(session)
+        # Assign the session ID; it is committed with the user message
+        await db.flush()
+    
+    # Get profile
+    result = await db.execute(select(Profile).where(
+        Profile.id == session.profile_id,
+        Profile.user_id == current_user.id
+    ))
+    profile = result.scalars().first()
+    if not profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    
+    # Save user message
+    user_message = Message(
+        message_id=str(uuid.uuid4()),
+        content=request.content,
+        role="user",
+        is_user_message=True,
+        user_id=current_user.id,
+        session_id=session.id,
+        profile_id=profile.id
+    )
+    db.add(user_message)
+    session.last_activity = datetime.utcnow()
+    
+    # Commit the session and user message together
+    await db.commit()
+    history_cache = get_history_cache()
+    history_cache.append(user_message)
+    
+    # Index the user message for long-term memory
+    memory_index = get_memory_index()
+    if profile.memory_enabled:
+        memory_index.add(session.id, user_message.id, user_message.content)
+    
+    # Get the most recent history for context, after the summarized turns
+    summary = get_session_summary(session) if profile.summarization_enabled else None
+    history_messages = await history_cache.recent(db, session.id)
+    if summary:
+        history_messages = [
+            msg for msg in history_messages
+            if not is_summarized(summary, msg.created_at, msg.id)
+        ]
+    
+    # Fit history into the profile's token budget
+    history = [
+        {
+            "message_id": msg.message_id,
+            "role": msg.role,
+            "content": msg.content
+        }
+        for msg in history_messages
+    ]
+    context_builder = get_context_builder()
+    budget = context_builder.budget_for(profile.llm_model, profile.max_tokens, profile.context_token_budget)
+    if profile.memory_enabled:
+        budget = max(budget - settings.service.memory_token_budget, 0)
+    messages = context_builder.build(
+        profile.system_instructions,
+        history,
+        budget,
+        summary=summary["content"] if summary else None
+    )
+    
+    # Recall relevant older messages that are outside the window
+    if profile.memory_enabled:
+        window = len(messages) - (1 if summary else 0)
+        hits = await memory_index.search(
+            db,
+            session.id,
+            request.content,
+            k=settings.service.memory_top_k,
+            exclude={msg.id for msg in history_messages[len(history_messages) - window:]},
+            min_score=settings.service.memory_min_score
         )
-        db.add(user_message)
-        db.commit()
+        if hits:
+            result = await db.execute(select(Message).where(
+                Message.id.in_([message_id for message_id, _ in hits])
+            ))
+            recalled = {msg.id: msg for msg in result.scalars()}
+            recall = context_builder.recall_message(
+                [
+                    {"role": recalled[message_id].role, "content": recalled[message_id].content}
+                    for message_id, _ in hits
+                    if message_id in recalled
+                ],
+                settings.service.memory_token_budget
+            )
+            if recall:
+                messages.insert(1 if summary else 0, recall)
+                CHAT_MEMORY_RECALLED.inc(recall["content"].count("\n"))
+    
+    # Release the connection while the LLM call runs
+    await db.commit()
+    
+    return session, profile, messages
+
+
+async def _save_assistant_message(
+    content: str,
+    tokens_used: Optional[int],
+    response_time: Optional[float],
+    session: ChatSession,
+    profile: Profile,
+    current_user: User,
+    db: AsyncSession,
+    provider: Optional[str] = None,
+    model: Optional[str] = None
+) -> MessageResponse:
+    """
+    Save an assistant message and update the session's last activity.
+    
+    In write-behind mode (DB_WRITE_BEHIND) the message is committed in the
+    background after the response is returned; see MessageWriter for the
+    durability guarantees.
+    
+    Args:
+        content: Assistant message content
+        tokens_used: Tokens used by the LLM
+        response_time: LLM response time in seconds
+        session: Chat session
+        profile: Profile used for the response
+        current_user: Current authenticated user
+        db: Database session
+        provider: LLM provider that served the response
+        model: LLM model that served the response
+    
+    Returns:
+        MessageResponse: Saved assistant message
+    """
+    now = datetime.utcnow()
+    ai_message = Message(
+        message_id=str(uuid.uuid4()),
+        content=content,
+        role="assistant",
+        is_user_message=False,
+        tokens_used=tokens_used,
+        response_time=str(response_time) if response_time else None,
+        message_metadata=json.dumps({"provider": provider, "model": model}) if provider else None,
+        user_id=current_user.id,
+        session_id=session.id,
+        profile_id=profile.id,
+        created_at=now,
+        updated_at=now
+    )
+    
+    def on_persisted(message: Message) -> None:
+        get_history_cache().append(message)
         
-        # Get chat history for context
-        history_messages = db.query(Message).filter(
-            Message.session_id == session.id
-        ).order_by(Message.created_at).all()
+        # Index the reply for long-term memory
+        if profile.memory_enabled:
+            get_memory_index().add(message.session_id, message.id, message.content)
         
-        # Prepare messages for LLM
-        messages = []
-        for msg in history_messages:
-            messages.append({
-                "role": msg.role,
-                "content": msg.content
-            })
+        # Fold older turns into the session summary in the background
+        if profile.summarization_enabled:
+            get_session_summarizer().schedule(message.session_id)
+    
+    if settings.database.write_behind:
+        await get_message_writer().submit(session.session_id, ai_message, on_persisted)
+    else:
+        # Save the reply and the session's last activity in one commit
+        db.add(ai_message)
+        session.last_activity = now
+        await db.commit()
+        on_persisted(ai_message)
+    
+    return MessageResponse(
+        message_id=ai_message.message_id,
+        content=ai_message.content,
+        role=ai_message.role,
+        timestamp=ai_message.created_at,
+        tokens_used=ai_message.tokens_used,
+        response_time=float(ai_message.response_time) if ai_message.response_time else None,
+        provider=provider
+    )
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/send-auth", response_model=MessageResponse)
+async def send_message(
+    request: MessageRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Send a message and get AI response.
+    
+    Args:
+        request: Message request
+        current_user: Current authenticated user
+        db: Database session
+    
+    Returns:
+        MessageResponse: AI response message
+    
+    Raises:
+        HTTPException: If message processing fails
+    """
+    try:
+        session, profile, messages = await _prepare_turn(request, current_user, db)
         
         # Generate AI response
         llm_response = await llm_service.generate_response(
             messages=messages,
-            profile=profile
+            profile=profile,
+            session_key=session.session_id
         )
         
         # Save AI response
-        ai_message = Message(
-            message_id=str(uuid.uuid4()),
-            content=llm_response.content,
-            role="assistant",
-            is_user_message=False,
-            tokens_used=llm_response.tokens_used,
-            response_time=str(llm_response.response_time) if llm_response.response_time else None,
-            user_id=current_user.id,
-            session_id=session.id,
-            profile_id=profile.id
+        return await _save_assistant_message(
+            llm_response.content,
+            llm_response.tokens_used,
+            llm_response.response_time,
+            session,
+            profile,
+            current_user,
+            db,
+            provider=llm_response.provider,
+            model=llm_response.model
         )
-        db.add(ai_message)
-        
-        # Update session last activity
-        session.last_activity = datetime.utcnow()
-        
-        db.commit()
-        db.refresh(ai_message)
-        
-        return MessageResponse(
-            message_id=ai_message.message_id,
-            content=ai_message.content,
-            role=ai_message.role,
-            timestamp=ai_message.created_at,
-            tokens_used=ai_message.tokens_used,
-            response_time=float(ai_message.response_time) if ai_message.response_time else None
+    
+    except (AdmissionRejected, CircuitOpenError) as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
         )
-        
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to process message: {str(e)}"
         )
 
 
-@router.get("/sessions", response_model=List[SessionResponse])
-async def get_sessions(
+@router.post("/send-auth/stream")
+async def send_message_stream(
+    request: MessageRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Get user's chat sessions.
+    Send a message and stream the AI response as Server-Sent Events.
+    
+    The stream emits a ``session`` event, one ``token`` event per content
+    delta, and a final ``done`` event carrying the persisted assistant
+    message. Failures during generation are reported as an ``error`` event.
     
     Args:
+        request: Message request
         current_user: Current authenticated user
         db: Database session
+    
+    Returns:
+        StreamingResponse: ``text/event-stream`` response
+    
+    Raises:
+        HTTPException: If the session or profile cannot be resolved
+    """
+    try:
+        session, profile, messages = await _prepare_turn(request, current_user, db)
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to process message: {str(e)}"
+        )
+    
+    async def event_stream():
+        yield _sse_event("session", {"session_id": session.session_id})
         
+        content = []
+        try:
+            async for chunk in llm_service.stream_response(
+                messages=messages,
+                profile=profile,
+                session_key=session.session_id
+            ):
+                if chunk.delta:
+                    content.append(chunk.delta)
+                    yield _sse_event("token", {"delta": chunk.delta})
+                if chunk.done:
+                    # Persist the finished assistant message
+                    message = await _save_assistant_message(
+                        "".join(content),
+                        chunk.tokens_used,
+                        chunk.response_time,
+                        session,
+                        profile,
+                        current_user,
+                        db,
+                        provider=chunk.provider,
+                        model=chunk.model
+                    )
+                    yield _sse_event("done", message.model_dump(mode="json"))
+        except (AdmissionRejected, CircuitOpenError) as e:
+            await db.rollback()
+            yield _sse_event("error", {
+                "detail": str(e),
+                "status_code": e.status_code,
+                "retry_after": e.retry_after
+            })
+        except Exception as e:
+            await db.rollback()
+            yield _sse_event("error", {"detail": f"Failed to process message: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+class ChatConnection:
+    """
+    Multiplexed WebSocket chat connection for an authenticated user.
+    
+    A single connection can carry several chat turns at once, each identified
+    by a client-chosen ``request_id``. Turns on the same chat session are
+    serialized; turns on different sessions run concurrently.
+    """
+    
+    def __init__(self, websocket: WebSocket, user: User):
+        self.websocket = websocket
+        self.user = user
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.session_locks: Dict[str, asyncio.Lock] = {}
+        self.session_turns: Counter = Counter()
+        self.send_lock = asyncio.Lock()
+    
+    async def send(self, event: Dict[str, Any]) -> None:
+        """Send a JSON event to the client, ignoring closed connections."""
+        async with self.send_lock:
+            try:
+                await self.websocket.send_json(event)
+            except (WebSocketDisconnect, RuntimeError):
+                pass
+    
+    async def receive(self) -> None:
+        """Dispatch client events until the connection closes."""
+        while True:
+            try:
+                event = await self.websocket.receive_json()
+            except (KeyError, TypeError, ValueError):
+                # Malformed JSON, or a binary frame without text
+                await self.send({"type": "error", "detail": "Invalid JSON event"})
+                continue
+            if not isinstance(event, dict):
+                await self.send({"type": "error", "detail": "Events must be JSON objects"})
+                continue
+            
+            event_type = event.get("type")
+            request_id = str(event.get("request_id") or uuid.uuid4())
+            
+            if event_type == "message":
+                if request_id in self.tasks:
+                    await self.send({
+                        "type": "error",
+                        "request_id": request_id,
+                        "detail": "Duplicate request_id"
+                    })
+                    continue
+                try:
+                    request = MessageRequest(
+                        content=event.get("content", ""),
+                        session_id=event.get("session_id"),
+                        profile_id=event.get("profile_id")
+                    )
+                except ValidationError as e:
+                    await self.send({
+                        "type": "error",
+                        "request_id": request_id,
+                        "detail": e.errors(include_url=False, include_context=False)
+                    })
+                    continue
+                task = asyncio.create_task(self.run_turn(request_id, request))
+                self.tasks[request_id] = task
+                task.add_done_callback(lambda task, key=request_id: self._turn_done(key, task))
+            elif event_type == "cancel":
+                task = self.tasks.get(request_id)
+                if task:
+                    task.cancel()
+            elif event_type == "ping":
+                await self.send({"type": "pong"})
+            else:
+                await self.send({
+                    "type": "error",
+                    "request_id": request_id,
+                    "detail": f"Unknown event type: {event_type}"
+                })
+    
+    def _turn_done(self, request_id: str, task: asyncio.Task) -> None:
+        """Forget a finished turn, reporting turns cancelled before they started."""
+        self.tasks.pop(request_id, None)
+        if task.cancelled():
+            asyncio.ensure_future(self.send({"type": "cancelled", "request_id": request_id}))
+    
+    async def run_turn(self, request_id: str, request: MessageRequest) -> None:
+        """Process one chat turn and stream its tokens to the client."""
+        if request.session_id:
+            lock = self.session_locks.setdefault(request.session_id, asyncio.Lock())
+            self.session_turns[request.session_id] += 1
+        else:
+            lock = asyncio.Lock()
+        session_id = request.session_id
+        db = AsyncSessionLocal()
+        try:
+            async with lock:
+                if shard_ring is not None:
+                    # The user may have been moved to another shard since the connection opened
+                    await use_user_shard(await db.get(User, self.user.id))
+                session, profile, messages = await _prepare_turn(request, self.user, db)
+                session_id = session.session_id
+                await self.send({
+                    "type": "typing",
+                    "request_id": request_id,
+                    "session_id": session_id,
+                    "is_typing": True
+                })
+                
+                content = []
+                async for chunk in llm_service.stream_response(
+                    messages=messages,
+                    profile=profile,
+                    session_key=session.session_id
+                ):
+                    if chunk.delta:
+                        content.append(chunk.delta)
+                        await self.send({
+                            "type": "token",
+                            "request_id": request_id,
+                            "session_id": session_id,
+                            "delta": chunk.delta
+                        })
+                    if chunk.done:
+                        message = await _save_assistant_message(
+                            "".join(content),
+                            chunk.tokens_used,
+                            chunk.response_time,
+                            session,
+                            profile,
+                            self.user,
+                            db,
+                            provider=chunk.provider,
+                            model=chunk.model
+                        )
+                        await self.send({
+                            "type": "done",
+                            "request_id": request_id,
+                            "session_id": session_id,
+                            "message": message.model_dump(mode="json")
+                        })
+        except asyncio.CancelledError:
+            await db.rollback()
+            await self.send({
+                "type": "cancelled",
+                "request_id": request_id,
+                "session_id": session_id
+            })
+        except (AdmissionRejected, CircuitOpenError) as e:
+            await db.rollback()
+            await self.send({
+                "type": "error",
+                "request_id": request_id,
+                "session_id": session_id,
+                "detail": str(e),
+                "status_code": e.status_code,
+                "retry_after": e.retry_after
+            })
+        except HTTPException as e:
+            await db.rollback()
+            await self.send({
+                "type": "error",
+                "request_id": request_id,
+                "session_id": session_id,
+                "detail": e.detail
+            })
+        except Exception as e:
+            await db.rollback()
+            await self.send({
+                "type": "error",
+                "request_id": request_id,
+                "session_id": session_id,
+                "detail": f"Failed to process message: {str(e)}"
+            })
+        finally:
+            await db.close()
+            if request.session_id:
+                self._release_session(request.session_id)
+            if session_id:
+                await self.send({
+                    "type": "typing",
+                    "request_id": request_id,
+                    "session_id": session_id,
+                    "is_typing": False
+                })
+    
+    def _release_session(self, session_id: str) -> None:
+        """Forget a session's lock once no turn holds or waits for it."""
+        self.session_turns[session_id] -= 1
+        if self.session_turns[session_id] <= 0:
+            del self.session_turns[session_id]
+            self.session_locks.pop(session_id, None)
+    
+    async def close(self) -> None:
+        """Cancel all in-flight turns."""
+        for task in list(self.tasks.values()):
+            task.cancel()
+        if self.tasks:
+            await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+
+@router.websocket("/ws")
+async def chat_websocket(websocket: WebSocket, token: str = Query(...)):
+    """
+    Multiplexed real-time chat over WebSocket.
+    
+    The client authenticates once with its access token (``?token=``), then
+    sends JSON events:
+    
+    - ``{"type": "message", "request_id", "content", "session_id"?, "profile_id"?}``
+    - ``{"type": "cancel", "request_id"}``
+    - ``{"type": "ping"}``
+    
+    The server replies with ``typing``, ``token``, ``done``, ``cancelled``,
+    ``error`` and ``pong`` events, each tagged with its ``request_id`` and
+    ``session_id``.
+    
+    Args:
+        websocket: WebSocket connection
+        token: JWT access token
+    """
+    async with AsyncSessionLocal() as db:
+        user = await authenticate_token(db, token)
+    
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    connection = ChatConnection(websocket, user)
+    try:
+        await connection.receive()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await connection.close()
+
+
+def _encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Encode a keyset position as an opaque cursor."""
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{row_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor returned by _encode_cursor.
+    
+    Raises:
+        HTTPException: If the cursor is malformed
+    """
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+async def _fetch_page(
+    db: AsyncSession,
+    query: Select,
+    key: Tuple[Any, Any],
+    limit: Optional[int],
+    before: Optional[str],
+    after: Optional[str],
+    newest_first: bool
+) -> Tuple[List[Row], bool]:
+    """
+    Fetch one page of rows by keyset pagination.
+    
+    Rows are ordered by a (timestamp, id) key, so each page is an index range
+    scan whose cost does not depend on how many rows precede it.
+    
+    Args:
+        db: Database session
+        query: Query selecting the rows, including the key columns
+        key: Timestamp and id columns ordering the rows
+        limit: Maximum number of rows, or None for all of them
+        before: Cursor of the row to page back from, towards older rows
+        after: Cursor of the row to page forward from, towards newer rows
+        newest_first: Whether the page is returned most recent first
+    
     Returns:
-        List[SessionResponse]: List of user's sessions
+        Tuple[List[Row], bool]: Rows of the page, and whether more rows
+        follow in the paging direction
+    
+    Raises:
+        HTTPException: If both cursors are given or a cursor is malformed
     """
-    sessions = db.query(ChatSession).filter(
-        ChatSession.user_id == current_user.id
-    ).order_by(ChatSession.last_activity.desc()).all()
+    if before and after:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either before or after, not both"
+        )
+    
+    # Scan away from the cursor, newest first unless paging forward
+    if after:
+        query = query.where(tuple_(*key) > _decode_cursor(after)).order_by(key[0], key[1])
+    else:
+        if before:
+            query = query.where(tuple_(*key) < _decode_cursor(before))
+        query = query.order_by(key[0].desc(), key[1].desc())
     
-    return [
+    result = await db.execute(query.limit(limit + 1) if limit is not None else query)
+    rows = result.all()
+    has_more = limit is not None and len(rows) > limit
+    rows = rows[:limit]
+    if newest_first == bool(after):
+        rows.reverse()
+    return rows, has_more
+
+
+@router.get("/sessions", response_model=Union[SessionListResponse, List[SessionResponse]])
+async def get_sessions(
+    limit: Optional[int] = Query(None, ge=1, le=settings.service.max_page_size),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get the user's chat sessions, most recently active first.
+    
+    Without paging parameters all sessions are returned as a plain list, as
+    before pagination. With ``limit``, ``before`` or ``after``, one page is
+    returned in a SessionListResponse, ``limit`` defaulting to the page size.
+    
+    Args:
+        limit: Maximum number of sessions
+        before: Cursor from a previous page, to get less recently active sessions
+        after: Cursor from a previous page, to get more recently active sessions
+        current_user: Current authenticated user
+        db: Database session
+    
+    Returns:
+        Union[SessionListResponse, List[SessionResponse]]: Page of the
+        user's sessions, or all of them without paging parameters
+    """
+    paged = limit is not None or bool(before or after)
+    query = select(
+        ChatSession.id,
+        ChatSession.session_id,
+        ChatSession.title,
+        ChatSession.is_active,
+        ChatSession.created_at,
+        ChatSession.last_activity,
+        ChatSession.profile_id
+    ).where(ChatSession.user_id == current_user.id)
+    sessions, has_more = await _fetch_page(
+        db,
+        query,
+        (ChatSession.last_activity, ChatSession.id),
+        (limit or settings.service.page_size) if paged else None,
+        before,
+        after,
+        newest_first=True
+    )
+    
+    responses = [
         SessionResponse(
             session_id=session.session_id,
             title=session.title,
@@ -286,32 +925,67 @@ async def get_sessions(
         )
         for session in sessions
     ]
+    if not paged:
+        return responses
+    
+    return SessionListResponse(
+        sessions=responses,
+        has_more=has_more,
+        before_cursor=_encode_cursor(sessions[-1].last_activity, sessions[-1].id) if sessions else before,
+        after_cursor=_encode_cursor(sessions[0].last_activity, sessions[0].id) if sessions else after
+    )
 
 
 @router.get("/history/{session_id}", response_model=ChatHistoryResponse)
 async def get_chat_history(
     session_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=settings.service.max_page_size),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
-    Get chat history for a specific session.
+    Get the chat history of a session, oldest message first.
+    
+    Without paging parameters the full history is returned, as before
+    pagination. With ``limit``, ``before`` or ``after``, one page is
+    returned, ``limit`` defaulting to the page size; without a cursor, the
+    page holds the most recent messages.
     
     Args:
         session_id: Session ID
+        limit: Maximum number of messages
+        before: Cursor from a previous page, to get older messages
+        after: Cursor from a previous page, to get newer messages
         current_user: Current authenticated user
         db: Database session
-        
+    
     Returns:
-        ChatHistoryResponse: Chat history with messages
-        
+        ChatHistoryResponse: Chat history with all messages or a page of them
+    
     Raises:
         HTTPException: If session not found
     """
-    session = db.query(ChatSession).filter(
+    if limit is None and (before or after):
+        limit = settings.service.page_size
+    
+    # Include write-behind replies that are not committed yet
+    if settings.database.write_behind:
+        await get_message_writer().wait_for_session(session_id)
+    
+    result = await db.execute(select(
+        ChatSession.id,
+        ChatSession.session_id,
+        ChatSession.title,
+        ChatSession.created_at,
+        ChatSession.last_activity,
+        ChatSession.archived_at
+    ).where(
         ChatSession.session_id == session_id,
         ChatSession.user_id == current_user.id
-    ).first()
+    ))
+    session = result.first()
     
     if not session:
         raise HTTPException(
@@ -319,9 +993,34 @@ async def get_chat_history(
             detail="Session not found"
         )
     
-    messages = db.query(Message).filter(
-        Message.session_id == session.id
-    ).order_by(Message.created_at).all()
+    query = select(
+        Message.id,
+        Message.message_id,
+        Message.content,
+        Message.role,
+        Message.created_at,
+        Message.tokens_used,
+        Message.response_time,
+        Message.message_metadata
+    ).where(Message.session_id == session.id)
+    messages, has_more = await _fetch_page(
+        db, query, (Message.created_at, Message.id), limit, before, after, newest_first=False
+    )
+    
+    # Archived sessions keep their messages in compressed blocks, apart
+    # from any written while the session was being archived
+    if session.archived_at is not None:
+        archived, archived_more = await get_session_archiver().read_page(
+            db,
+            session.id,
+            limit,
+            _decode_cursor(before) if before else None,
+            _decode_cursor(after) if after else None
+        )
+        messages = sorted([*messages, *archived], key=lambda msg: (msg.created_at, msg.id))
+        if limit is not None:
+            has_more = has_more or archived_more or len(messages) > limit
+            messages = messages[:limit] if after else messages[-limit:]
     
     return ChatHistoryResponse(
         session_id=session.session_id,
@@ -333,20 +1032,63 @@ async def get_chat_history(
                 role=msg.role,
                 timestamp=msg.created_at,
                 tokens_used=msg.tokens_used,
-                response_time=float(msg.response_time) if msg.response_time else None
+                response_time=float(msg.response_time) if msg.response_time else None,
+                provider=json.loads(msg.message_metadata).get("provider") if msg.message_metadata else None
             )
             for msg in messages
         ],
         created_at=session.created_at,
-        last_activity=session.last_activity
+        last_activity=session.last_activity,
+        has_more=has_more,
+        before_cursor=_encode_cursor(messages[0].created_at, messages[0].id) if messages else before,
+        after_cursor=_encode_cursor(messages[-1].created_at, messages[-1].id) if messages else after
     )
 
 
+async def _delete_sessions(db: AsyncSession, user: User, session_ids: List[str]) -> List[str]:
+    """
+    Delete a user's sessions with set-based statements.
+    
+    Messages and archive blocks are deleted by the database's ON DELETE
+    CASCADE rather than loaded and deleted one by one.
+    
+    Args:
+        db: Database session
+        user: User owning the sessions
+        session_ids: Session IDs
+    
+    Returns:
+        List[str]: IDs of the sessions deleted
+    """
+    # Include write-behind replies that are not committed yet
+    if settings.database.write_behind:
+        writer = get_message_writer()
+        await asyncio.gather(*(writer.wait_for_session(session_id) for session_id in session_ids))
+    
+    result = await db.execute(select(ChatSession.id, ChatSession.session_id).where(
+        ChatSession.session_id.in_(session_ids),
+        ChatSession.user_id == user.id
+    ))
+    sessions = result.all()
+    if not sessions:
+        return []
+    
+    await db.execute(delete(ChatSession).where(ChatSession.id.in_([row.id for row in sessions])))
+    record_writers(db, [user.id])
+    await db.commit()
+    
+    for row in sessions:
+        get_memory_index().remove_session(row.id)
+        get_history_cache().invalidate(row.id)
+    CHAT_SESSIONS_DELETED.labels(reason="user").inc(len(sessions))
+    return [row.session_id for row in sessions]
+
+
 @router.delete("/sessions/{session_id}")
 async def delete_session(
     session_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Delete a chat session.
@@ -355,22 +1097,39 @@ async def delete_session(
         session_id: Session ID
         current_user: Current authenticated user
         db: Database session
-        
+    
     Raises:
         HTTPException: If session not found
     """
-    session = db.query(ChatSession).filter(
-        ChatSession.session_id == session_id,
-        ChatSession.user_id == current_user.id
-    ).first()
-    
-    if not session:
+    if not await _delete_sessions(db, current_user, [session_id]):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Session not found"
         )
     
-    db.delete(session)
-    db.commit()
+    return {"message": "Session deleted successfully"}
+
+
+@router.post("/sessions/delete", response_model=DeleteSessionsResponse)
+async def delete_sessions(
+    request: DeleteSessionsRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Delete several chat sessions in one transaction.
+    
+    Args:
+        request: IDs of the sessions to delete
+        current_user: Current authenticated user
+        db: Database session
     
-    return {"message": "Session deleted successfully"} 
\ No newline at end of file
+    Returns:
+        DeleteSessionsResponse: Sessions deleted and sessions not found
+    """
+    session_ids = list(dict.fromkeys(request.session_ids))
+    deleted = set(await _delete_sessions(db, current_user, session_ids))
+    return DeleteSessionsResponse(
+        deleted=[session_id for session_id in session_ids if session_id in deleted],
+        not_found=[session_id for session_id in session_ids if session_id not in deleted]
+    )
@@ -6,15 +6,16 @@ and monitoring information.
 """
 
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from app.config import get_settings
-from app.database.session import get_db
-from app.services.llm_service import LLMService
+from app.database.session import get_db, get_replica_router
+from app.services.llm_service import get_llm_service
 
 router = APIRouter()
 settings = get_settings()
-llm_service = LLMService()
+llm_service = get_llm_service()
 
 
 class HealthResponse(BaseModel):
@@ -28,8 +29,10 @@ class HealthResponse(BaseModel):
 class ServiceStatus(BaseModel):
     """Service status response model."""
     database: bool
+    database_replicas: list = []
     llm_providers: dict
     available_providers: list
+    provider_health: dict
 
 
 @router.get("/health", response_model=HealthResponse)
@@ -49,7 +52,7 @@ async def health_check():
 
 
 @router.get("/status", response_model=ServiceStatus)
-async def service_status(db: Session = Depends(get_db)):
+async def service_status(db: AsyncSession = Depends(get_db)):
     """
     Detailed service status check.
     
@@ -61,12 +64,12 @@ async def service_status(db: Session = Depends(get_db)):
     """
     # Check database connection
     try:
-        db.execute("SELECT 1")
+        await db.execute(text("SELECT 1"))
         database_healthy = True
     except Exception:
         database_healthy = False
     
-    # Check LLM providers
+    # Check LLM providers (cached state from the background health checks)
     available_providers = llm_service.get_available_providers()
     provider_status = {}
     
@@ -75,6 +78,8 @@ async def service_status(db: Session = Depends(get_db)):
     
     return ServiceStatus(
         database=database_healthy,
+        database_replicas=get_replica_router().status() if get_replica_router() is not None else [],
         llm_providers=provider_status,
-        available_providers=available_providers
+        available_providers=available_providers,
+        provider_health=llm_service.get_provider_health()
     ) 
\ No newline at end of file
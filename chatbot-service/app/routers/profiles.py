@@ -7,12 +7,16 @@ chatbot profiles with different personalities and system instructions.
 
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field
 from app.core.security import get_current_user
-from app.database.session import get_db
+from app.database.session import get_db, get_read_db, record_writers
 from app.models.user import User
 from app.models.profile import Profile
+from app.models.session import Session as ChatSession
+from app.services.history_cache import get_history_cache
+from app.services.memory_index import get_memory_index
 
 router = APIRouter()
 
@@ -24,8 +28,14 @@ class ProfileCreate(BaseModel):
     system_instructions: str = Field(..., min_length=1)
     llm_provider: str = Field(default="lm_studio")
     llm_model: Optional[str] = None
+    fallback_providers: Optional[str] = None
+    hedging_enabled: bool = Field(default=False)
     temperature: str = Field(default="0.7")
     max_tokens: int = Field(default=1000, ge=1, le=4000)
+    context_token_budget: Optional[int] = Field(default=None, ge=1)
+    summarization_enabled: bool = Field(default=False)
+    memory_enabled: bool = Field(default=False)
+    response_cache_enabled: bool = Field(default=False)
     is_default: bool = Field(default=False)
 
 
@@ -36,8 +46,14 @@ class ProfileUpdate(BaseModel):
     system_instructions: Optional[str] = Field(None, min_length=1)
     llm_provider: Optional[str] = None
     llm_model: Optional[str] = None
+    fallback_providers: Optional[str] = None
+    hedging_enabled: Optional[bool] = None
     temperature: Optional[str] = None
     max_tokens: Optional[int] = Field(None, ge=1, le=4000)
+    context_token_budget: Optional[int] = Field(None, ge=1)
+    summarization_enabled: Optional[bool] = None
+    memory_enabled: Optional[bool] = None
+    response_cache_enabled: Optional[bool] = None
     is_default: Optional[bool] = None
     is_active: Optional[bool] = None
 
@@ -50,8 +66,14 @@ class ProfileResponse(BaseModel):
     system_instructions: str
     llm_provider: str
     llm_model: Optional[str]
+    fallback_providers: Optional[str]
+    hedging_enabled: bool
     temperature: str
     max_tokens: int
+    context_token_budget: Optional[int]
+    summarization_enabled: bool
+    memory_enabled: bool
+    response_cache_enabled: bool
     is_default: bool
     is_active: bool
     created_at: str
@@ -62,7 +84,7 @@ class ProfileResponse(BaseModel):
 async def create_profile(
     profile_data: ProfileCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Create a new chatbot profile.
@@ -79,10 +101,11 @@ async def create_profile(
         HTTPException: If profile creation fails
     """
     # Check if profile name already exists for this user
-    existing_profile = db.query(Profile).filter(
+    result = await db.execute(select(Profile).where(
         Profile.name == profile_data.name,
         Profile.user_id == current_user.id
-    ).first()
+    ))
+    existing_profile = result.scalars().first()
     
     if existing_profile:
         raise HTTPException(
@@ -92,10 +115,11 @@ async def create_profile(
     
     # If this is set as default, unset other defaults
     if profile_data.is_default:
-        db.query(Profile).filter(
+        await db.execute(update(Profile).where(
             Profile.user_id == current_user.id,
             Profile.is_default == True
-        ).update({"is_default": False})
+        ).values(is_default=False))
+        record_writers(db, [current_user.id])
     
     # Create new profile
     profile = Profile(
@@ -104,8 +128,8 @@ async def create_profile(
     )
     
     db.add(profile)
-    db.commit()
-    db.refresh(profile)
+    await db.commit()
+    await db.refresh(profile)
     
     return ProfileResponse(
         id=profile.id,
@@ -114,8 +138,14 @@ async def create_profile(
         system_instructions=profile.system_instructions,
         llm_provider=profile.llm_provider,
         llm_model=profile.llm_model,
+        fallback_providers=profile.fallback_providers,
+        hedging_enabled=bool(profile.hedging_enabled),
         temperature=profile.temperature,
         max_tokens=profile.max_tokens,
+        context_token_budget=profile.context_token_budget,
+        summarization_enabled=bool(profile.summarization_enabled),
+        memory_enabled=bool(profile.memory_enabled),
+        response_cache_enabled=bool(profile.response_cache_enabled),
         is_default=profile.is_default,
         is_active=profile.is_active,
         created_at=profile.created_at.isoformat(),
@@ -126,7 +156,7 @@ async def create_profile(
 @router.get("/", response_model=List[ProfileResponse])
 async def get_profiles(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get all profiles for the current user.
@@ -138,9 +168,10 @@ async def get_profiles(
     Returns:
         List[ProfileResponse]: List of user's profiles
     """
-    profiles = db.query(Profile).filter(
+    result = await db.execute(select(Profile).where(
         Profile.user_id == current_user.id
-    ).order_by(Profile.is_default.desc(), Profile.name).all()
+    ).order_by(Profile.is_default.desc(), Profile.name))
+    profiles = result.scalars().all()
     
     return [
         ProfileResponse(
@@ -150,8 +181,14 @@ async def get_profiles(
             system_instructions=profile.system_instructions,
             llm_provider=profile.llm_provider,
             llm_model=profile.llm_model,
+            fallback_providers=profile.fallback_providers,
+            hedging_enabled=bool(profile.hedging_enabled),
             temperature=profile.temperature,
             max_tokens=profile.max_tokens,
+            context_token_budget=profile.context_token_budget,
+            summarization_enabled=bool(profile.summarization_enabled),
+            memory_enabled=bool(profile.memory_enabled),
+            response_cache_enabled=bool(profile.response_cache_enabled),
             is_default=profile.is_default,
             is_active=profile.is_active,
             created_at=profile.created_at.isoformat(),
@@ -165,7 +202,7 @@ async def get_profiles(
 async def get_profile(
     profile_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get a specific profile by ID.
@@ -181,10 +218,11 @@ async def get_profile(
     Raises:
         HTTPException: If profile not found
     """
-    profile = db.query(Profile).filter(
+    result = await db.execute(select(Profile).where(
         Profile.id == profile_id,
         Profile.user_id == current_user.id
-    ).first()
+    ))
+    profile = result.scalars().first()
     
     if not profile:
         raise HTTPException(
@@ -199,8 +237,14 @@ async def get_profile(
         system_instructions=profile.system_instructions,
         llm_provider=profile.llm_provider,
         llm_model=profile.llm_model,
+        fallback_providers=profile.fallback_providers,
+        hedging_enabled=bool(profile.hedging_enabled),
         temperature=profile.temperature,
         max_tokens=profile.max_tokens,
+        context_token_budget=profile.context_token_budget,
+        summarization_enabled=bool(profile.summarization_enabled),
+        memory_enabled=bool(profile.memory_enabled),
+        response_cache_enabled=bool(profile.response_cache_enabled),
         is_default=profile.is_default,
         is_active=profile.is_active,
         created_at=profile.created_at.isoformat(),
@@ -213,7 +257,7 @@ async def update_profile(
     profile_id: int,
     profile_data: ProfileUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Update a profile.
@@ -230,10 +274,11 @@ async def update_profile(
     Raises:
         HTTPException: If profile not found or update fails
     """
-    profile = db.query(Profile).filter(
+    result = await db.execute(select(Profile).where(
         Profile.id == profile_id,
         Profile.user_id == current_user.id
-    ).first()
+    ))
+    profile = result.scalars().first()
     
     if not profile:
         raise HTTPException(
@@ -243,11 +288,12 @@ async def update_profile(
     
     # Check if name change conflicts with existing profile
     if profile_data.name and profile_data.name != profile.name:
-        existing_profile = db.query(Profile).filter(
+        result = await db.execute(select(Profile).where(
             Profile.name == profile_data.name,
             Profile.user_id == current_user.id,
             Profile.id != profile_id
-        ).first()
+        ))
+        existing_profile = result.scalars().first()
         
         if existing_profile:
             raise HTTPException(
@@ -257,19 +303,20 @@ async def update_profile(
     
     # If setting as default, unset other defaults
     if profile_data.is_default:
-        db.query(Profile).filter(
+        await db.execute(update(Profile).where(
             Profile.user_id == current_user.id,
             Profile.is_default == True,
             Profile.id != profile_id
-        ).update({"is_default": False})
+        ).values(is_default=False))
+        record_writers(db, [current_user.id])
     
     # Update profile fields
     update_data = profile_data.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(profile, field, value)
     
-    db.commit()
-    db.refresh(profile)
+    await db.commit()
+    await db.refresh(profile)
     
     return ProfileResponse(
         id=profile.id,
@@ -278,8 +325,14 @@ async def update_profile(
         system_instructions=profile.system_instructions,
         llm_provider=profile.llm_provider,
         llm_model=profile.llm_model,
+        fallback_providers=profile.fallback_providers,
+        hedging_enabled=bool(profile.hedging_enabled),
         temperature=profile.temperature,
         max_tokens=profile.max_tokens,
+        context_token_budget=profile.context_token_budget,
+        summarization_enabled=bool(profile.summarization_enabled),
+        memory_enabled=bool(profile.memory_enabled),
+        response_cache_enabled=bool(profile.response_cache_enabled),
         is_default=profile.is_default,
         is_active=profile.is_active,
         created_at=profile.created_at.isoformat(),
@@ -291,7 +344,7 @@ async def update_profile(
 async def delete_profile(
     profile_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Delete a profile.
@@ -304,10 +357,11 @@ async def delete_profile(
     Raises:
         HTTPException: If profile not found
     """
-    profile = db.query(Profile).filter(
+    result = await db.execute(select(Profile).where(
         Profile.id == profile_id,
         Profile.user_id == current_user.id
-    ).first()
+    ))
+    profile = result.scalars().first()
     
     if not profile:
         raise HTTPException(
@@ -316,9 +370,9 @@ async def delete_profile(
         )
     
     # Don't allow deletion of the last profile
-    profile_count = db.query(Profile).filter(
+    profile_count = await db.scalar(select(func.count(Profile.id)).where(
         Profile.user_id == current_user.id
-    ).count()
+    ))
     
     if profile_count <= 1:
         raise HTTPException(
@@ -326,7 +380,13 @@ async def delete_profile(
             detail="Cannot delete the last profile"
         )
     
-    db.delete(profile)
-    db.commit()
+    # Sessions and messages are deleted by the database's ON DELETE CASCADE
+    session_ids = list(await db.scalars(select(ChatSession.id).where(ChatSession.profile_id == profile.id)))
+    await db.delete(profile)
+    await db.commit()
+    
+    for session_id in session_ids:
+        get_memory_index().remove_session(session_id)
+        get_history_cache().invalidate(session_id)
     
     return {"message": "Profile deleted successfully"} 
\ No newline at end of file
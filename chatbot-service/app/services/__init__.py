@@ -5,8 +5,9 @@ This module contains service classes that handle business logic,
 LLM provider integrations, and external API communications.
 """
 
-from .llm_service import LLMService
+from .llm_service import LLMService, get_llm_service
 
 __all__ = [
-    "LLMService"
+    "LLMService",
+    "get_llm_service"
 ] 
\ No newline at end of file
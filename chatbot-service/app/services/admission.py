@@ -0,0 +1,254 @@
+"""
+Admission control for LLM provider calls.
+
+This module limits how many requests run against a provider at once and
+queues the excess in a bounded wait queue, rejecting requests quickly when
+the provider is saturated. The limit can be tuned at runtime from observed
+latency and errors by an adaptive (AIMD) limit.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Optional
+from app.core.metrics import (
+    LLM_ADAPTIVE_LIMIT,
+    LLM_ADAPTIVE_LIMIT_DECISIONS,
+    LLM_ADMISSION_IN_FLIGHT,
+    LLM_ADMISSION_QUEUE_DEPTH,
+    LLM_ADMISSION_REJECTED,
+    LLM_ADMISSION_WAIT
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a provider cannot accept more requests."""
+    
+    def __init__(self, provider: str, reason: str, retry_after: int):
+        self.provider = provider
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"LLM provider '{provider}' is overloaded ({reason}), retry after {retry_after}s")
+    
+    @property
+    def status_code(self) -> int:
+        """HTTP status code to report: 429 for a full queue, 503 for a queue timeout."""
+        return 429 if self.reason == "queue_full" else 503
+
+
+class AdmissionSample:
+    """Outcome of a request that held an admission slot."""
+    
+    def __init__(self):
+        self.tokens: Optional[int] = None
+
+
+class AIMDLimit:
+    """
+    Additive-increase/multiplicative-decrease concurrency limit.
+    
+    Each completed request is a latency sample, normalized per token when
+    the token count is known so that long completions do not look like
+    congestion. A fast-moving latency average is compared with a slow-moving
+    baseline: if it exceeds ``tolerance`` times the baseline, or the request
+    failed transiently, the limit is multiplied by ``backoff``, at most once
+    per round trip. Otherwise, while the limit is fully used, it grows by
+    roughly one per round trip.
+    """
+    
+    def __init__(
+        self,
+        provider: str,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        tolerance: float = 2.0,
+        backoff: float = 0.9
+    ):
+        self.provider = provider
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self._limit = float(min(max(initial, min_limit), max_limit))
+        self.short_latency: Optional[float] = None
+        self.baseline_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        LLM_ADAPTIVE_LIMIT.labels(provider=provider).set(self.limit)
+    
+    @property
+    def limit(self) -> int:
+        """Current concurrency limit."""
+        return int(self._limit)
+    
+    def on_sample(self, latency: float, tokens: Optional[int], error: bool, in_flight: int) -> int:
+        """
+        Update the limit from a completed request.
+        
+        Args:
+            latency: Request latency in seconds
+            tokens: Tokens used by the request, if known
+            error: Whether the request failed
+            in_flight: Requests in flight when the sample was taken
+        
+        Returns:
+            int: Updated concurrency limit
+        """
+        if not error:
+            sample = latency / tokens if tokens else latency
+            if self.short_latency is None:
+                self.short_latency = self.baseline_latency = sample
+            else:
+                self.short_latency = 0.7 * self.short_latency + 0.3 * sample
+                self.baseline_latency = 0.98 * self.baseline_latency + 0.02 * sample
+        
+        congested = (
+            self.short_latency is not None
+            and self.short_latency > self.baseline_latency * self.tolerance
+        )
+        
+        now = time.monotonic()
+        if error or congested:
+            if now - self._last_decrease >= latency:
+                self._limit = max(self.min_limit, self._limit * self.backoff)
+                self._last_decrease = now
+                decision = "decrease"
+            else:
+                decision = "hold"
+        elif in_flight >= self.limit:
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+            decision = "increase"
+        else:
+            decision = "hold"
+        
+        LLM_ADAPTIVE_LIMIT_DECISIONS.labels(provider=self.provider, decision=decision).inc()
+        LLM_ADAPTIVE_LIMIT.labels(provider=self.provider).set(self.limit)
+        return self.limit
+
+
+class AdmissionController:
+    """
+    Concurrency limiter with a bounded FIFO wait queue.
+    
+    At most ``limit`` requests hold a slot at once. Further requests wait in
+    a queue of at most ``max_queue`` entries for up to ``queue_timeout``
+    seconds; beyond that they are rejected with ``AdmissionRejected``.
+    """
+    
+    def __init__(
+        self,
+        provider: str,
+        limit: int,
+        max_queue: int,
+        queue_timeout: float,
+        adaptive: Optional[AIMDLimit] = None
+    ):
+        self.provider = provider
+        self.limit = adaptive.limit if adaptive else limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.adaptive = adaptive
+        self.active = 0
+        self.avg_service_time = 1.0
+        self._waiters: Deque[asyncio.Future] = deque()
+    
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests waiting for a slot."""
+        return len(self._waiters)
+    
+    def retry_after(self) -> int:
+        """Estimate the seconds until a new request could be admitted."""
+        estimate = (self.queue_depth + 1) * self.avg_service_time / max(self.limit, 1)
+        return max(1, math.ceil(estimate))
+    
+    async def acquire(self) -> None:
+        """
+        Acquire a slot, waiting in the queue if necessary.
+        
+        Raises:
+            AdmissionRejected: If the queue is full or the wait times out
+        """
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self._update_gauges()
+            LLM_ADMISSION_WAIT.labels(provider=self.provider).observe(0)
+            return
+        
+        if len(self._waiters) >= self.max_queue:
+            LLM_ADMISSION_REJECTED.labels(provider=self.provider, reason="queue_full").inc()
+            raise AdmissionRejected(self.provider, "queue_full", self.retry_after())
+        
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._update_gauges()
+        start_time = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            LLM_ADMISSION_REJECTED.labels(provider=self.provider, reason="queue_timeout").inc()
+            raise AdmissionRejected(self.provider, "queue_timeout", self.retry_after())
+        except asyncio.CancelledError:
+            # The slot may have been granted just before cancellation
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            LLM_ADMISSION_WAIT.labels(provider=self.provider).observe(time.monotonic() - start_time)
+            self._update_gauges()
+    
+    def release(self) -> None:
+        """Release a slot and admit queued requests."""
+        self.active -= 1
+        self._wake()
+    
+    def _wake(self) -> None:
+        """Hand free slots to queued requests in FIFO order."""
+        while self._waiters and self.active < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self.active += 1
+        self._update_gauges()
+    
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[AdmissionSample]:
+        """
+        Hold a slot for the duration of the block.
+        
+        Yields:
+            AdmissionSample: Sample on which the caller may record the token
+            count used by the request
+        
+        Exceptions raised in the block count as errors of the adaptive limit
+        unless they are marked as not ``transient``.
+        """
+        await self.acquire()
+        sample = AdmissionSample()
+        start_time = time.monotonic()
+        error = False
+        try:
+            yield sample
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Only overload-like failures should shrink the limit, not bad requests
+            error = getattr(e, "transient", True)
+            raise
+        finally:
+            # Exponentially weighted service time for Retry-After estimates
+            elapsed = time.monotonic() - start_time
+            self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * elapsed
+            
+            if self.adaptive is not None:
+                self.limit = self.adaptive.on_sample(elapsed, sample.tokens, error, self.active)
+            self.release()
+    
+    def _update_gauges(self) -> None:
+        """Update Prometheus gauges with the limiter state."""
+        LLM_ADMISSION_QUEUE_DEPTH.labels(provider=self.provider).set(len(self._waiters))
+        LLM_ADMISSION_IN_FLIGHT.labels(provider=self.provider).set(self.active)
@@ -0,0 +1,348 @@
+"""
+Archival of cold chat sessions into compressed message blocks.
+
+This module moves the messages of sessions inactive beyond a threshold
+into zlib-compressed blocks in the message_archives table, reads archived
+history page by page, and restores a session when a new turn revives it.
+"""
+
+import asyncio
+import json
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional, Tuple
+from sqlalchemy import delete, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+import structlog
+from app.config import get_settings
+from app.core.metrics import CHAT_ARCHIVE_BYTES, CHAT_ARCHIVE_READ_LATENCY, CHAT_ARCHIVE_SESSIONS
+from app.database.session import AsyncSessionLocal, async_shard_engines
+from app.models.message import Message
+from app.models.message_archive import MessageArchive
+from app.models.session import Session as ChatSession
+
+# Get settings
+settings = get_settings()
+
+logger = structlog.get_logger(__name__)
+
+# Messages deleted per statement once archived
+DELETE_BATCH_SIZE = 500
+
+
+class ArchivedMessage(NamedTuple):
+    """All column values of an archived message."""
+    id: int
+    message_id: str
+    content: str
+    role: str
+    is_user_message: bool
+    tokens_used: Optional[int]
+    response_time: Optional[str]
+    message_metadata: Optional[str]
+    user_id: int
+    session_id: int
+    profile_id: int
+    created_at: datetime
+    updated_at: datetime
+    
+    @property
+    def key(self) -> Tuple[datetime, int]:
+        return self.created_at, self.id
+
+
+# Message columns in the order of ArchivedMessage
+MESSAGE_COLUMNS = [Message.__table__.c[name] for name in ArchivedMessage._fields]
+
+
+def encode_block(messages: List[ArchivedMessage], level: int) -> Tuple[bytes, int]:
+    """
+    Compress a block of messages.
+    
+    Args:
+        messages: Messages in chronological order
+        level: zlib compression level
+    
+    Returns:
+        Tuple[bytes, int]: Compressed block and its uncompressed size
+    """
+    raw = json.dumps(
+        [[*message[:-2], message.created_at.isoformat(), message.updated_at.isoformat()] for message in messages],
+        separators=(",", ":")
+    ).encode("utf-8")
+    return zlib.compress(raw, level), len(raw)
+
+
+def decode_block(data: bytes) -> List[ArchivedMessage]:
+    """Decompress a block of messages encoded by encode_block."""
+    return [
+        ArchivedMessage(*values[:-2], datetime.fromisoformat(values[-2]), datetime.fromisoformat(values[-1]))
+        for values in json.loads(zlib.decompress(data))
+    ]
+
+
+class SessionArchiver:
+    """
+    Archive the messages of cold sessions in the background.
+    
+    Every ``interval`` seconds, sessions without activity for ``after_days``
+    days are archived, on the directory and on every shard: the session is
+    marked archived, then its messages are compressed in blocks of
+    ``block_messages`` and deleted from the messages table, one transaction
+    per block. Archived history, read from the blocks and any messages not
+    archived yet, stays readable, and a new turn on an archived session
+    restores its messages first, which stops archiving it.
+    """
+    
+    def __init__(
+        self,
+        after_days: float,
+        interval: float,
+        batch_sessions: int,
+        block_messages: int,
+        compression_level: int
+    ):
+        self.after_days = after_days
+        self.interval = interval
+        self.batch_sessions = batch_sessions
+        self.block_messages = block_messages
+        self.compression_level = compression_level
+        self._worker: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """Start the periodic archival runs."""
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+    
+    async def shutdown(self) -> None:
+        """Stop the periodic archival runs."""
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+    
+    async def archive_cold_sessions(self) -> int:
+        """
+        Archive all sessions inactive for longer than the threshold.
+        
+        Returns:
+            int: Number of sessions archived
+        """
+        cutoff = datetime.utcnow() - timedelta(days=self.after_days)
+        archived = 0
+        for shard in [None, *async_shard_engines]:
+            last_key: Optional[Tuple[datetime, int]] = None
+            while True:
+                async with AsyncSessionLocal(info={"shard": shard}) as db:
+                    query = select(ChatSession.id, ChatSession.last_activity).where(
+                        ChatSession.archived_at.is_(None),
+                        ChatSession.last_activity < cutoff
+                    )
+                    if last_key is not None:
+                        query = query.where(tuple_(ChatSession.last_activity, ChatSession.id) > last_key)
+                    result = await db.execute(query.order_by(
+                        ChatSession.last_activity, ChatSession.id
+                    ).limit(self.batch_sessions))
+                    sessions = result.all()
+                
+                for session_id, _ in sessions:
+                    if await self._archive_session(shard, session_id, cutoff):
+                        archived += 1
+                if len(sessions) < self.batch_sessions:
+                    break
+                last_key = (sessions[-1].last_activity, sessions[-1].id)
+        return archived
+    
+    async def read_page(
+        self,
+        db: AsyncSession,
+        session_id: int,
+        limit: Optional[int],
+        before: Optional[Tuple[datetime, int]],
+        after: Optional[Tuple[datetime, int]]
+    ) -> Tuple[List[ArchivedMessage], bool]:
+        """
+        Read one page of an archived session's history.
+        
+        Only the blocks overlapping the page are read and decompressed.
+        
+        Args:
+            db: Database session
+            session_id: Primary key of the chat session
+            limit: Maximum number of messages, or None for all of them
+            before: Key of the message to page back from, towards older messages
+            after: Key of the message to page forward from, towards newer messages
+        
+        Returns:
+            Tuple[List[ArchivedMessage], bool]: Messages of the page, oldest
+            first, and whether more messages follow in the paging direction
+        """
+        started = time.perf_counter()
+        query = select(MessageArchive.data).where(MessageArchive.session_id == session_id)
+        if after:
+            query = query.where(
+                tuple_(MessageArchive.last_created_at, MessageArchive.last_message_id) > after
+            ).order_by(MessageArchive.first_created_at, MessageArchive.first_message_id)
+        else:
+            if before:
+                query = query.where(
+                    tuple_(MessageArchive.first_created_at, MessageArchive.first_message_id) < before
+                )
+            query = query.order_by(MessageArchive.first_created_at.desc(), MessageArchive.first_message_id.desc())
+        
+        # Collect messages away from the cursor until the page is full
+        messages: List[ArchivedMessage] = []
+        result = await db.stream_scalars(query)
+        try:
+            async for data in result:
+                block = decode_block(data)
+                if after:
+                    messages.extend(message for message in block if message.key > after)
+                else:
+                    messages.extend(message for message in reversed(block) if not before or message.key < before)
+                if limit is not None and len(messages) > limit:
+                    break
+        finally:
+            await result.close()
+        
+        has_more = limit is not None and len(messages) > limit
+        messages = messages[:limit]
+        if not after:
+            messages.reverse()
+        CHAT_ARCHIVE_READ_LATENCY.observe(time.perf_counter() - started)
+        return messages, has_more
+    
+    async def restore(self, db: AsyncSession, session: ChatSession) -> None:
+        """
+        Move an archived session's messages back into the messages table.
+        
+        The restore is committed with the caller's transaction.
+        
+        Args:
+            db: Database session
+            session: Archived chat session
+        """
+        # Lock the session first, so no archive block is written meanwhile
+        await db.execute(update(ChatSession).where(ChatSession.id == session.id).values(archived_at=None))
+        result = await db.execute(select(MessageArchive.data).where(
+            MessageArchive.session_id == session.id
+        ).order_by(MessageArchive.first_created_at, MessageArchive.first_message_id))
+        for data in result.scalars():
+            await db.execute(insert(Message), [message._asdict() for message in decode_block(data)])
+        await db.execute(delete(MessageArchive).where(MessageArchive.session_id == session.id))
+        session.archived_at = None
+        CHAT_ARCHIVE_SESSIONS.labels(operation="restored").inc()
+    
+    async def _run(self) -> None:
+        """Archive cold sessions periodically."""
+        while True:
+            try:
+                archived = await self.archive_cold_sessions()
+                if archived:
+                    logger.info("Archived inactive chat sessions", count=archived)
+            except Exception as e:
+                logger.error("Session archival failed", exc_info=e)
+            await asyncio.sleep(self.interval)
+    
+    async def _archive_session(self, shard: Optional[str], session_id: int, cutoff: datetime) -> bool:
+        """
+        Archive one session, unless it became active again.
+        
+        The session is claimed in one transaction, then its messages up to
+        the last one at claim time are archived one block per transaction,
+        so no transaction loads or locks more than ``block_messages``
+        messages. Archiving stops if a new turn restores the session in
+        between; blocks already written are restored with it.
+        
+        Returns:
+            bool: Whether the session was claimed
+        """
+        claimed_at = datetime.utcnow()
+        async with AsyncSessionLocal(info={"shard": shard}) as db:
+            # Claim the session first, so a concurrent turn finds it archived
+            result = await db.execute(update(ChatSession).where(
+                ChatSession.id == session_id,
+                ChatSession.archived_at.is_(None),
+                ChatSession.last_activity < cutoff
+            ).values(archived_at=claimed_at))
+            if result.rowcount != 1:
+                await db.rollback()
+                return False
+            
+            # Messages written after the claim are left in place
+            result = await db.execute(select(Message.created_at, Message.id).where(
+                Message.session_id == session_id
+            ).order_by(Message.created_at.desc(), Message.id.desc()).limit(1))
+            end_key = result.first()
+            await db.commit()
+        CHAT_ARCHIVE_SESSIONS.labels(operation="archived").inc()
+        
+        last_key: Optional[Tuple[datetime, int]] = None
+        while end_key is not None:
+            async with AsyncSessionLocal(info={"shard": shard}) as db:
+                # Lock the session, and stop if a turn restored it meanwhile
+                result = await db.execute(update(ChatSession).where(
+                    ChatSession.id == session_id,
+                    ChatSession.archived_at == claimed_at
+                ).values(archived_at=claimed_at))
+                if result.rowcount != 1:
+                    await db.rollback()
+                    break
+                
+                query = select(*MESSAGE_COLUMNS).where(
+                    Message.session_id == session_id,
+                    tuple_(Message.created_at, Message.id) <= tuple(end_key)
+                )
+                if last_key is not None:
+                    query = query.where(tuple_(Message.created_at, Message.id) > last_key)
+                result = await db.execute(query.order_by(Message.created_at, Message.id).limit(self.block_messages))
+                messages = [ArchivedMessage(*row) for row in result.all()]
+                if not messages:
+                    await db.rollback()
+                    break
+                
+                block = await asyncio.to_thread(self._encode_block, messages)
+                db.add(block)
+                # Delete only the messages read, not any written since
+                for start in range(0, len(messages), DELETE_BATCH_SIZE):
+                    await db.execute(delete(Message).where(
+                        Message.id.in_([message.id for message in messages[start:start + DELETE_BATCH_SIZE]])
+                    ))
+                await db.commit()
+            
+            CHAT_ARCHIVE_BYTES.labels(kind="raw").inc(block.raw_size)
+            CHAT_ARCHIVE_BYTES.labels(kind="compressed").inc(len(block.data))
+            last_key = messages[-1].key
+        return True
+    
+    def _encode_block(self, messages: List[ArchivedMessage]) -> MessageArchive:
+        """Compress messages, in chronological order, into an archive block."""
+        data, raw_size = encode_block(messages, self.compression_level)
+        return MessageArchive(
+            session_id=messages[0].session_id,
+            first_created_at=messages[0].created_at,
+            first_message_id=messages[0].id,
+            last_created_at=messages[-1].created_at,
+            last_message_id=messages[-1].id,
+            message_count=len(messages),
+            raw_size=raw_size,
+            data=data
+        )
+
+
+_session_archiver: Optional[SessionArchiver] = None
+
+
+def get_session_archiver() -> SessionArchiver:
+    """Get the global session archiver instance."""
+    global _session_archiver
+    if _session_archiver is None:
+        _session_archiver = SessionArchiver(
+            after_days=settings.service.archive_after_days,
+            interval=settings.service.archive_interval,
+            batch_sessions=settings.service.archive_batch_sessions,
+            block_messages=settings.service.archive_block_messages,
+            compression_level=settings.service.archive_compression_level
+        )
+    return _session_archiver
@@ -0,0 +1,254 @@
+"""
+Token-budgeted context window assembly for chat history.
+
+This module fits a conversation into a per-profile or per-model token
+budget, keeping the system prompt and the most recent turns. Token counts
+come from a pluggable tokenizer and are cached per message.
+"""
+
+import math
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+import structlog
+from app.config import get_settings
+from app.core.metrics import CHAT_CONTEXT_MESSAGES_DROPPED, CHAT_CONTEXT_TOKENS
+
+# Get settings
+settings = get_settings()
+
+logger = structlog.get_logger(__name__)
+
+
+class Tokenizer(ABC):
+    """Abstract base class for token counters."""
+    
+    name: str = "base"
+    
+    @abstractmethod
+    def count(self, text: str) -> int:
+        """Count the tokens in a text."""
+        pass
+
+
+class EstimateTokenizer(Tokenizer):
+    """Dependency-free estimator assuming an average number of characters per token."""
+    
+    name = "estimate"
+    
+    def __init__(self, chars_per_token: float = 4.0):
+        self.chars_per_token = chars_per_token
+    
+    def count(self, text: str) -> int:
+        """Estimate the tokens in a text from its length."""
+        return math.ceil(len(text) / self.chars_per_token) if text else 0
+
+
+class TiktokenTokenizer(Tokenizer):
+    """Exact tokenizer for OpenAI-compatible models, backed by tiktoken."""
+    
+    name = "tiktoken"
+    
+    def __init__(self, encoding: str = "cl100k_base"):
+        import tiktoken
+        self.encoding = tiktoken.get_encoding(encoding)
+    
+    def count(self, text: str) -> int:
+        """Count the tokens in a text with the configured encoding."""
+        return len(self.encoding.encode(text)) if text else 0
+
+
+_TOKENIZERS: Dict[str, Callable[[], Tokenizer]] = {
+    "estimate": EstimateTokenizer,
+    "tiktoken": lambda: TiktokenTokenizer(settings.service.context_tiktoken_encoding),
+}
+
+
+def register_tokenizer(name: str, factory: Callable[[], Tokenizer]) -> None:
+    """
+    Register a tokenizer factory under a name usable in configuration.
+    
+    Args:
+        name: Tokenizer name (SERVICE_CONTEXT_TOKENIZER)
+        factory: Callable returning a Tokenizer instance
+    """
+    _TOKENIZERS[name] = factory
+
+
+def create_tokenizer(name: str) -> Tokenizer:
+    """
+    Create a tokenizer by name, falling back to the estimator.
+    
+    Args:
+        name: Registered tokenizer name
+    
+    Returns:
+        Tokenizer: The tokenizer, or an EstimateTokenizer if it is unknown
+        or its dependency is not installed
+    """
+    factory = _TOKENIZERS.get(name)
+    if factory is None:
+        logger.warning("Unknown tokenizer, using estimate", tokenizer=name)
+        return EstimateTokenizer()
+    
+    try:
+        return factory()
+    except ImportError as e:
+        logger.warning("Tokenizer unavailable, using estimate", tokenizer=name, error=str(e))
+        return EstimateTokenizer()
+
+
+class ContextBuilder:
+    """
+    Select the chat history that fits in a token budget.
+    
+    The system prompt is always kept and the most recent messages are added
+    newest first until the budget or the history length limit is reached.
+    Per-message token counts are kept in a bounded LRU cache keyed on the
+    message ID, since stored messages never change.
+    """
+    
+    def __init__(
+        self,
+        tokenizer: Tokenizer,
+        max_messages: int,
+        message_overhead: int,
+        cache_size: int
+    ):
+        self.tokenizer = tokenizer
+        self.max_messages = max_messages
+        self.message_overhead = message_overhead
+        self.cache_size = cache_size
+        self._counts: "OrderedDict[str, int]" = OrderedDict()
+    
+    def count_message(self, content: str, message_id: Optional[str] = None) -> int:
+        """
+        Count the tokens of a message, including the per-message overhead.
+        
+        Args:
+            content: Message content
+            message_id: Stable message ID used as cache key, if any
+        
+        Returns:
+            int: Token count of the message
+        """
+        if message_id is None:
+            return self.tokenizer.count(content) + self.message_overhead
+        
+        tokens = self._counts.get(message_id)
+        if tokens is not None:
+            self._counts.move_to_end(message_id)
+            return tokens
+        
+        tokens = self.tokenizer.count(content) + self.message_overhead
+        self._counts[message_id] = tokens
+        if len(self._counts) > self.cache_size:
+            self._counts.popitem(last=False)
+        return tokens
+    
+    def budget_for(self, model: Optional[str], max_tokens: Optional[int], override: Optional[int] = None) -> int:
+        """
+        Get the prompt token budget for a profile.
+        
+        Args:
+            model: Profile LLM model, used to look up its context window
+            max_tokens: Tokens reserved for the response
+            override: Explicit per-profile budget, if set
+        
+        Returns:
+            int: Tokens available for the system prompt and history
+        """
+        if override:
+            return override
+        
+        window = settings.service.context_model_windows.get(model or "", settings.service.context_window_tokens)
+        return max(window - (max_tokens or 0), 0)
+    
+    def build(
+        self,
+        system_prompt: Optional[str],
+        history: List[Dict[str, str]],
+        budget: int,
+        summary: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Fit chat history into a token budget.
+        
+        Args:
+            system_prompt: System instructions sent with every request
+            history: Chronological messages with role, content and optional message_id
+            budget: Token budget for the system prompt and history
+            summary: Rolling summary of the turns preceding the history, if any
+        
+        Returns:
+            List[Dict[str, str]]: Chronological role/content messages to send,
+            led by the summary as a system message; the latest message is
+            always included
+        """
+        remaining = budget
+        if system_prompt:
+            remaining -= self.count_message(system_prompt)
+        if summary:
+            summary = f"Summary of the earlier conversation:\n{summary}"
+            remaining -= self.count_message(summary)
+        
+        selected = []
+        for message in reversed(history[-self.max_messages:]):
+            tokens = self.count_message(message["content"], message.get("message_id"))
+            if selected and tokens > remaining:
+                break
+            selected.append({"role": message["role"], "content": message["content"]})
+            remaining -= tokens
+        
+        # Start the window on a user turn rather than a dangling reply
+        while len(selected) > 1 and selected[-1]["role"] == "assistant":
+            remaining += self.count_message(selected.pop()["content"])
+        
+        selected.reverse()
+        if summary:
+            selected.insert(0, {"role": "system", "content": summary})
+        CHAT_CONTEXT_TOKENS.observe(budget - remaining)
+        CHAT_CONTEXT_MESSAGES_DROPPED.inc(len(history) - len(selected) + (1 if summary else 0))
+        return selected
+    
+    def recall_message(self, recalled: List[Dict[str, str]], budget: int) -> Optional[Dict[str, str]]:
+        """
+        Format recalled older messages as a system message within a token budget.
+        
+        Args:
+            recalled: Messages with role and content, most relevant first
+            budget: Token budget for the recalled messages
+        
+        Returns:
+            Optional[Dict[str, str]]: System message, or None if nothing fits
+        """
+        header = "Relevant earlier messages from this conversation:"
+        remaining = budget - self.count_message(header)
+        lines = []
+        for message in recalled:
+            line = f"{message['role']}: {message['content']}"
+            tokens = self.tokenizer.count(line) + 1
+            if tokens > remaining:
+                continue
+            lines.append(line)
+            remaining -= tokens
+        
+        if not lines:
+            return None
+        return {"role": "system", "content": "\n".join([header] + lines)}
+
+
+_context_builder: Optional[ContextBuilder] = None
+
+
+def get_context_builder() -> ContextBuilder:
+    """Get the global context builder instance."""
+    global _context_builder
+    if _context_builder is None:
+        _context_builder = ContextBuilder(
+            tokenizer=create_tokenizer(settings.service.context_tokenizer),
+            max_messages=settings.service.max_history_length,
+            message_overhead=settings.service.context_message_overhead,
+            cache_size=settings.service.context_token_cache_size
+        )
+    return _context_builder
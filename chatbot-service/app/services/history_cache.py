@@ -0,0 +1,207 @@
+"""
+In-memory cache of recent chat history for active sessions.
+
+This module keeps the most recent messages of hot sessions as compact
+records, updated as messages are committed, so an ongoing conversation
+builds its context without reading history from the database.
+"""
+
+import sys
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Deque, List, NamedTuple, Optional, Set
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import get_settings
+from app.core.metrics import (
+    CHAT_HISTORY_CACHE_BYTES,
+    CHAT_HISTORY_CACHE_REQUESTS,
+    CHAT_HISTORY_CACHE_SESSIONS
+)
+from app.models.message import Message
+
+# Get settings
+settings = get_settings()
+
+
+class CachedMessage(NamedTuple):
+    """Compact record of a stored message."""
+    id: int
+    message_id: str
+    role: str
+    content: str
+    created_at: datetime
+    
+    @property
+    def nbytes(self) -> int:
+        return (
+            sys.getsizeof(self) + sys.getsizeof(self.message_id)
+            + sys.getsizeof(self.content) + sys.getsizeof(self.created_at)
+        )
+
+
+class SessionHistory:
+    """Most recent messages of one session, oldest first."""
+    
+    def __init__(self, messages: List[CachedMessage], max_messages: int, ttl: float):
+        self.messages: Deque[CachedMessage] = deque(maxlen=max_messages)
+        self.nbytes = 0
+        self.ttl = ttl
+        self.touch()
+        for message in messages:
+            self.append(message)
+    
+    def touch(self) -> None:
+        """Extend the time-to-live after a use."""
+        self.expires_at = time.monotonic() + self.ttl
+    
+    def append(self, message: CachedMessage) -> None:
+        """Append a message, dropping the oldest one when full."""
+        if len(self.messages) == self.messages.maxlen:
+            self.nbytes -= self.messages[0].nbytes
+        self.messages.append(message)
+        self.nbytes += message.nbytes
+
+
+class HistoryCache:
+    """
+    Recent history of hot sessions, with LRU and TTL eviction and bounded memory.
+    
+    A session's history is loaded from the database on first use and kept up
+    to date by appending messages as they are committed. Sessions unused for
+    ``ttl`` seconds expire, checked when read and from the least recently
+    used end on writes, and least recently used sessions are evicted once
+    the total size exceeds ``max_bytes``.
+    
+    The cache only sees writes made by this process, so it must be disabled
+    when several processes serve the same sessions.
+    """
+    
+    def __init__(self, enabled: bool, max_messages: int, max_bytes: int, ttl: float):
+        self.enabled = enabled
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size_bytes = 0
+        self._sessions: "OrderedDict[int, SessionHistory]" = OrderedDict()
+        self._loading: Set[int] = set()
+        self._stale: Set[int] = set()
+    
+    async def recent(self, db: AsyncSession, session_id: int) -> List[CachedMessage]:
+        """
+        Get the most recent messages of a session.
+        
+        Args:
+            db: Database session used on a cache miss
+            session_id: Primary key of the chat session
+        
+        Returns:
+            List[CachedMessage]: Up to ``max_messages`` messages, oldest first
+        """
+        history = self._sessions.get(session_id)
+        if history is not None and history.expires_at <= time.monotonic():
+            self._remove(session_id)
+            history = None
+        
+        if history is not None:
+            CHAT_HISTORY_CACHE_REQUESTS.labels(result="hit").inc()
+            self._sessions.move_to_end(session_id)
+            history.touch()
+            return list(history.messages)
+        
+        CHAT_HISTORY_CACHE_REQUESTS.labels(result="miss").inc()
+        self._loading.add(session_id)
+        try:
+            messages = await self._load(db, session_id)
+        finally:
+            self._loading.discard(session_id)
+        
+        # Messages committed during the load may be missing from it
+        if self.enabled and session_id not in self._stale:
+            if session_id in self._sessions:
+                self._remove(session_id)
+            self._sessions[session_id] = SessionHistory(messages, self.max_messages, self.ttl)
+            self.size_bytes += self._sessions[session_id].nbytes
+            self._evict()
+        self._stale.discard(session_id)
+        return messages
+    
+    def append(self, message: Message) -> None:
+        """
+        Add a newly committed message to its session's history, if cached.
+        
+        Args:
+            message: Committed message
+        """
+        if message.session_id in self._loading:
+            self._stale.add(message.session_id)
+        
+        history = self._sessions.get(message.session_id)
+        if history is not None:
+            self.size_bytes -= history.nbytes
+            history.append(CachedMessage(
+                message.id, message.message_id, message.role, message.content, message.created_at
+            ))
+            self.size_bytes += history.nbytes
+            self._evict()
+    
+    def invalidate(self, session_id: int) -> None:
+        """Drop the cached history of a session."""
+        if session_id in self._loading:
+            self._stale.add(session_id)
+        if session_id in self._sessions:
+            self._remove(session_id)
+            self._update_gauges()
+    
+    async def _load(self, db: AsyncSession, session_id: int) -> List[CachedMessage]:
+        """Read the most recent messages of a session from the database."""
+        result = await db.execute(select(
+            Message.id,
+            Message.message_id,
+            Message.role,
+            Message.content,
+            Message.created_at
+        ).where(
+            Message.session_id == session_id
+        ).order_by(
+            Message.created_at.desc(), Message.id.desc()
+        ).limit(self.max_messages))
+        return [CachedMessage(*row) for row in reversed(result.all())]
+    
+    def _remove(self, session_id: int) -> None:
+        """Remove a session and release its accounted size."""
+        self.size_bytes -= self._sessions.pop(session_id).nbytes
+    
+    def _evict(self) -> None:
+        """Evict from the least recently used end: expired sessions, then any until within bounds."""
+        # Sessions are ordered by last use and share one TTL, so the expired
+        # ones are at the front; the others expire when next read
+        now = time.monotonic()
+        while self._sessions:
+            session_id, history = next(iter(self._sessions.items()))
+            if history.expires_at > now and self.size_bytes <= self.max_bytes:
+                break
+            self._remove(session_id)
+        self._update_gauges()
+    
+    def _update_gauges(self) -> None:
+        """Update Prometheus gauges with the cache footprint."""
+        CHAT_HISTORY_CACHE_SESSIONS.set(len(self._sessions))
+        CHAT_HISTORY_CACHE_BYTES.set(self.size_bytes)
+
+
+_history_cache: Optional[HistoryCache] = None
+
+
+def get_history_cache() -> HistoryCache:
+    """Get the global history cache instance."""
+    global _history_cache
+    if _history_cache is None:
+        _history_cache = HistoryCache(
+            enabled=settings.service.history_cache_enabled,
+            max_messages=settings.service.max_history_length,
+            max_bytes=settings.service.history_cache_max_bytes,
+            ttl=settings.service.history_cache_ttl
+        )
+    return _history_cache
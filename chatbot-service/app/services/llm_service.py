@@ -5,14 +5,39 @@ This module provides a unified interface for interacting with different
 LLM providers including LM Studio, Azure OpenAI, and other providers.
 """
 
+import asyncio
+import importlib.util
 import json
 import time
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Any
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import AsyncIterator, Deque, Dict, List, Optional, Any
 import httpx
 from pydantic import BaseModel
 from app.config import get_settings
+from app.core.metrics import (
+    LLM_COALESCED_REQUESTS,
+    LLM_FAILOVERS,
+    LLM_HEDGED_REQUESTS,
+    LLM_HTTP_POOL_CONNECTIONS,
+    LLM_HTTP_POOL_MAX_CONNECTIONS,
+    LLM_PROVIDER_AVAILABLE,
+    LLM_PROVIDER_HEALTH_AGE,
+    LLM_RETRIES,
+    LLM_TIME_TO_FIRST_TOKEN
+)
 from app.models.profile import Profile
+from app.services.admission import AdmissionController, AdmissionRejected, AIMDLimit
+from app.services.load_balancer import Backend, LoadBalancer
+from app.services.resilience import (
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryBudget,
+    backoff_delay
+)
+from app.services.response_cache import ResponseCache, create_response_cache
 
 # Get settings
 settings = get_settings()
@@ -25,6 +50,7 @@ class LLMRequest(BaseModel):
     temperature: float = 0.7
     max_tokens: int = 1000
     system_instructions: Optional[str] = None
+    affinity_key: Optional[str] = None
 
 
 class LLMResponse(BaseModel):
@@ -35,28 +61,283 @@ class LLMResponse(BaseModel):
     response_time: Optional[float] = None
     provider: str
     model: Optional[str] = None
+    cached: bool = False
+
+
+class LLMStreamChunk(BaseModel):
+    """Incremental chunk of a streamed LLM response."""
+    
+    delta: str = ""
+    done: bool = False
+    tokens_used: Optional[int] = None
+    response_time: Optional[float] = None
+    provider: str
+    model: Optional[str] = None
+
+
+class LLMProviderError(Exception):
+    """Error raised by an LLM provider call."""
+    
+    def __init__(
+        self,
+        message: str,
+        provider: str,
+        transient: bool = False,
+        status_code: Optional[int] = None
+    ):
+        self.provider = provider
+        self.transient = transient
+        self.status_code = status_code
+        super().__init__(message)
+
+
+def is_transient_status(status_code: int) -> bool:
+    """Whether an upstream HTTP status indicates a transient failure worth retrying."""
+    return status_code in (408, 429) or status_code >= 500
+
+
+class ProviderHealth(BaseModel):
+    """Cached health state of an LLM provider."""
+    
+    available: bool = True
+    checked_at: Optional[datetime] = None
+    latency: Optional[float] = None
+    error: Optional[str] = None
+    consecutive_failures: int = 0
+    
+    @property
+    def age(self) -> Optional[float]:
+        """Seconds since the last health check, or None if never checked."""
+        if self.checked_at is None:
+            return None
+        return (datetime.utcnow() - self.checked_at).total_seconds()
+    
+    @property
+    def is_stale(self) -> bool:
+        """Whether the health state is missing or older than the staleness threshold."""
+        age = self.age
+        return age is None or age > settings.llm.health_stale_after
 
 
 class LLMProvider(ABC):
     """Abstract base class for LLM providers."""
     
+    name: str = "unknown"
+    http2: bool = False
+    max_concurrency: int = 8
+    
+    _client: Optional[httpx.AsyncClient] = None
+    _transport: Optional[httpx.AsyncHTTPTransport] = None
+    
+    health: ProviderHealth = ProviderHealth()
+    
+    def _build_client(self, timeout: float) -> httpx.AsyncClient:
+        """
+        Build a long-lived HTTP client backed by a keep-alive connection pool.
+        
+        Args:
+            timeout: Request timeout in seconds
+        
+        Returns:
+            httpx.AsyncClient: Pooled HTTP client
+        """
+        # HTTP/2 needs the optional h2 package
+        http2 = self.http2 and importlib.util.find_spec("h2") is not None
+        
+        self._transport = httpx.AsyncHTTPTransport(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.llm.http_max_connections,
+                max_keepalive_connections=settings.llm.http_max_keepalive_connections,
+                keepalive_expiry=settings.llm.http_keepalive_expiry
+            )
+        )
+        return httpx.AsyncClient(timeout=timeout, transport=self._transport)
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Get the provider's pooled HTTP client, creating it on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+    
+    def _create_client(self) -> httpx.AsyncClient:
+        """Create the provider's pooled HTTP client."""
+        return self._build_client(timeout=30)
+    
+    async def startup(self) -> None:
+        """Open the provider's connection pool."""
+        _ = self.client
+    
+    async def shutdown(self) -> None:
+        """Close the provider's connection pool."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._transport = None
+    
+    def pool_stats(self) -> Dict[str, int]:
+        """
+        Get connection pool statistics.
+        
+        Returns:
+            Dict[str, int]: Active, idle and maximum connection counts
+        """
+        stats = {
+            "active": 0,
+            "idle": 0,
+            "max": settings.llm.http_max_connections
+        }
+        pool = getattr(self._transport, "_pool", None)
+        if pool is None:
+            return stats
+        
+        for connection in pool.connections:
+            if connection.is_idle():
+                stats["idle"] += 1
+            else:
+                stats["active"] += 1
+        return stats
+    
     @abstractmethod
     async def generate_response(self, request: LLMRequest) -> LLMResponse:
         """Generate a response from the LLM provider."""
         pass
     
+    async def stream_response(self, request: LLMRequest) -> AsyncIterator[LLMStreamChunk]:
+        """
+        Stream a response from the LLM provider as incremental deltas.
+        
+        Providers without native streaming yield the complete response as a
+        single chunk. The last chunk always has ``done`` set and carries the
+        token usage and response time.
+        """
+        response = await self.generate_response(request)
+        yield LLMStreamChunk(
+            delta=response.content,
+            done=True,
+            tokens_used=response.tokens_used,
+            response_time=response.response_time,
+            provider=response.provider,
+            model=response.model
+        )
+    
+    async def _stream_chat_completion(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        headers: Dict[str, str],
+        model: Optional[str] = None
+    ) -> AsyncIterator[LLMStreamChunk]:
+        """
+        Stream an OpenAI-compatible chat completion over Server-Sent Events.
+        
+        Args:
+            url: Chat completions URL
+            payload: Request payload (``stream`` is forced on)
+            headers: Request headers
+            model: Model name reported when the server does not send one
+        
+        Yields:
+            LLMStreamChunk: Content deltas followed by a final ``done`` chunk
+        """
+        start_time = time.time()
+        tokens_used = None
+        
+        payload = {**payload, "stream": True}
+        async with self.client.stream("POST", url, json=payload, headers=headers) as response:
+            response.raise_for_status()
+            
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                
+                event = json.loads(data)
+                model = event.get("model") or model
+                if event.get("usage"):
+                    tokens_used = event["usage"].get("total_tokens")
+                
+                for choice in event.get("choices", []):
+                    delta = (choice.get("delta") or {}).get("content")
+                    if delta:
+                        yield LLMStreamChunk(delta=delta, provider=self.name, model=model)
+        
+        yield LLMStreamChunk(
+            done=True,
+            tokens_used=tokens_used,
+            response_time=time.time() - start_time,
+            provider=self.name,
+            model=model
+        )
+    
     @abstractmethod
-    def is_available(self) -> bool:
-        """Check if the provider is available."""
+    async def check_health(self) -> bool:
+        """Check whether the provider is reachable (may perform network I/O)."""
         pass
+    
+    async def probe(self) -> ProviderHealth:
+        """
+        Run a health check and update the cached health state.
+        
+        Returns:
+            ProviderHealth: Updated health state
+        """
+        start_time = time.time()
+        error = None
+        try:
+            available = await self.check_health()
+        except Exception as e:
+            available = False
+            error = str(e)
+        
+        self.health = ProviderHealth(
+            available=available,
+            checked_at=datetime.utcnow(),
+            latency=time.time() - start_time,
+            error=error,
+            consecutive_failures=0 if available else self.health.consecutive_failures + 1
+        )
+        return self.health
+    
+    def backend_status(self) -> List[Dict[str, Any]]:
+        """Get the state of the provider's backends (empty for single-endpoint providers)."""
+        return []
+    
+    def is_available(self) -> bool:
+        """
+        Check if the provider is available using the cached health state.
+        
+        Never performs I/O. Providers that have not been probed yet are
+        assumed available.
+        """
+        return self.health.available
 
 
 class LMStudioProvider(LLMProvider):
     """LM Studio LLM provider implementation."""
     
+    name = "lm_studio"
+    
     def __init__(self):
         self.base_url = settings.llm.lm_studio_url
         self.timeout = settings.llm.lm_studio_timeout
+        self.http2 = settings.llm.lm_studio_http2
+        self.max_concurrency = settings.llm.lm_studio_max_concurrency
+        self.balancer = LoadBalancer(
+            self.name,
+            settings.llm.lm_studio_urls or [self.base_url],
+            strategy=settings.llm.lm_studio_balancing,
+            session_affinity=settings.llm.lm_studio_session_affinity,
+            eject_after_failures=settings.llm.backend_eject_after_failures,
+            eject_duration=settings.llm.backend_eject_duration
+        )
+    
+    def _create_client(self) -> httpx.AsyncClient:
+        """Create the pooled HTTP client for LM Studio."""
+        return self._build_client(timeout=self.timeout)
     
     async def generate_response(self, request: LLMRequest) -> LLMResponse:
         """Generate response using LM Studio."""
@@ -80,53 +361,123 @@ class LMStudioProvider(LLMProvider):
         }
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/v1/chat/completions",
+            async with self.balancer.route(request.affinity_key) as backend:
+                response = await self.client.post(
+                    f"{backend.url}/v1/chat/completions",
                     json=payload,
                     headers={"Content-Type": "application/json"}
                 )
                 response.raise_for_status()
-                
-                data = response.json()
-                content = data["choices"][0]["message"]["content"]
-                tokens_used = data.get("usage", {}).get("total_tokens")
-                
-                response_time = time.time() - start_time
-                
-                return LLMResponse(
-                    content=content,
-                    tokens_used=tokens_used,
-                    response_time=response_time,
-                    provider="lm_studio",
-                    model=data.get("model")
-                )
-                
+            
+            data = response.json()
+            content = data["choices"][0]["message"]["content"]
+            tokens_used = data.get("usage", {}).get("total_tokens")
+            
+            response_time = time.time() - start_time
+            
+            return LLMResponse(
+                content=content,
+                tokens_used=tokens_used,
+                response_time=response_time,
+                provider=self.name,
+                model=data.get("model")
+            )
+        
         except httpx.RequestError as e:
-            raise Exception(f"LM Studio request failed: {str(e)}")
+            raise LLMProviderError(f"LM Studio request failed: {str(e)}", self.name, transient=True)
+        except httpx.HTTPStatusError as e:
+            raise LLMProviderError(
+                f"LM Studio error: {str(e)}",
+                self.name,
+                transient=is_transient_status(e.response.status_code),
+                status_code=e.response.status_code
+            )
         except Exception as e:
-            raise Exception(f"LM Studio error: {str(e)}")
+            raise LLMProviderError(f"LM Studio error: {str(e)}", self.name)
     
-    def is_available(self) -> bool:
-        """Check if LM Studio is available."""
+    async def stream_response(self, request: LLMRequest) -> AsyncIterator[LLMStreamChunk]:
+        """Stream response deltas from LM Studio."""
+        messages = []
+        if request.system_instructions:
+            messages.append({
+                "role": "system",
+                "content": request.system_instructions
+            })
+        messages.extend(request.messages)
+        
+        payload = {
+            "messages": messages,
+            "temperature": request.temperature,
+            "max_tokens": request.max_tokens,
+            "stream_options": {"include_usage": True}
+        }
+        
         try:
-            response = httpx.get(f"{self.base_url}/v1/models", timeout=5)
-            return response.status_code == 200
-        except:
-            return False
+            async with self.balancer.route(request.affinity_key) as backend:
+                async for chunk in self._stream_chat_completion(
+                    f"{backend.url}/v1/chat/completions",
+                    payload,
+                    headers={"Content-Type": "application/json"}
+                ):
+                    yield chunk
+        except httpx.RequestError as e:
+            raise LLMProviderError(f"LM Studio request failed: {str(e)}", self.name, transient=True)
+        except httpx.HTTPStatusError as e:
+            raise LLMProviderError(
+                f"LM Studio error: {str(e)}",
+                self.name,
+                transient=is_transient_status(e.response.status_code),
+                status_code=e.response.status_code
+            )
+        except Exception as e:
+            raise LLMProviderError(f"LM Studio error: {str(e)}", self.name)
+    
+    async def check_health(self) -> bool:
+        """Check if LM Studio is available on at least one backend."""
+        results = await asyncio.gather(*(
+            self._check_backend(backend) for backend in self.balancer.backends
+        ))
+        return any(results)
+    
+    async def _check_backend(self, backend: Backend) -> bool:
+        """Check a single LM Studio backend and update its health."""
+        try:
+            response = await self.client.get(
+                f"{backend.url}/v1/models",
+                timeout=settings.llm.health_check_timeout
+            )
+            healthy = response.status_code == 200
+        except httpx.HTTPError:
+            healthy = False
+        
+        self.balancer.mark_health(backend, healthy)
+        return healthy
+    
+    def backend_status(self) -> List[Dict[str, Any]]:
+        """Get the state of all LM Studio backends."""
+        return self.balancer.status()
 
 
 class AzureOpenAIProvider(LLMProvider):
     """Azure OpenAI LLM provider implementation."""
     
+    name = "azure_openai"
+    
     def __init__(self):
         self.endpoint = settings.llm.azure_openai_endpoint
         self.api_key = settings.llm.azure_openai_api_key
         self.deployment = settings.llm.azure_openai_deployment
+        self.timeout = settings.llm.azure_openai_timeout
+        self.http2 = settings.llm.azure_openai_http2
+        self.max_concurrency = settings.llm.azure_openai_max_concurrency
         
         if not all([self.endpoint, self.api_key, self.deployment]):
             raise ValueError("Azure OpenAI configuration incomplete")
     
+    def _create_client(self) -> httpx.AsyncClient:
+        """Create the pooled HTTP client for Azure OpenAI."""
+        return self._build_client(timeout=self.timeout)
+    
     async def generate_response(self, request: LLMRequest) -> LLMResponse:
         """Generate response using Azure OpenAI."""
         start_time = time.time()
@@ -153,34 +504,81 @@ class AzureOpenAIProvider(LLMProvider):
         }
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.endpoint}/openai/deployments/{self.deployment}/chat/completions?api-version=2023-05-15",
-                    json=payload,
-                    headers=headers
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                content = data["choices"][0]["message"]["content"]
-                tokens_used = data.get("usage", {}).get("total_tokens")
-                
-                response_time = time.time() - start_time
-                
-                return LLMResponse(
-                    content=content,
-                    tokens_used=tokens_used,
-                    response_time=response_time,
-                    provider="azure_openai",
-                    model=self.deployment
-                )
-                
+            response = await self.client.post(
+                f"{self.endpoint}/openai/deployments/{self.deployment}/chat/completions?api-version=2023-05-15",
+                json=payload,
+                headers=headers
+            )
+            response.raise_for_status()
+            
+            data = response.json()
+            content = data["choices"][0]["message"]["content"]
+            tokens_used = data.get("usage", {}).get("total_tokens")
+            
+            response_time = time.time() - start_time
+            
+            return LLMResponse(
+                content=content,
+                tokens_used=tokens_used,
+                response_time=response_time,
+                provider=self.name,
+                model=self.deployment
+            )
+        
         except httpx.RequestError as e:
-            raise Exception(f"Azure OpenAI request failed: {str(e)}")
+            raise LLMProviderError(f"Azure OpenAI request failed: {str(e)}", self.name, transient=True)
+        except httpx.HTTPStatusError as e:
+            raise LLMProviderError(
+                f"Azure OpenAI error: {str(e)}",
+                self.name,
+                transient=is_transient_status(e.response.status_code),
+                status_code=e.response.status_code
+            )
         except Exception as e:
-            raise Exception(f"Azure OpenAI error: {str(e)}")
+            raise LLMProviderError(f"Azure OpenAI error: {str(e)}", self.name)
     
-    def is_available(self) -> bool:
+    async def stream_response(self, request: LLMRequest) -> AsyncIterator[LLMStreamChunk]:
+        """Stream response deltas from Azure OpenAI."""
+        messages = []
+        if request.system_instructions:
+            messages.append({
+                "role": "system",
+                "content": request.system_instructions
+            })
+        messages.extend(request.messages)
+        
+        payload = {
+            "messages": messages,
+            "temperature": request.temperature,
+            "max_tokens": request.max_tokens
+        }
+        
+        headers = {
+            "Content-Type": "application/json",
+            "api-key": self.api_key
+        }
+        
+        try:
+            async for chunk in self._stream_chat_completion(
+                f"{self.endpoint}/openai/deployments/{self.deployment}/chat/completions?api-version=2023-05-15",
+                payload,
+                headers=headers,
+                model=self.deployment
+            ):
+                yield chunk
+        except httpx.RequestError as e:
+            raise LLMProviderError(f"Azure OpenAI request failed: {str(e)}", self.name, transient=True)
+        except httpx.HTTPStatusError as e:
+            raise LLMProviderError(
+                f"Azure OpenAI error: {str(e)}",
+                self.name,
+                transient=is_transient_status(e.response.status_code),
+                status_code=e.response.status_code
+            )
+        except Exception as e:
+            raise LLMProviderError(f"Azure OpenAI error: {str(e)}", self.name)
+    
+    async def check_health(self) -> bool:
         """Check if Azure OpenAI is available."""
         return bool(self.endpoint and self.api_key and self.deployment)
 
@@ -190,7 +588,45 @@ class LLMService:
     
     def __init__(self):
         self.providers: Dict[str, LLMProvider] = {}
+        self._health_task: Optional[asyncio.Task] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=200))
+        self.cache = create_response_cache()
         self._initialize_providers()
+        
+        # Per-provider admission control
+        self.admission: Dict[str, AdmissionController] = {
+            name: AdmissionController(
+                name,
+                limit=provider.max_concurrency,
+                max_queue=settings.llm.max_queue_size,
+                queue_timeout=settings.llm.queue_timeout,
+                adaptive=AIMDLimit(
+                    name,
+                    initial=provider.max_concurrency,
+                    min_limit=settings.llm.adaptive_min_concurrency,
+                    max_limit=settings.llm.adaptive_max_concurrency,
+                    tolerance=settings.llm.adaptive_latency_tolerance,
+                    backoff=settings.llm.adaptive_backoff_ratio
+                ) if settings.llm.adaptive_concurrency else None
+            )
+            for name, provider in self.providers.items()
+        }
+        
+        # Per-provider circuit breakers and a global retry budget
+        self.breakers: Dict[str, CircuitBreaker] = {
+            name: CircuitBreaker(
+                name,
+                failure_threshold=settings.llm.circuit_failure_threshold,
+                recovery_timeout=settings.llm.circuit_recovery_timeout
+            )
+            for name in self.providers
+        }
+        self.retry_budget = RetryBudget(
+            ratio=settings.llm.retry_budget_ratio,
+            min_per_second=settings.llm.retry_budget_min_per_second,
+            max_tokens=settings.llm.retry_budget_max_tokens
+        )
     
     def _initialize_providers(self):
         """Initialize available LLM providers."""
@@ -206,49 +642,433 @@ class LLMService:
         except Exception as e:
             print(f"Failed to initialize Azure OpenAI provider: {e}")
     
+    async def startup(self) -> None:
+        """Open connection pools and start background health checks."""
+        for provider in self.providers.values():
+            await provider.startup()
+        
+        await self.probe_providers()
+        self._health_task = asyncio.create_task(self._health_check_loop())
+    
+    async def shutdown(self) -> None:
+        """Stop background health checks and close connection pools."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        
+        for provider in self.providers.values():
+            await provider.shutdown()
+        
+        await self.cache.close()
+    
+    async def probe_providers(self) -> None:
+        """Probe all providers concurrently and refresh their cached health."""
+        await asyncio.gather(*(
+            provider.probe() for provider in self.providers.values()
+        ))
+    
+    async def _health_check_loop(self) -> None:
+        """Periodically refresh provider health in the background."""
+        while True:
+            await asyncio.sleep(settings.llm.health_check_interval)
+            await self.probe_providers()
+    
+    def export_metrics(self) -> None:
+        """Update Prometheus gauges with provider connection pool statistics."""
+        for name, provider in self.providers.items():
+            stats = provider.pool_stats()
+            LLM_HTTP_POOL_CONNECTIONS.labels(provider=name, state="active").set(stats["active"])
+            LLM_HTTP_POOL_CONNECTIONS.labels(provider=name, state="idle").set(stats["idle"])
+            LLM_HTTP_POOL_MAX_CONNECTIONS.labels(provider=name).set(stats["max"])
+            
+            LLM_PROVIDER_AVAILABLE.labels(provider=name).set(int(provider.is_available()))
+            if provider.health.age is not None:
+                LLM_PROVIDER_HEALTH_AGE.labels(provider=name).set(provider.health.age)
+    
+    def _provider_chain(self, profile: Profile) -> List[str]:
+        """
+        Get the ordered providers for a profile.
+        
+        Args:
+            profile: Profile containing LLM configuration
+        
+        Returns:
+            List[str]: Primary provider followed by the profile's fallback
+            providers, restricted to configured providers
+        """
+        names = [profile.llm_provider]
+        if profile.fallback_providers:
+            names.extend(name.strip() for name in profile.fallback_providers.split(","))
+        
+        chain = []
+        for name in names:
+            if name in self.providers and name not in chain:
+                chain.append(name)
+        return chain
+    
+    def _available_candidates(self, profile: Profile) -> List[str]:
+        """
+        Get the providers of a profile's chain that are available and whose
+        circuit is not open.
+        
+        Raises:
+            CircuitOpenError: If the circuit of every available provider is
+                open, with the shortest time until one lets a call through
+            Exception: If no provider of the chain is configured or available
+        """
+        chain = self._provider_chain(profile)
+        if not chain:
+            raise Exception(f"LLM provider '{profile.llm_provider}' not available")
+        
+        available = [name for name in chain if self.providers[name].is_available()]
+        candidates = [name for name in available if self.breakers[name].state != OPEN]
+        if not candidates:
+            if available:
+                breaker = min((self.breakers[name] for name in available), key=lambda breaker: breaker.retry_after())
+                raise CircuitOpenError(breaker.provider, breaker.retry_after())
+            raise Exception(f"LLM provider '{profile.llm_provider}' is not available")
+        return candidates
+    
     async def generate_response(
         self,
         messages: List[Dict[str, str]],
         profile: Profile,
         temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        session_key: Optional[str] = None
     ) -> LLMResponse:
         """
         Generate a response using the specified profile's LLM provider.
         
+        If the provider fails, the profile's fallback providers are tried in
+        order. With hedging enabled, a second request is sent to the next
+        provider when the first is slower than its p95 latency, and the first
+        answer wins. ``LLMResponse.provider`` records the provider that served
+        the response.
+        
         Args:
             messages: List of message dictionaries
             profile: Profile containing LLM configuration
             temperature: Override temperature setting
             max_tokens: Override max tokens setting
-            
+            session_key: Conversation key used for backend session affinity
+        
         Returns:
             LLMResponse: Generated response
-            
+        
         Raises:
+            AdmissionRejected: If the provider is saturated
             Exception: If LLM generation fails
         """
-        # Get provider
-        provider_name = profile.llm_provider
-        if provider_name not in self.providers:
-            raise Exception(f"LLM provider '{provider_name}' not available")
+        chain = self._provider_chain(profile)
+        if not chain:
+            raise Exception(f"LLM provider '{profile.llm_provider}' not available")
+        
+        # Prepare request
+        request = LLMRequest(
+            messages=messages,
+            temperature=float(temperature if temperature is not None else profile.temperature),
+            max_tokens=max_tokens or profile.max_tokens,
+            system_instructions=profile.system_instructions,
+            affinity_key=session_key
+        )
+        
+        # Serve deterministic requests from the response cache
+        cache_key = None
+        if ResponseCache.should_cache(request.temperature, profile.response_cache_enabled):
+            cache_key = ResponseCache.make_key(
+                chain[0],
+                profile.llm_model,
+                request.system_instructions,
+                request.messages,
+                request.temperature,
+                request.max_tokens
+            )
+            start_time = time.time()
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                return LLMResponse(
+                    **{**cached, "response_time": time.time() - start_time, "cached": True}
+                )
+        
+        # Check which providers are available
+        candidates = self._available_candidates(profile)
+        hedge = bool(profile.hedging_enabled) and len(candidates) > 1
         
-        provider = self.providers[provider_name]
+        # Generate response, sharing one upstream call between identical
+        # concurrent requests. Only cacheable requests are shared: sampled
+        # requests expect an answer of their own.
+        if cache_key is None or not settings.llm.coalesce_requests:
+            return await self._generate_and_cache(candidates, request, cache_key, chain[0], hedge)
         
-        # Check if provider is available
-        if not provider.is_available():
-            raise Exception(f"LLM provider '{provider_name}' is not available")
+        task = self._inflight.get(cache_key)
+        joined = task is not None
+        if task is None:
+            task = asyncio.create_task(self._generate_and_cache(candidates, request, cache_key, chain[0], hedge))
+            self._inflight[cache_key] = task
+            task.add_done_callback(lambda task: self._inflight_done(cache_key, task))
+        
+        # Shield the shared call so a cancelled waiter does not cancel it
+        response = await asyncio.shield(task)
+        if joined:
+            LLM_COALESCED_REQUESTS.labels(provider=response.provider).inc()
+        return response.model_copy()
+    
+    async def _generate_and_cache(
+        self,
+        candidates: List[str],
+        request: LLMRequest,
+        cache_key: Optional[str],
+        cache_provider: Optional[str] = None,
+        hedge: bool = False
+    ) -> LLMResponse:
+        """
+        Generate a response with failover and store it in the response cache if requested.
+        
+        The response is cached only if it was served by the provider the
+        cache key was made for: a fallback's answer must not be replayed as
+        the primary provider's.
+        
+        Args:
+            candidates: Available providers in preference order
+            request: LLM request
+            cache_key: Response cache key, or None to skip caching
+            cache_provider: Provider the cache key was made for
+            hedge: Hedge the first provider with the second one
+        
+        Returns:
+            LLMResponse: Response from the first provider that succeeded
+        
+        Raises:
+            Exception: The last provider's error if every provider failed
+        """
+        attempts = list(candidates)
+        last_error: Optional[Exception] = None
+        response = None
+        
+        if hedge:
+            primary, secondary = attempts[:2]
+            attempts = attempts[2:]
+            try:
+                response = await self._generate_hedged(primary, secondary, request)
+            except Exception as e:
+                last_error = e
+        
+        for name in attempts:
+            if response is not None:
+                break
+            try:
+                response = await self._call_provider(name, request)
+            except Exception as e:
+                last_error = e
+                if name != attempts[-1]:
+                    LLM_FAILOVERS.labels(provider=name).inc()
+        
+        if response is None:
+            raise last_error
+        
+        if cache_key is not None and response.provider == cache_provider:
+            await self.cache.set(cache_key, response.model_dump(exclude={"cached"}))
+        return response
+    
+    async def _call_provider(self, name: str, request: LLMRequest) -> LLMResponse:
+        """
+        Call a provider under its circuit breaker and admission control.
+        
+        Transient failures are retried with jittered exponential backoff
+        while the circuit stays closed and the global retry budget allows it.
+        
+        Raises:
+            CircuitOpenError: If the provider's circuit is open
+            AdmissionRejected: If the provider is saturated
+            LLMProviderError: If the call failed and could not be retried
+        """
+        breaker = self.breakers[name]
+        self.retry_budget.deposit()
+        attempt = 0
+        
+        while True:
+            breaker.allow()
+            try:
+                async with self.admission[name].slot() as sample:
+                    response = await self.providers[name].generate_response(request)
+                    sample.tokens = response.tokens_used
+            except LLMProviderError as e:
+                self._record_provider_error(breaker, e)
+                attempt += 1
+                if (
+                    not e.transient
+                    or attempt > settings.llm.retry_max_attempts
+                    or not self.retry_budget.withdraw()
+                ):
+                    raise
+                LLM_RETRIES.labels(provider=name).inc()
+                await asyncio.sleep(backoff_delay(
+                    attempt,
+                    settings.llm.retry_base_delay,
+                    settings.llm.retry_max_delay
+                ))
+                continue
+            except AdmissionRejected:
+                breaker.release()
+                raise
+            except BaseException:
+                breaker.record_cancelled()
+                raise
+            
+            breaker.record_success()
+            if response.response_time is not None:
+                self._latencies[name].append(response.response_time)
+            return response
+    
+    @staticmethod
+    def _record_provider_error(breaker: CircuitBreaker, error: LLMProviderError) -> None:
+        """Record a provider error on its breaker: only transient errors count as failures."""
+        if error.transient:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+    
+    def _hedge_delay(self, name: str) -> float:
+        """Delay before hedging a provider: its p95 latency, or a default until enough samples exist."""
+        samples = sorted(self._latencies[name])
+        if len(samples) < settings.llm.hedge_min_samples:
+            return settings.llm.hedge_default_delay
+        p95 = samples[max(0, int(len(samples) * 0.95) - 1)]
+        return max(settings.llm.hedge_min_delay, p95)
+    
+    async def _generate_hedged(self, primary: str, secondary: str, request: LLMRequest) -> LLMResponse:
+        """
+        Call the primary provider and hedge it with the secondary one.
+        
+        The secondary request starts only if the primary has not answered
+        within its p95 latency (or fails). The first successful answer wins
+        and the other request is cancelled.
+        """
+        pending = {asyncio.create_task(self._call_provider(primary, request))}
+        errors: List[Exception] = []
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self._hedge_delay(primary))
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                errors.append(task.exception())
+                LLM_FAILOVERS.labels(provider=primary).inc()
+            
+            pending.add(asyncio.create_task(self._call_provider(secondary, request)))
+            if not errors:
+                LLM_HEDGED_REQUESTS.labels(provider=primary).inc()
+            
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(task.exception())
+            raise errors[-1]
+        finally:
+            # Cancel the losing request
+            for task in pending:
+                task.cancel()
+    
+    def _inflight_done(self, key: str, task: asyncio.Task) -> None:
+        """Forget a finished shared call."""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Retrieve the exception so it is not reported as unhandled when
+        # every waiter has been cancelled
+        if not task.cancelled():
+            task.exception()
+    
+    async def stream_response(
+        self,
+        messages: List[Dict[str, str]],
+        profile: Profile,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        session_key: Optional[str] = None
+    ) -> AsyncIterator[LLMStreamChunk]:
+        """
+        Stream a response using the specified profile's LLM provider.
+        
+        If a provider fails or is saturated before streaming its first chunk,
+        the profile's fallback providers are tried in order. Hedging does not apply to
+        streams.
+        
+        Args:
+            messages: List of message dictionaries
+            profile: Profile containing LLM configuration
+            temperature: Override temperature setting
+            max_tokens: Override max tokens setting
+            session_key: Conversation key used for backend session affinity
+        
+        Yields:
+            LLMStreamChunk: Content deltas followed by a final ``done`` chunk
+        
+        Raises:
+            AdmissionRejected: If the provider is saturated
+            Exception: If LLM generation fails
+        """
+        # Check which providers are available
+        candidates = self._available_candidates(profile)
         
         # Prepare request
         request = LLMRequest(
             messages=messages,
-            temperature=float(temperature or profile.temperature),
+            temperature=float(temperature if temperature is not None else profile.temperature),
             max_tokens=max_tokens or profile.max_tokens,
-            system_instructions=profile.system_instructions
+            system_instructions=profile.system_instructions,
+            affinity_key=session_key
         )
         
-        # Generate response
-        return await provider.generate_response(request)
+        for index, provider_name in enumerate(candidates):
+            provider = self.providers[provider_name]
+            breaker = self.breakers[provider_name]
+            last = index == len(candidates) - 1
+            started = False
+            
+            try:
+                breaker.allow()
+            except CircuitOpenError:
+                if last:
+                    raise
+                continue
+            
+            # Stream response, recording time to first token
+            start_time = time.time()
+            try:
+                async with self.admission[provider_name].slot() as sample:
+                    async for chunk in provider.stream_response(request):
+                        if not started and chunk.delta:
+                            LLM_TIME_TO_FIRST_TOKEN.labels(provider=provider_name).observe(time.time() - start_time)
+                        started = True
+                        if chunk.done:
+                            sample.tokens = chunk.tokens_used
+                        yield chunk
+            except LLMProviderError as e:
+                self._record_provider_error(breaker, e)
+                # Fail over only if nothing was streamed yet
+                if started or last:
+                    raise
+                LLM_FAILOVERS.labels(provider=provider_name).inc()
+                continue
+            except AdmissionRejected:
+                # The provider is saturated, not failing: nothing reached it
+                breaker.release()
+                if started or last:
+                    raise
+                LLM_FAILOVERS.labels(provider=provider_name).inc()
+                continue
+            except BaseException:
+                breaker.record_cancelled()
+                raise
+            
+            breaker.record_success()
+            return
     
     def get_available_providers(self) -> List[str]:
         """Get list of available LLM providers."""
@@ -261,4 +1081,35 @@ class LLMService:
         """Check if a specific provider is available."""
         if provider_name not in self.providers:
             return False
-        return self.providers[provider_name].is_available() 
\ No newline at end of file
+        return self.providers[provider_name].is_available()
+    
+    def get_provider_health(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the cached health state of all providers.
+        
+        Returns:
+            Dict[str, Dict[str, Any]]: Health details per provider, including
+            whether the cached state is stale
+        """
+        return {
+            name: {
+                **provider.health.model_dump(),
+                "age_seconds": provider.health.age,
+                "stale": provider.health.is_stale,
+                "backends": provider.backend_status(),
+                "circuit": self.breakers[name].to_dict()
+            }
+            for name, provider in self.providers.items()
+        }
+
+
+# Global LLM service instance
+_llm_service: Optional[LLMService] = None
+
+
+def get_llm_service() -> LLMService:
+    """Get the global LLM service instance."""
+    global _llm_service
+    if _llm_service is None:
+        _llm_service = LLMService()
+    return _llm_service
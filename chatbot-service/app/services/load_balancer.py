@@ -0,0 +1,182 @@
+"""
+Load balancing across multiple backends of an LLM provider.
+
+This module routes requests between several OpenAI-compatible servers using
+least-outstanding-requests or latency-weighted selection, ejects failing
+backends temporarily, and optionally pins conversations to one backend.
+"""
+
+import hashlib
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Any
+import httpx
+from app.core.metrics import (
+    LLM_BACKEND_HEALTHY,
+    LLM_BACKEND_LATENCY,
+    LLM_BACKEND_OUTSTANDING
+)
+
+
+class Backend:
+    """A single backend server of a provider."""
+    
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.latency: Optional[float] = None
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+    
+    def is_eligible(self, now: float) -> bool:
+        """Whether the backend may receive new requests."""
+        return self.healthy and self.ejected_until <= now
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the backend state to a dictionary."""
+        return {
+            "url": self.url,
+            "outstanding": self.outstanding,
+            "latency": self.latency,
+            "healthy": self.healthy,
+            "ejected": self.ejected_until > time.monotonic(),
+            "consecutive_failures": self.consecutive_failures
+        }
+
+
+class LoadBalancer:
+    """
+    Request router over a provider's backends.
+    
+    Strategies:
+    
+    - ``least_outstanding``: fewest requests in flight, ties broken by latency
+    - ``latency_weighted``: lowest latency EWMA scaled by requests in flight
+    
+    A backend is ejected for ``eject_duration`` seconds after
+    ``eject_after_failures`` consecutive failures and re-admitted when the
+    ejection expires or a health check succeeds. With ``session_affinity``,
+    requests carrying the same affinity key go to the same backend (by
+    rendezvous hashing) while it stays eligible.
+    """
+    
+    def __init__(
+        self,
+        provider: str,
+        urls: List[str],
+        strategy: str = "least_outstanding",
+        session_affinity: bool = False,
+        eject_after_failures: int = 3,
+        eject_duration: float = 30.0
+    ):
+        if not urls:
+            raise ValueError(f"No backends configured for provider '{provider}'")
+        
+        self.provider = provider
+        self.backends = [Backend(url) for url in urls]
+        self.strategy = strategy
+        self.session_affinity = session_affinity
+        self.eject_after_failures = eject_after_failures
+        self.eject_duration = eject_duration
+        
+        for backend in self.backends:
+            self._update_gauges(backend)
+    
+    def select(self, affinity_key: Optional[str] = None) -> Backend:
+        """
+        Select a backend for a request.
+        
+        Args:
+            affinity_key: Key pinning related requests (e.g. a chat session) to one backend
+            
+        Returns:
+            Backend: Selected backend; if every backend is ejected or unhealthy,
+            the least loaded one is used anyway
+        """
+        now = time.monotonic()
+        candidates = [backend for backend in self.backends if backend.is_eligible(now)]
+        if not candidates:
+            candidates = self.backends
+        
+        if self.session_affinity and affinity_key:
+            return max(candidates, key=lambda backend: self._rendezvous_weight(affinity_key, backend))
+        
+        if self.strategy == "latency_weighted":
+            # Unmeasured backends score zero so they get sampled first
+            return min(
+                candidates,
+                key=lambda backend: ((backend.latency or 0.0) * (backend.outstanding + 1), random.random())
+            )
+        
+        return min(
+            candidates,
+            key=lambda backend: (backend.outstanding, backend.latency or 0.0, random.random())
+        )
+    
+    @asynccontextmanager
+    async def route(self, affinity_key: Optional[str] = None) -> AsyncIterator[Backend]:
+        """
+        Route a request to a backend, tracking load, latency and failures.
+        
+        Connection errors and 5xx responses count as backend failures.
+        
+        Args:
+            affinity_key: Key pinning related requests to one backend
+            
+        Yields:
+            Backend: Backend to send the request to
+        """
+        backend = self.select(affinity_key)
+        backend.outstanding += 1
+        self._update_gauges(backend)
+        start_time = time.monotonic()
+        try:
+            yield backend
+        except httpx.RequestError:
+            self._record_failure(backend)
+            raise
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code >= 500:
+                self._record_failure(backend)
+            raise
+        else:
+            elapsed = time.monotonic() - start_time
+            backend.latency = elapsed if backend.latency is None else 0.8 * backend.latency + 0.2 * elapsed
+            backend.consecutive_failures = 0
+        finally:
+            backend.outstanding -= 1
+            self._update_gauges(backend)
+    
+    def mark_health(self, backend: Backend, healthy: bool) -> None:
+        """Record a health check result, re-admitting ejected backends that recovered."""
+        backend.healthy = healthy
+        if healthy:
+            backend.consecutive_failures = 0
+            backend.ejected_until = 0.0
+        self._update_gauges(backend)
+    
+    def status(self) -> List[Dict[str, Any]]:
+        """Get the state of all backends."""
+        return [backend.to_dict() for backend in self.backends]
+    
+    def _record_failure(self, backend: Backend) -> None:
+        """Count a failure and eject the backend after too many in a row."""
+        backend.consecutive_failures += 1
+        if backend.consecutive_failures >= self.eject_after_failures:
+            backend.ejected_until = time.monotonic() + self.eject_duration
+    
+    @staticmethod
+    def _rendezvous_weight(key: str, backend: Backend) -> int:
+        """Highest-random-weight hash of a key for a backend."""
+        digest = hashlib.sha1(f"{key}|{backend.url}".encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big")
+    
+    def _update_gauges(self, backend: Backend) -> None:
+        """Update Prometheus gauges with the backend state."""
+        labels = {"provider": self.provider, "backend": backend.url}
+        LLM_BACKEND_OUTSTANDING.labels(**labels).set(backend.outstanding)
+        LLM_BACKEND_HEALTHY.labels(**labels).set(int(backend.is_eligible(time.monotonic())))
+        if backend.latency is not None:
+            LLM_BACKEND_LATENCY.labels(**labels).set(backend.latency)
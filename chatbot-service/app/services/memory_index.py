@@ -0,0 +1,263 @@
+"""
+Vector-indexed long-term memory for chat sessions.
+
+This module embeds messages with an offline hashing vectorizer and keeps a
+compact NumPy index per session, so relevant older messages can be recalled
+by cosine similarity. Indexes are rebuilt from the database on demand, off
+the event loop, and held in a memory-bounded LRU.
+"""
+
+import asyncio
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import get_settings
+from app.core.metrics import CHAT_MEMORY_INDEX_BYTES, CHAT_MEMORY_INDEX_SESSIONS
+from app.models.message import Message
+
+# Get settings
+settings = get_settings()
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingVectorizer:
+    """
+    Stateless text vectorizer using the hashing trick.
+    
+    Lowercased words and word bigrams are hashed into a fixed number of
+    signed buckets and the vector is L2-normalized. Hashes are stable across
+    processes, so no vocabulary or network access is needed.
+    """
+    
+    def __init__(self, dim: int):
+        self.dim = dim
+    
+    def _features(self, text: str) -> Iterable[str]:
+        """Yield the word and bigram features of a text."""
+        words = _TOKEN_PATTERN.findall(text.lower())
+        yield from words
+        for first, second in zip(words, words[1:]):
+            yield f"{first} {second}"
+    
+    def transform(self, text: str) -> np.ndarray:
+        """
+        Embed a text.
+        
+        Args:
+            text: Text to embed
+        
+        Returns:
+            np.ndarray: Unit-length float32 vector, or zeros for empty text
+        """
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dim] += 1.0 if digest >> 63 else -1.0
+        
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+
+class SessionVectors:
+    """Vectors of one session's messages, grown by doubling and capped in size."""
+    
+    def __init__(self, dim: int, max_vectors: int):
+        self.max_vectors = max_vectors
+        self.size = 0
+        capacity = min(16, max_vectors)
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+    
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + self.ids.nbytes
+    
+    def add(self, message_id: int, vector: np.ndarray) -> None:
+        """Append a message vector, dropping the oldest one when full."""
+        if self.size == self.max_vectors:
+            self.vectors[:self.size - 1] = self.vectors[1:self.size]
+            self.ids[:self.size - 1] = self.ids[1:self.size]
+            self.size -= 1
+        elif self.size == len(self.ids):
+            capacity = min(len(self.ids) * 2, self.max_vectors)
+            self.vectors = np.resize(self.vectors, (capacity, self.vectors.shape[1]))
+            self.ids = np.resize(self.ids, capacity)
+        
+        self.vectors[self.size] = vector
+        self.ids[self.size] = message_id
+        self.size += 1
+    
+    def search(self, vector: np.ndarray, k: int, exclude: Set[int], min_score: float) -> List[Tuple[int, float]]:
+        """Get the ids and scores of the k most similar messages."""
+        if self.size == 0:
+            return []
+        
+        scores = self.vectors[:self.size] @ vector
+        if exclude:
+            scores[np.isin(self.ids[:self.size], list(exclude))] = -1.0
+        
+        k = min(k, self.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (int(self.ids[i]), float(scores[i]))
+            for i in top
+            if scores[i] >= min_score
+        ]
+
+
+class MemoryIndex:
+    """
+    Per-session vector indexes with a global memory bound.
+    
+    Session indexes are built lazily from the database on first search,
+    kept up to date with incremental inserts, and evicted least recently
+    used first once the total size exceeds ``max_bytes``. Messages are
+    embedded in a worker thread, and concurrent searches of a session that
+    is not loaded wait for a single build.
+    """
+    
+    def __init__(self, dim: int, max_vectors_per_session: int, max_bytes: int):
+        self.vectorizer = HashingVectorizer(dim)
+        self.max_vectors_per_session = max_vectors_per_session
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[int, SessionVectors]" = OrderedDict()
+        self._build_locks: Dict[int, asyncio.Lock] = {}
+        # Messages added while their session's index is being built
+        self._pending: Dict[int, List[Tuple[int, str]]] = {}
+    
+    @property
+    def nbytes(self) -> int:
+        return sum(index.nbytes for index in self._sessions.values())
+    
+    def add(self, session_id: int, message_id: int, content: str) -> None:
+        """
+        Index a new message of a session whose index is loaded.
+        
+        Sessions that are not loaded pick the message up when rebuilt.
+        
+        Args:
+            session_id: Primary key of the chat session
+            message_id: Primary key of the message
+            content: Message content
+        """
+        index = self._sessions.get(session_id)
+        if index is not None:
+            index.add(message_id, self.vectorizer.transform(content))
+            self._evict()
+        elif session_id in self._pending:
+            self._pending[session_id].append((message_id, content))
+    
+    async def search(
+        self,
+        db: AsyncSession,
+        session_id: int,
+        query: str,
+        k: int,
+        exclude: Set[int],
+        min_score: float
+    ) -> List[Tuple[int, float]]:
+        """
+        Find the messages of a session most similar to a query.
+        
+        Args:
+            db: Database session used to build the index if not loaded
+            session_id: Primary key of the chat session
+            query: Query text
+            k: Maximum number of results
+            exclude: Message primary keys to leave out
+            min_score: Minimum cosine similarity of a result
+        
+        Returns:
+            List[Tuple[int, float]]: Message primary keys and scores, best first
+        """
+        index = self._sessions.get(session_id)
+        if index is None:
+            index = await self._load(db, session_id)
+        else:
+            self._sessions.move_to_end(session_id)
+        
+        return index.search(self.vectorizer.transform(query), k, exclude, min_score)
+    
+    def remove_session(self, session_id: int) -> None:
+        """Drop the index of a deleted session."""
+        self._pending.pop(session_id, None)
+        if self._sessions.pop(session_id, None) is not None:
+            self._update_gauges()
+    
+    async def _load(self, db: AsyncSession, session_id: int) -> SessionVectors:
+        """Build a session index once, however many searches wait for it."""
+        lock = self._build_locks.setdefault(session_id, asyncio.Lock())
+        try:
+            async with lock:
+                index = self._sessions.get(session_id)
+                if index is not None:
+                    self._sessions.move_to_end(session_id)
+                    return index
+                
+                self._pending[session_id] = []
+                try:
+                    result = await db.execute(select(Message.id, Message.content).where(
+                        Message.session_id == session_id
+                    ).order_by(Message.created_at.desc(), Message.id.desc()).limit(self.max_vectors_per_session))
+                    rows = list(reversed(result.all()))
+                    index = await asyncio.to_thread(self._build, rows)
+                    
+                    # Catch up with messages stored after the rows were read
+                    indexed = set(index.ids[:index.size].tolist())
+                    for message_id, content in self._pending.get(session_id, ()):
+                        if message_id not in indexed:
+                            index.add(message_id, self.vectorizer.transform(content))
+                finally:
+                    pending = self._pending.pop(session_id, None)
+                
+                # The session was deleted while building
+                if pending is None:
+                    return index
+                self._sessions[session_id] = index
+                self._evict()
+                return index
+        finally:
+            if not lock.locked() and self._build_locks.get(session_id) is lock:
+                del self._build_locks[session_id]
+    
+    def _build(self, rows: Sequence[Tuple[int, str]]) -> SessionVectors:
+        """Build a session index from stored messages, oldest first."""
+        index = SessionVectors(self.vectorizer.dim, self.max_vectors_per_session)
+        for message_id, content in rows:
+            index.add(message_id, self.vectorizer.transform(content))
+        return index
+    
+    def _evict(self) -> None:
+        """Evict least recently used session indexes beyond the memory bound."""
+        total = self.nbytes
+        while total > self.max_bytes and len(self._sessions) > 1:
+            _, index = self._sessions.popitem(last=False)
+            total -= index.nbytes
+        self._update_gauges(total)
+    
+    def _update_gauges(self, total: Optional[int] = None) -> None:
+        CHAT_MEMORY_INDEX_SESSIONS.set(len(self._sessions))
+        CHAT_MEMORY_INDEX_BYTES.set(self.nbytes if total is None else total)
+
+
+_memory_index: Optional[MemoryIndex] = None
+
+
+def get_memory_index() -> MemoryIndex:
+    """Get the global memory index instance."""
+    global _memory_index
+    if _memory_index is None:
+        _memory_index = MemoryIndex(
+            dim=settings.service.memory_dim,
+            max_vectors_per_session=settings.service.memory_max_vectors_per_session,
+            max_bytes=settings.service.memory_max_bytes
+        )
+    return _memory_index
@@ -0,0 +1,222 @@
+"""
+Write-behind persistence of assistant messages.
+
+This module saves assistant replies after the response has been sent,
+through a bounded queue drained by a worker that commits them in batches.
+See MessageWriter for the durability guarantees of this mode.
+"""
+
+import asyncio
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import select, update
+import structlog
+from app.config import get_settings
+from app.core.metrics import (
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_DROPPED,
+    WRITE_BEHIND_LAG,
+    WRITE_BEHIND_QUEUE_DEPTH
+)
+from app.database.session import AsyncSessionLocal, record_writers
+from app.database.sharding import current_shard
+from app.models.message import Message
+from app.models.session import Session as ChatSession
+
+# Get settings
+settings = get_settings()
+
+logger = structlog.get_logger(__name__)
+
+# Queued write: external session ID, message, callback, enqueue time and shard
+PendingWrite = Tuple[str, Message, Optional[Callable[[Message], None]], float, Optional[str]]
+
+
+class MessageWriter:
+    """
+    Persist assistant messages in batches in the background.
+    
+    A single worker drains the queue, bulk-inserting up to ``batch_size``
+    messages and bulk-updating their sessions' last activity in one commit,
+    flushing when the batch is full or ``flush_interval`` has passed. When
+    the queue is full, ``submit`` waits, slowing producers down.
+    
+    Durability guarantees:
+    
+    - A reply is acknowledged to the client before it is committed. If the
+      process dies before the commit, the reply is lost; the user message of
+      the turn is always committed before the LLM is called.
+    - Failed batches are retried ``max_retries`` times with backoff, then
+      logged and dropped.
+    - Writes are committed in submission order, and a new turn on a session
+      waits for its pending writes before reading history, so history is
+      read-your-writes consistent within the process.
+    - Pending writes are flushed on graceful shutdown.
+    - Replies to sessions deleted before their batch is committed are discarded.
+    
+    Each message is written to the shard of the user that submitted it;
+    a batch spanning several shards is committed per shard.
+    """
+    
+    def __init__(
+        self,
+        max_queue: int,
+        batch_size: int,
+        flush_interval: float,
+        max_retries: int,
+        retry_delay: float
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.queue: "asyncio.Queue[PendingWrite]" = asyncio.Queue(maxsize=max_queue)
+        self._pending: Counter = Counter()
+        self._flushed = asyncio.Condition()
+        self._worker: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """Start the batch worker."""
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+    
+    async def submit(
+        self,
+        session_id: str,
+        message: Message,
+        on_persisted: Optional[Callable[[Message], None]] = None
+    ) -> None:
+        """
+        Queue an assistant message for persistence, waiting while the queue is full.
+        
+        Args:
+            session_id: External ID of the message's chat session
+            message: Transient message with its created_at set
+            on_persisted: Called with the message once it is committed
+        """
+        self.start()
+        self._pending[session_id] += 1
+        try:
+            await self.queue.put((session_id, message, on_persisted, time.monotonic(), current_shard.get()))
+        except BaseException:
+            await self._done([session_id])
+            raise
+        WRITE_BEHIND_QUEUE_DEPTH.set(self.queue.qsize())
+    
+    async def wait_for_session(self, session_id: str) -> None:
+        """Wait until the pending writes of a session, by external ID, are done."""
+        if self._pending[session_id]:
+            async with self._flushed:
+                await self._flushed.wait_for(lambda: not self._pending[session_id])
+    
+    async def shutdown(self) -> None:
+        """Flush all pending writes and stop the worker."""
+        if self._worker is None:
+            return
+        await self.queue.join()
+        self._worker.cancel()
+        await asyncio.gather(self._worker, return_exceptions=True)
+        self._worker = None
+    
+    async def _run(self) -> None:
+        """Drain the queue in batches."""
+        while True:
+            batch = [await self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            WRITE_BEHIND_QUEUE_DEPTH.set(self.queue.qsize())
+            
+            shards: Dict[Optional[str], List[PendingWrite]] = defaultdict(list)
+            for pending in batch:
+                shards[pending[4]].append(pending)
+            try:
+                for shard, writes in shards.items():
+                    # Callbacks also run on the shard of the message
+                    token = current_shard.set(shard)
+                    try:
+                        await self._write(writes)
+                    finally:
+                        current_shard.reset(token)
+            finally:
+                await self._done([session_id for session_id, _, _, _, _ in batch])
+                for _ in batch:
+                    self.queue.task_done()
+    
+    async def _write(self, batch: List[PendingWrite]) -> None:
+        """Commit a batch of messages and their sessions' last activity."""
+        messages = [message for _, message, _, _, _ in batch]
+        last_activity: Dict[int, datetime] = {}
+        for message in messages:
+            previous = last_activity.get(message.session_id)
+            if previous is None or message.created_at > previous:
+                last_activity[message.session_id] = message.created_at
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with AsyncSessionLocal() as db:
+                    # Replies to sessions deleted since their turn started are dropped
+                    existing = set(await db.scalars(
+                        select(ChatSession.id).where(ChatSession.id.in_(list(last_activity)))
+                    ))
+                    if existing:
+                        db.add_all([message for message in messages if message.session_id in existing])
+                        await db.flush()
+                        await db.execute(update(ChatSession), [
+                            {"id": session_id, "last_activity": activity}
+                            for session_id, activity in last_activity.items()
+                            if session_id in existing
+                        ])
+                        record_writers(db, {message.user_id for message in messages if message.session_id in existing})
+                        await db.commit()
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error("Dropping assistant messages after failed write", count=len(messages), error=str(e))
+                    WRITE_BEHIND_DROPPED.inc(len(messages))
+                    return
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+        
+        now = time.monotonic()
+        WRITE_BEHIND_BATCH_SIZE.observe(len(batch))
+        for _, message, on_persisted, enqueued_at, _ in batch:
+            WRITE_BEHIND_LAG.observe(now - enqueued_at)
+            if on_persisted is not None and message.session_id in existing:
+                try:
+                    on_persisted(message)
+                except Exception as e:
+                    logger.warning("Post-write hook failed", message_id=message.message_id, exc_info=e)
+    
+    async def _done(self, session_ids: List[str]) -> None:
+        """Mark writes as done and wake up waiting turns."""
+        for session_id in session_ids:
+            self._pending[session_id] -= 1
+            if self._pending[session_id] <= 0:
+                del self._pending[session_id]
+        async with self._flushed:
+            self._flushed.notify_all()
+
+
+_message_writer: Optional[MessageWriter] = None
+
+
+def get_message_writer() -> MessageWriter:
+    """Get the global message writer instance."""
+    global _message_writer
+    if _message_writer is None:
+        _message_writer = MessageWriter(
+            max_queue=settings.database.write_behind_queue_size,
+            batch_size=settings.database.write_behind_batch_size,
+            flush_interval=settings.database.write_behind_flush_interval,
+            max_retries=settings.database.write_behind_max_retries,
+            retry_delay=settings.database.write_behind_retry_delay
+        )
+    return _message_writer
@@ -0,0 +1,177 @@
+"""
+Resilience primitives for LLM provider calls.
+
+This module provides a per-provider circuit breaker and a global retry
+budget with jittered exponential backoff, so transient failures are retried
+without amplifying an outage.
+"""
+
+import math
+import random
+import time
+from typing import Optional
+from app.core.metrics import (
+    LLM_CIRCUIT_STATE,
+    LLM_CIRCUIT_TRANSITIONS,
+    LLM_RETRY_BUDGET_EXHAUSTED
+)
+
+# Circuit breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the provider's circuit is open."""
+    
+    status_code = 503
+    
+    def __init__(self, provider: str, retry_after: float):
+        self.provider = provider
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"LLM provider '{provider}' circuit is open, retry after {self.retry_after}s")
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker.
+    
+    The circuit opens after ``failure_threshold`` consecutive failures and
+    refuses calls for ``recovery_timeout`` seconds. It then turns half-open
+    and lets a single probe call through: success closes the circuit, failure
+    opens it again.
+    """
+    
+    def __init__(self, provider: str, failure_threshold: int, recovery_timeout: float):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._state = CLOSED
+        self._probe_in_flight = False
+        LLM_CIRCUIT_STATE.labels(provider=provider).set(_STATE_VALUES[CLOSED])
+    
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the recovery timeout elapsed."""
+        if self._state == OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+            self._transition(HALF_OPEN)
+        return self._state
+    
+    def allow(self) -> None:
+        """
+        Check that a call may proceed.
+        
+        Raises:
+            CircuitOpenError: If the circuit is open or a half-open probe is already running
+        """
+        state = self.state
+        if state == CLOSED:
+            return
+        if state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return
+        raise CircuitOpenError(self.provider, self.retry_after())
+    
+    def retry_after(self) -> float:
+        """Seconds until the circuit lets a probe call through."""
+        elapsed = time.monotonic() - (self.opened_at or time.monotonic())
+        return max(1.0, self.recovery_timeout - elapsed)
+    
+    def record_success(self) -> None:
+        """Record a successful call, closing the circuit."""
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        if self._state != CLOSED:
+            self._transition(CLOSED)
+    
+    def record_failure(self) -> None:
+        """Record a failed call, opening the circuit when the threshold is reached."""
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self._state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._transition(OPEN)
+    
+    def release(self) -> None:
+        """Give back a permitted call that never reached the provider, freeing the half-open probe."""
+        self._probe_in_flight = False
+    
+    def record_cancelled(self) -> None:
+        """Record a call cancelled before it completed, freeing the half-open probe."""
+        self._probe_in_flight = False
+    
+    def to_dict(self) -> dict:
+        """Convert the breaker state to a dictionary."""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures
+        }
+    
+    def _transition(self, state: str) -> None:
+        """Move to a new state and record it."""
+        self._state = state
+        LLM_CIRCUIT_STATE.labels(provider=self.provider).set(_STATE_VALUES[state])
+        LLM_CIRCUIT_TRANSITIONS.labels(provider=self.provider, state=state).inc()
+
+
+class RetryBudget:
+    """
+    Token-bucket retry budget shared by all providers.
+    
+    Every request deposits ``ratio`` tokens and every retry withdraws one,
+    so retries stay a bounded fraction of traffic. A floor of
+    ``min_per_second`` tokens per second keeps retries possible at low
+    traffic. The bucket holds at most ``max_tokens``.
+    """
+    
+    def __init__(self, ratio: float, min_per_second: float, max_tokens: float):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._updated_at = time.monotonic()
+    
+    def deposit(self) -> None:
+        """Record a request."""
+        self._refill()
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+    
+    def withdraw(self) -> bool:
+        """
+        Try to spend one retry.
+        
+        Returns:
+            bool: True if the retry is within budget
+        """
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        LLM_RETRY_BUDGET_EXHAUSTED.inc()
+        return False
+    
+    def _refill(self) -> None:
+        """Add the time-based floor of tokens."""
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self._updated_at) * self.min_per_second)
+        self._updated_at = now
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    Full-jitter exponential backoff delay.
+    
+    Args:
+        attempt: Retry attempt number, starting at 1
+        base: Base delay in seconds
+        cap: Maximum delay in seconds
+    
+    Returns:
+        float: Delay in seconds, uniformly drawn from [0, min(cap, base * 2^(attempt - 1))]
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
@@ -0,0 +1,261 @@
+"""
+Response cache for exact-match LLM requests.
+
+This module caches LLM responses keyed on the provider, model, system
+instructions, normalized messages and sampling parameters, with an
+in-process LRU/TTL backend and an optional Redis backend.
+"""
+
+import hashlib
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from app.config import get_settings
+from app.core.metrics import (
+    LLM_CACHE_BYTES,
+    LLM_CACHE_ENTRIES,
+    LLM_CACHE_EVICTIONS,
+    LLM_CACHE_REQUESTS
+)
+
+# Get settings
+settings = get_settings()
+
+
+class CacheBackend(ABC):
+    """Abstract base class for response cache backends."""
+    
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        """Get a cached value, or None if missing or expired."""
+        pass
+    
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        """Store a value with a time-to-live in seconds."""
+        pass
+    
+    @abstractmethod
+    async def clear(self) -> None:
+        """Remove all cached values."""
+        pass
+    
+    async def close(self) -> None:
+        """Release backend resources."""
+        pass
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process cache backend with LRU and TTL eviction and bounded memory."""
+    
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    async def get(self, key: str) -> Optional[str]:
+        """Get a cached value and mark it as most recently used."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            LLM_CACHE_EVICTIONS.labels(reason="ttl").inc()
+            return None
+        
+        self._entries.move_to_end(key)
+        return value
+    
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        """Store a value, evicting least recently used entries."""
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self.size_bytes += size
+        
+        self._evict()
+        self._update_gauges()
+    
+    async def clear(self) -> None:
+        """Remove all cached values."""
+        self._entries.clear()
+        self.size_bytes = 0
+        self._update_gauges()
+    
+    def _remove(self, key: str) -> None:
+        """Remove an entry and release its accounted size."""
+        value, _ = self._entries.pop(key)
+        self.size_bytes -= len(value.encode("utf-8"))
+    
+    def _evict(self) -> None:
+        """
+        Evict least recently used entries until within bounds.
+        
+        Expired entries are otherwise only dropped when read, so a write
+        costs no scan of the whole cache.
+        """
+        now = time.monotonic()
+        while self._entries and (
+            len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes
+        ):
+            key, (_, expires_at) = next(iter(self._entries.items()))
+            self._remove(key)
+            LLM_CACHE_EVICTIONS.labels(reason="ttl" if expires_at <= now else "lru").inc()
+    
+    def _update_gauges(self) -> None:
+        """Update Prometheus gauges with the cache footprint."""
+        LLM_CACHE_ENTRIES.set(len(self._entries))
+        LLM_CACHE_BYTES.set(self.size_bytes)
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Redis cache backend.
+    
+    Entries expire through Redis TTLs; LRU eviction is delegated to the Redis
+    server's ``maxmemory-policy`` (e.g. ``allkeys-lru``).
+    """
+    
+    def __init__(self, url: str, prefix: str = "llm-cache:"):
+        import redis.asyncio as redis
+        
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+    
+    async def get(self, key: str) -> Optional[str]:
+        """Get a cached value."""
+        return await self.client.get(self.prefix + key)
+    
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        """Store a value with a TTL."""
+        await self.client.set(self.prefix + key, value, px=int(ttl * 1000))
+    
+    async def clear(self) -> None:
+        """Remove all cached values under the key prefix."""
+        async for key in self.client.scan_iter(match=self.prefix + "*"):
+            await self.client.delete(key)
+    
+    async def close(self) -> None:
+        """Close the Redis connection pool."""
+        await self.client.aclose()
+
+
+class ResponseCache:
+    """Exact-match cache for LLM responses."""
+    
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def should_cache(temperature: float, enabled: Optional[bool]) -> bool:
+        """
+        Check whether a request may be served from the cache.
+        
+        Args:
+            temperature: Sampling temperature of the request
+            enabled: Profile opt-in flag
+        
+        Returns:
+            bool: True if caching is enabled globally, for the profile, and
+            the temperature is deterministic enough
+        """
+        return (
+            settings.cache.enabled
+            and bool(enabled)
+            and temperature <= settings.cache.max_temperature
+        )
+    
+    @staticmethod
+    def make_key(
+        provider: str,
+        model: Optional[str],
+        system_instructions: Optional[str],
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int
+    ) -> str:
+        """
+        Build the cache key for a request.
+        
+        Message roles are lowercased and contents stripped of surrounding
+        whitespace with normalized line endings before hashing.
+        """
+        normalized = [
+            {
+                "role": message["role"].lower(),
+                "content": message["content"].replace("\r\n", "\n").strip()
+            }
+            for message in messages
+        ]
+        material = json.dumps(
+            {
+                "provider": provider,
+                "model": model,
+                "system": (system_instructions or "").strip(),
+                "messages": normalized,
+                "temperature": round(temperature, 4),
+                "max_tokens": max_tokens
+            },
+            sort_keys=True,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+    
+    async def get(self, key: str) -> Optional[dict]:
+        """Look up a cached response payload, recording the hit or miss."""
+        try:
+            value = await self.backend.get(key)
+        except Exception:
+            value = None
+        
+        if value is None:
+            self.misses += 1
+            LLM_CACHE_REQUESTS.labels(result="miss").inc()
+            return None
+        
+        self.hits += 1
+        LLM_CACHE_REQUESTS.labels(result="hit").inc()
+        return json.loads(value)
+    
+    async def set(self, key: str, payload: dict) -> None:
+        """Store a response payload."""
+        try:
+            await self.backend.set(key, json.dumps(payload), settings.cache.ttl)
+        except Exception:
+            pass
+    
+    async def close(self) -> None:
+        """Release backend resources."""
+        await self.backend.close()
+
+
+def create_response_cache() -> ResponseCache:
+    """
+    Create the response cache with the configured backend.
+    
+    Returns:
+        ResponseCache: Cache backed by Redis when ``CACHE_BACKEND=redis`` and
+        Redis is enabled, otherwise by the in-process backend
+    """
+    if settings.cache.backend == "redis" and settings.redis.enabled:
+        backend = RedisCacheBackend(settings.redis.url)
+    else:
+        backend = MemoryCacheBackend(
+            max_entries=settings.cache.max_entries,
+            max_bytes=settings.cache.max_bytes
+        )
+    return ResponseCache(backend)
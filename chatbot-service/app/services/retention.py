@@ -0,0 +1,153 @@
+"""
+Retention purge of expired chat sessions.
+
+This module deletes sessions inactive beyond the retention period, with
+their messages and archive blocks, in short transactions that never hold
+the database's write lock for long.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from sqlalchemy import delete, select, tuple_
+import structlog
+from app.config import get_settings
+from app.core.metrics import CHAT_ROWS_PURGED, CHAT_SESSIONS_DELETED
+from app.database.session import AsyncSessionLocal, async_shard_engines, record_writers
+from app.models.message import Message
+from app.models.message_archive import MessageArchive
+from app.models.session import Session as ChatSession
+from app.services.history_cache import get_history_cache
+from app.services.memory_index import get_memory_index
+
+# Get settings
+settings = get_settings()
+
+logger = structlog.get_logger(__name__)
+
+
+class RetentionPurger:
+    """
+    Delete expired sessions in the background.
+    
+    Every ``interval`` seconds, sessions without activity for
+    ``retention_days`` days are deleted, on the directory and on every
+    shard. A session's messages and archive blocks are deleted first, at
+    most ``batch_rows`` per transaction, then the session itself, so no
+    single statement deletes a large session at once. Every transaction
+    checks again that the session is expired; a session revived midway
+    loses only rows older than the retention period.
+    """
+    
+    def __init__(self, retention_days: float, interval: float, batch_sessions: int, batch_rows: int):
+        self.retention_days = retention_days
+        self.interval = interval
+        self.batch_sessions = batch_sessions
+        self.batch_rows = batch_rows
+        self._worker: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """Start the periodic purge runs."""
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+    
+    async def shutdown(self) -> None:
+        """Stop the periodic purge runs."""
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+    
+    async def purge_expired(self) -> int:
+        """
+        Delete all sessions inactive for longer than the retention period.
+        
+        Returns:
+            int: Number of sessions deleted
+        """
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        purged = 0
+        for shard in [None, *async_shard_engines]:
+            last_key: Optional[Tuple[datetime, int]] = None
+            while True:
+                async with AsyncSessionLocal(info={"shard": shard}) as db:
+                    query = select(ChatSession.id, ChatSession.user_id, ChatSession.last_activity).where(
+                        ChatSession.last_activity < cutoff
+                    )
+                    if last_key is not None:
+                        query = query.where(tuple_(ChatSession.last_activity, ChatSession.id) > last_key)
+                    result = await db.execute(query.order_by(
+                        ChatSession.last_activity, ChatSession.id
+                    ).limit(self.batch_sessions))
+                    sessions = result.all()
+                
+                for session_id, user_id, _ in sessions:
+                    if await self._purge_session(shard, session_id, user_id, cutoff):
+                        purged += 1
+                if len(sessions) < self.batch_sessions:
+                    break
+                last_key = (sessions[-1].last_activity, sessions[-1].id)
+        return purged
+    
+    async def _run(self) -> None:
+        """Purge expired sessions periodically."""
+        while True:
+            try:
+                purged = await self.purge_expired()
+                if purged:
+                    logger.info("Purged expired chat sessions", count=purged)
+            except Exception as e:
+                logger.error("Session retention purge failed", exc_info=e)
+            await asyncio.sleep(self.interval)
+    
+    async def _purge_session(self, shard: Optional[str], session_id: int, user_id: int, cutoff: datetime) -> bool:
+        """Delete one session in chunks, unless it became active again."""
+        expired = select(ChatSession.id).where(
+            ChatSession.id == session_id,
+            ChatSession.last_activity < cutoff
+        )
+        for model in (Message, MessageArchive):
+            while True:
+                async with AsyncSessionLocal(info={"shard": shard}) as db:
+                    chunk = select(model.id).where(
+                        model.session_id.in_(expired)
+                    ).limit(self.batch_rows)
+                    result = await db.execute(delete(model).where(model.id.in_(chunk)))
+                    record_writers(db, [user_id])
+                    await db.commit()
+                CHAT_ROWS_PURGED.labels(table=model.__tablename__).inc(result.rowcount)
+                if result.rowcount < self.batch_rows:
+                    break
+                # Let requests waiting for the write lock in between
+                await asyncio.sleep(0)
+        
+        async with AsyncSessionLocal(info={"shard": shard}) as db:
+            result = await db.execute(delete(ChatSession).where(
+                ChatSession.id == session_id,
+                ChatSession.last_activity < cutoff
+            ))
+            record_writers(db, [user_id])
+            await db.commit()
+        if result.rowcount != 1:
+            return False
+        
+        get_memory_index().remove_session(session_id)
+        get_history_cache().invalidate(session_id)
+        CHAT_SESSIONS_DELETED.labels(reason="retention").inc()
+        return True
+
+
+_retention_purger: Optional[RetentionPurger] = None
+
+
+def get_retention_purger() -> RetentionPurger:
+    """Get the global retention purger instance."""
+    global _retention_purger
+    if _retention_purger is None:
+        _retention_purger = RetentionPurger(
+            retention_days=settings.service.retention_days,
+            interval=settings.service.retention_interval,
+            batch_sessions=settings.service.retention_batch_sessions,
+            batch_rows=settings.service.retention_batch_rows
+        )
+    return _retention_purger
@@ -0,0 +1,244 @@
+"""
+Rolling summarization of long chat sessions.
+
+This module keeps a running summary of the older turns of a session in
+its session_metadata. Summaries are updated in background tasks after
+responses and sent to the LLM in place of the history they cover.
+"""
+
+import asyncio
+import json
+from datetime import datetime
+from typing import Dict, Optional, Set
+from sqlalchemy import func, select, tuple_
+import structlog
+from app.config import get_settings
+from app.core.metrics import CHAT_SUMMARY_UPDATES
+from app.database.session import AsyncSessionLocal
+from app.models.message import Message
+from app.models.profile import Profile
+from app.models.session import Session as ChatSession
+
+# Get settings
+settings = get_settings()
+
+logger = structlog.get_logger(__name__)
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and an "
+    "assistant. Update the existing summary with the new messages. Keep facts, "
+    "decisions, user preferences and open questions; drop small talk. Answer "
+    "with the updated summary only, in the language of the conversation."
+)
+
+
+def get_session_summary(session: ChatSession) -> Optional[Dict]:
+    """
+    Get the rolling summary stored in a session's metadata.
+    
+    Args:
+        session: Chat session
+    
+    Returns:
+        Optional[Dict]: Summary with content and the through_created_at and
+        through_message_id of the last message it covers, or None
+    """
+    if not session.session_metadata:
+        return None
+    
+    try:
+        return json.loads(session.session_metadata).get("summary")
+    except (ValueError, AttributeError):
+        return None
+
+
+def is_summarized(summary: Dict, created_at: datetime, message_id: int) -> bool:
+    """
+    Whether a message is covered by a session summary.
+    
+    Messages are ordered by (created_at, id): IDs alone are not, since
+    sharded deployments hand out ID blocks per process.
+    
+    Args:
+        summary: Session summary
+        created_at: Creation time of the message
+        message_id: Primary key of the message
+    
+    Returns:
+        bool: True if the message was folded into the summary
+    """
+    if "through_created_at" not in summary:
+        # Summaries written before the timestamp was recorded
+        return message_id <= summary["through_message_id"]
+    through = (datetime.fromisoformat(summary["through_created_at"]), summary["through_message_id"])
+    return (created_at, message_id) <= through
+
+
+class SessionSummarizer:
+    """
+    Update session summaries in the background, off the request path.
+    
+    Messages older than the most recent ``keep_messages`` are folded into the
+    summary once at least ``min_batch`` of them are unsummarized. Each update
+    is one LLM call over at most ``max_batch`` messages, and at most one
+    update runs per session at a time.
+    """
+    
+    def __init__(self, keep_messages: int, min_batch: int, max_batch: int, max_tokens: int):
+        self.keep_messages = keep_messages
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.max_tokens = max_tokens
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._pending: Set[int] = set()
+    
+    def schedule(self, session_id: int) -> None:
+        """
+        Schedule a summary update for a session.
+        
+        If an update is already running, another one runs after it so the
+        latest messages are considered.
+        
+        Args:
+            session_id: Primary key of the chat session
+        """
+        if session_id in self._tasks:
+            self._pending.add(session_id)
+            return
+        
+        task = asyncio.create_task(self._run(session_id))
+        self._tasks[session_id] = task
+    
+    async def shutdown(self) -> None:
+        """Cancel running summary updates."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._pending.clear()
+    
+    async def _run(self, session_id: int) -> None:
+        """Run summary updates for a session until none is pending."""
+        try:
+            while True:
+                self._pending.discard(session_id)
+                try:
+                    result = await self._update(session_id)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning("Session summary update failed", session_id=session_id, error=str(e))
+                    result = "error"
+                CHAT_SUMMARY_UPDATES.labels(result=result).inc()
+                
+                if session_id not in self._pending:
+                    break
+        finally:
+            self._tasks.pop(session_id, None)
+    
+    async def _update(self, session_id: int) -> str:
+        """
+        Fold older unsummarized messages of a session into its summary.
+        
+        Args:
+            session_id: Primary key of the chat session
+        
+        Returns:
+            str: Outcome, "updated" or "skipped"
+        """
+        # Imported here to avoid a circular import with the LLM service
+        from app.services.llm_service import get_llm_service
+        
+        db = AsyncSessionLocal()
+        try:
+            session = await db.get(ChatSession, session_id)
+            if not session:
+                return "skipped"
+            profile = await db.get(Profile, session.profile_id)
+            if not profile or not profile.summarization_enabled:
+                return "skipped"
+            
+            summary = get_session_summary(session) or {}
+            
+            # Oldest unsummarized messages outside the recent window
+            unsummarized = [Message.session_id == session_id]
+            if "through_created_at" in summary:
+                unsummarized.append(tuple_(Message.created_at, Message.id) > (
+                    datetime.fromisoformat(summary["through_created_at"]),
+                    summary["through_message_id"]
+                ))
+            elif summary:
+                unsummarized.append(Message.id > summary["through_message_id"])
+            count = await db.scalar(select(func.count(Message.id)).where(*unsummarized)) - self.keep_messages
+            if count < self.min_batch:
+                return "skipped"
+            result = await db.execute(
+                select(Message).where(*unsummarized).order_by(
+                    Message.created_at, Message.id
+                ).limit(min(count, self.max_batch))
+            )
+            messages = result.scalars().all()
+            if count > self.max_batch:
+                # Catch up on a long backlog in further updates
+                self._pending.add(session_id)
+            
+            transcript = "\n".join(f"{msg.role}: {msg.content}" for msg in messages)
+            prompt = (
+                f"Existing summary:\n{summary.get('content') or '(none)'}\n\n"
+                f"New messages:\n{transcript}"
+            )
+            summary_profile = Profile(
+                llm_provider=profile.llm_provider,
+                llm_model=profile.llm_model,
+                fallback_providers=profile.fallback_providers,
+                system_instructions=SUMMARY_INSTRUCTIONS,
+                temperature="0.2",
+                max_tokens=self.max_tokens,
+                response_cache_enabled=False,
+                hedging_enabled=False
+            )
+            last_message = (messages[-1].created_at, messages[-1].id)
+            session_key = session.session_id
+            
+            # Release the connection while the LLM call runs
+            await db.close()
+            
+            response = await get_llm_service().generate_response(
+                messages=[{"role": "user", "content": prompt}],
+                profile=summary_profile,
+                session_key=session_key
+            )
+            
+            # Re-read the metadata so concurrent changes are kept
+            session = await db.get(ChatSession, session_id, populate_existing=True)
+            if not session:
+                return "skipped"
+            metadata = json.loads(session.session_metadata) if session.session_metadata else {}
+            metadata["summary"] = {
+                "content": response.content.strip(),
+                "through_created_at": last_message[0].isoformat(),
+                "through_message_id": last_message[1],
+                "updated_at": datetime.utcnow().isoformat()
+            }
+            session.session_metadata = json.dumps(metadata)
+            await db.commit()
+            return "updated"
+        finally:
+            await db.close()
+
+
+_session_summarizer: Optional[SessionSummarizer] = None
+
+
+def get_session_summarizer() -> SessionSummarizer:
+    """Get the global session summarizer instance."""
+    global _session_summarizer
+    if _session_summarizer is None:
+        _session_summarizer = SessionSummarizer(
+            keep_messages=settings.service.summary_keep_messages,
+            min_batch=settings.service.summary_min_batch,
+            max_batch=settings.service.max_history_length,
+            max_tokens=settings.service.summary_max_tokens
+        )
+    return _session_summarizer
@@ -0,0 +1,183 @@
+"""
+Benchmark of database queries under concurrent LLM streaming.
+
+Runs slow history queries next to simulated LLM streams, once through the
+sync session, whose queries block the event loop, and once through the
+async session. Reports query throughput and how long streams stalled
+between chunks. The database is a scratch SQLite file; application
+modules are imported inside functions, once DB_URL points at it.
+
+Usage (from chatbot-service/):
+    python scripts/bench_async_db.py [--streams 50] [--queries 200] [--messages 20000]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=50, help="Concurrent simulated LLM streams")
+    parser.add_argument("--chunks", type=int, default=100, help="Chunks per stream")
+    parser.add_argument("--chunk-interval", type=float, default=0.02, help="Seconds between chunks")
+    parser.add_argument("--queries", type=int, default=200, help="History queries per run")
+    parser.add_argument("--query-workers", type=int, default=10, help="Concurrent query workers")
+    parser.add_argument("--messages", type=int, default=20000, help="Messages seeded in the database")
+    return parser.parse_args()
+
+
+def seed(messages: int) -> int:
+    """
+    Create a user with one session holding many messages.
+    
+    Returns:
+        int: Internal ID of the session
+    """
+    from app.database.session import SessionLocal
+    from app.models import Message, Profile, Session as ChatSession, User
+    
+    with SessionLocal() as db:
+        user = User(username="bench", email="bench@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        profile = Profile(user_id=user.id, name="Bench", system_instructions="s", llm_provider="lm_studio")
+        db.add(profile)
+        db.flush()
+        session = ChatSession(session_id=str(uuid.uuid4()), user_id=user.id, profile_id=profile.id)
+        db.add(session)
+        db.flush()
+        db.add_all([
+            Message(
+                message_id=str(uuid.uuid4()),
+                content=f"message {index} " + "lorem ipsum " * 20,
+                role="user" if index % 2 == 0 else "assistant",
+                user_id=user.id,
+                session_id=session.id,
+                profile_id=profile.id
+            )
+            for index in range(messages)
+        ])
+        db.commit()
+        return session.id
+
+
+def history_query(session_id: int):
+    """A history query that scans the session's messages, like a search."""
+    from sqlalchemy import func, select
+    from app.models import Message
+    
+    return select(func.count()).where(
+        Message.session_id == session_id,
+        Message.content.like("%needle%")
+    )
+
+
+async def stream(chunks: int, interval: float, stalls: List[float]) -> None:
+    """Simulate an LLM stream, recording how late each chunk arrived."""
+    for _ in range(chunks):
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - expected)
+
+
+async def sync_query(session_id: int) -> None:
+    """Run the query through the sync session, as the routers did before."""
+    from app.database.session import SessionLocal
+    
+    with SessionLocal() as db:
+        db.execute(history_query(session_id)).scalar()
+
+
+async def async_query(session_id: int) -> None:
+    """Run the query through the async session."""
+    from app.database.session import AsyncSessionLocal
+    
+    async with AsyncSessionLocal() as db:
+        (await db.execute(history_query(session_id))).scalar()
+
+
+async def run(args: argparse.Namespace, query: Callable, session_id: int) -> Tuple[float, List[float], List[float]]:
+    """
+    Run the streams and the queries concurrently.
+    
+    Returns:
+        Tuple[float, List[float], List[float]]: Time to run all queries,
+        query latencies and chunk stalls
+    """
+    stalls: List[float] = []
+    latencies: List[float] = []
+    remaining = iter(range(args.queries))
+    
+    async def query_worker() -> None:
+        for _ in remaining:
+            start = time.perf_counter()
+            await query(session_id)
+            latencies.append(time.perf_counter() - start)
+    
+    streams = [asyncio.create_task(stream(args.chunks, args.chunk_interval, stalls)) for _ in range(args.streams)]
+    start = time.perf_counter()
+    await asyncio.gather(*(query_worker() for _ in range(args.query_workers)))
+    elapsed = time.perf_counter() - start
+    await asyncio.gather(*streams)
+    return elapsed, latencies, stalls
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Get a percentile of a list of values."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Seed the database and benchmark both session types."""
+    from app.database.migrate import run_migrations
+    from app.database.session import dispose_engines
+    
+    run_migrations()
+    session_id = seed(args.messages)
+    
+    # Warm up connections and the page cache
+    await sync_query(session_id)
+    await async_query(session_id)
+    
+    print(
+        f"{args.queries} queries over {args.query_workers} workers, "
+        f"{args.streams} streams of {args.chunks} chunks every {args.chunk_interval * 1000:.0f} ms, "
+        f"{args.messages} messages"
+    )
+    print(f"{'session':<8} {'queries/s':>10} {'query p95':>10} {'stall p50':>10} {'stall p99':>10} {'stall max':>10}")
+    for name, query in (("sync", sync_query), ("async", async_query)):
+        elapsed, latencies, stalls = await run(args, query, session_id)
+        print(
+            f"{name:<8} {args.queries / elapsed:>10.1f} "
+            f"{percentile(latencies, 0.95) * 1000:>8.1f}ms "
+            f"{statistics.median(stalls) * 1000:>8.1f}ms "
+            f"{percentile(stalls, 0.99) * 1000:>8.1f}ms "
+            f"{max(stalls) * 1000:>8.1f}ms"
+        )
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    database_dir = tempfile.mkdtemp(prefix="chatbot-bench-")
+    # Settings are read on import: point them at a scratch database first
+    os.environ["DB_URL"] = f"sqlite:///{database_dir}/bench.db"
+    os.environ["DB_REPLICA_URLS"] = "[]"
+    os.environ["DB_SHARD_URLS"] = "[]"
+    try:
+        asyncio.run(main(arguments))
+    finally:
+        shutil.rmtree(database_dir, ignore_errors=True)
@@ -0,0 +1,148 @@
+"""
+Benchmark of the SQLite connection setups under a mixed read/write load.
+
+Compares the former single shared connection (StaticPool), a plain
+connection pool in rollback-journal mode (DB_SQLITE_WAL=false), and WAL
+mode with a reader pool and one writer (the default). Concurrent workers
+read history pages and commit new messages; each setup runs in its own
+process against a fresh scratch database, since settings are read on
+import.
+
+Usage (from chatbot-service/):
+    python scripts/bench_sqlite_wal.py [--workers 50] [--ops 40] [--write-ratio 0.2]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import List
+
+from bench_async_db import percentile, seed
+
+MODES = ("static", "pooled", "wal")
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=50, help="Concurrent workers")
+    parser.add_argument("--ops", type=int, default=40, help="Operations per worker")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="Fraction of operations that commit a message")
+    parser.add_argument("--page-size", type=int, default=50, help="Messages per history page")
+    parser.add_argument("--messages", type=int, default=5000, help="Messages seeded in the database")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def session_factories(mode: str):
+    """Get the async session factories of a setup, for writes and for reads."""
+    from app.database.session import AsyncReadSessionLocal, AsyncSessionLocal
+    
+    if mode != "static":
+        # Only read-only sessions read from the reader pool
+        return AsyncSessionLocal, AsyncReadSessionLocal
+    
+    # The setup before WAL mode: every request shares one connection
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import StaticPool
+    from app.config import get_settings
+    from app.database.session import get_async_url
+    
+    engine = create_async_engine(get_async_url(get_settings().database.url), poolclass=StaticPool)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    return factory, factory
+
+
+async def run_mode(args: argparse.Namespace) -> None:
+    """Seed the scratch database, run the workload and print one result row."""
+    from sqlalchemy import select
+    from app.database.migrate import run_migrations
+    from app.database.session import dispose_engines
+    from app.models import Message, Session as ChatSession
+    
+    run_migrations()
+    session_id = seed(args.messages)
+    write_factory, read_factory = session_factories(args.mode)
+    async with read_factory() as db:
+        session = (await db.execute(select(ChatSession).where(ChatSession.id == session_id))).scalar_one()
+    
+    reads: List[float] = []
+    writes: List[float] = []
+    failures: List[str] = []
+    write_every = max(1, round(1 / args.write_ratio)) if args.write_ratio > 0 else 0
+    
+    async def worker(number: int) -> None:
+        for op in range(args.ops):
+            write = write_every and (number + op) % write_every == 0
+            start = time.perf_counter()
+            try:
+                async with (write_factory if write else read_factory)() as db:
+                    if write:
+                        db.add(Message(
+                            message_id=str(uuid.uuid4()),
+                            content="new message",
+                            role="user",
+                            user_id=session.user_id,
+                            session_id=session.id,
+                            profile_id=session.profile_id
+                        ))
+                        await db.commit()
+                    else:
+                        result = await db.execute(select(Message.id, Message.content).where(
+                            Message.session_id == session.id
+                        ).order_by(Message.created_at.desc(), Message.id.desc()).limit(args.page_size))
+                        result.all()
+            except Exception as e:
+                failures.append(type(e).__name__)
+                continue
+            (writes if write else reads).append(time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(number) for number in range(args.workers)))
+    elapsed = time.perf_counter() - start
+    await dispose_engines()
+    
+    done = len(reads) + len(writes)
+    print(
+        f"{args.mode:<8} {done / elapsed:>8.0f} "
+        f"{percentile(reads, 0.5) * 1000:>8.1f}ms {percentile(reads, 0.95) * 1000:>8.1f}ms "
+        f"{percentile(writes, 0.95) * 1000 if writes else 0:>8.1f}ms {len(failures):>8}",
+        flush=True
+    )
+
+
+def main(args: argparse.Namespace) -> None:
+    """Run every setup in a subprocess with its own scratch database."""
+    total = args.workers * args.ops
+    print(
+        f"{total} operations over {args.workers} workers, {args.write_ratio:.0%} writes, "
+        f"{args.messages} seeded messages"
+    )
+    print(f"{'setup':<8} {'ops/s':>8} {'read p50':>10} {'read p95':>10} {'write p95':>10} {'failed':>8}", flush=True)
+    for mode in MODES:
+        database_dir = tempfile.mkdtemp(prefix="chatbot-bench-")
+        env = {
+            **os.environ,
+            "DB_URL": f"sqlite:///{database_dir}/bench.db",
+            "DB_REPLICA_URLS": "[]",
+            "DB_SHARD_URLS": "[]",
+            "DB_SQLITE_WAL": "true" if mode == "wal" else "false"
+        }
+        try:
+            subprocess.run([sys.executable, *sys.argv, "--mode", mode], env=env, check=True)
+        finally:
+            shutil.rmtree(database_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    if arguments.mode:
+        asyncio.run(run_mode(arguments))
+    else:
+        main(arguments)
@@ -0,0 +1,99 @@
+"""
+Shared fixtures for the Chatbot Service tests.
+
+The tests run against a temporary SQLite database, configured through the
+environment before any application module reads its settings.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import uuid
+
+import httpx
+import pytest
+import pytest_asyncio
+
+DATABASE_DIR = tempfile.mkdtemp(prefix="chatbot-tests-")
+os.environ["DB_URL"] = f"sqlite:///{DATABASE_DIR}/primary.db"
+os.environ["DB_REPLICA_URLS"] = "[]"
+os.environ["DB_SHARD_URLS"] = "[]"
+
+from app.core.security import create_access_token  # noqa: E402
+from app.database.migrate import run_migrations  # noqa: E402
+from app.database.session import AsyncSessionLocal, SessionLocal, dispose_engines  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Profile, Session as ChatSession, User  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """One event loop for all tests, shared with the pooled async engines."""
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.run_until_complete(dispose_engines())
+    loop.close()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    """Migrate the temporary primary database."""
+    run_migrations()
+    yield f"{DATABASE_DIR}/primary.db"
+    shutil.rmtree(DATABASE_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def profile() -> Profile:
+    """A new user with a default profile."""
+    db = SessionLocal()
+    try:
+        name = f"user-{uuid.uuid4().hex[:8]}"
+        user = User(username=name, email=f"{name}@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        profile = Profile(
+            user_id=user.id,
+            name="Default",
+            system_instructions="You are a helpful AI assistant.",
+            llm_provider="lm_studio",
+            is_default=True
+        )
+        db.add(profile)
+        db.commit()
+        db.refresh(profile)
+        db.expunge(profile)
+        return profile
+    finally:
+        db.close()
+
+
+@pytest_asyncio.fixture
+async def chat_session(profile: Profile) -> ChatSession:
+    """A chat session of the test user."""
+    async with AsyncSessionLocal() as db:
+        session = ChatSession(
+            session_id=str(uuid.uuid4()),
+            title="Chat",
+            user_id=profile.user_id,
+            profile_id=profile.id
+        )
+        db.add(session)
+        await db.commit()
+    return session
+
+
+@pytest_asyncio.fixture
+async def api(profile: Profile):
+    """An HTTP client of the application, authenticated as the test user."""
+    with SessionLocal() as db:
+        username = db.get(User, profile.user_id).username
+    token = create_access_token({"sub": username})
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url="http://localhost/api/v1",
+        headers={"Authorization": f"Bearer {token}"}
+    ) as client:
+        yield client
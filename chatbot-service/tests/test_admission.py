@@ -0,0 +1,176 @@
+"""
+Tests of admission control and the adaptive concurrency limit.
+"""
+
+import asyncio
+
+import pytest
+
+from app.routers import chat
+from app.services.admission import AdmissionController, AdmissionRejected, AIMDLimit
+from app.services.llm_service import LLMProviderError
+
+
+def controller(limit: int = 1, max_queue: int = 2, queue_timeout: float = 1.0) -> AdmissionController:
+    """A fixed-limit admission controller."""
+    return AdmissionController("test", limit=limit, max_queue=max_queue, queue_timeout=queue_timeout)
+
+
+def aimd(initial: int = 10) -> AIMDLimit:
+    """An adaptive limit between 1 and 20."""
+    return AIMDLimit("test", initial=initial, min_limit=1, max_limit=20, tolerance=2.0, backoff=0.5)
+
+
+@pytest.mark.asyncio
+async def test_requests_within_the_limit_are_admitted_at_once():
+    limiter = controller(limit=2)
+    await limiter.acquire()
+    await limiter.acquire()
+    
+    assert limiter.active == 2
+    assert limiter.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_queued_requests_are_admitted_in_order():
+    limiter = controller(limit=1, max_queue=5)
+    admitted = []
+    
+    async def request(number: int) -> None:
+        async with limiter.slot():
+            admitted.append(number)
+            await asyncio.sleep(0.01)
+    
+    await asyncio.gather(*(request(number) for number in range(4)))
+    
+    assert admitted == [0, 1, 2, 3]
+    assert limiter.active == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_is_rejected_with_429():
+    limiter = controller(limit=1, max_queue=1)
+    await limiter.acquire()
+    waiting = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    
+    with pytest.raises(AdmissionRejected) as rejected:
+        await limiter.acquire()
+    assert rejected.value.reason == "queue_full"
+    assert rejected.value.status_code == 429
+    assert rejected.value.retry_after >= 1
+    
+    limiter.release()
+    await waiting
+    assert limiter.active == 1
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout_is_rejected_with_503():
+    limiter = controller(limit=1, queue_timeout=0.01)
+    await limiter.acquire()
+    
+    with pytest.raises(AdmissionRejected) as rejected:
+        await limiter.acquire()
+    assert rejected.value.reason == "queue_timeout"
+    assert rejected.value.status_code == 503
+    assert limiter.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+    limiter = controller(limit=1)
+    await limiter.acquire()
+    waiting = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    
+    waiting.cancel()
+    await asyncio.gather(waiting, return_exceptions=True)
+    limiter.release()
+    
+    assert limiter.queue_depth == 0
+    assert limiter.active == 0
+
+
+def test_retry_after_grows_with_the_queue():
+    limiter = controller(limit=2)
+    limiter.avg_service_time = 4.0
+    
+    assert limiter.retry_after() == 2
+    limiter._waiters.extend([None] * 3)
+    assert limiter.retry_after() == 8
+
+
+@pytest.mark.asyncio
+async def test_rejected_turns_get_retry_after(api, monkeypatch):
+    async def overloaded(*args, **kwargs):
+        raise AdmissionRejected("lm_studio", "queue_full", 7)
+    
+    monkeypatch.setattr(chat.llm_service, "generate_response", overloaded)
+    response = await api.post("/chat/send-auth", json={"content": "hello"})
+    
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
+
+
+def test_aimd_grows_while_the_limit_is_used():
+    limit = aimd()
+    for _ in range(30):
+        limit.on_sample(0.1, None, False, limit.limit)
+    
+    assert limit.limit > 10
+
+
+def test_aimd_holds_while_the_limit_is_not_used():
+    limit = aimd()
+    for _ in range(30):
+        limit.on_sample(0.1, None, False, 1)
+    
+    assert limit.limit == 10
+
+
+def test_aimd_backs_off_on_errors_and_congestion():
+    limit = aimd()
+    assert limit.on_sample(0.0, None, True, 10) == 5
+    
+    limit = aimd()
+    limit.on_sample(0.01, 10, False, 10)
+    # Much slower per token than the baseline
+    assert limit.on_sample(1.0, 10, False, 10) == 5
+
+
+def test_aimd_backs_off_at_most_once_per_round_trip():
+    limit = aimd()
+    limit.on_sample(60.0, None, True, 10)
+    
+    assert limit.on_sample(60.0, None, True, 10) == 5
+
+
+def test_aimd_normalizes_latency_per_token():
+    limit = aimd()
+    limit.on_sample(0.1, 10, False, 10)
+    
+    # A long completion at the same speed per token is not congestion
+    assert limit.on_sample(10.0, 1000, False, 10) == 10
+
+
+@pytest.mark.asyncio
+async def test_slot_counts_only_transient_errors():
+    controller = AdmissionController("test", limit=10, max_queue=10, queue_timeout=1.0, adaptive=aimd())
+    
+    with pytest.raises(LLMProviderError):
+        async with controller.slot():
+            raise LLMProviderError("bad request", "test", status_code=400, transient=False)
+    assert controller.limit == 10
+    
+    with pytest.raises(LLMProviderError):
+        async with controller.slot():
+            raise LLMProviderError("upstream unavailable", "test", status_code=503, transient=True)
+    assert controller.limit == 5
+    
+    # Errors without a transient flag count, as before
+    with pytest.raises(ConnectionError):
+        async with controller.slot():
+            raise ConnectionError("reset")
+    assert controller.limit < 5
+    assert controller.active == 0
@@ -0,0 +1,167 @@
+"""
+Tests of archiving cold sessions into compressed blocks and restoring them.
+"""
+
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import List
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+
+from app.database.session import AsyncSessionLocal
+from app.models import Message, MessageArchive, Profile, Session as ChatSession
+from app.services import archiver as archiver_module
+from app.services.archiver import SessionArchiver
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def archiver() -> SessionArchiver:
+    """An archiver of sessions inactive for 30 days, in blocks of 10 messages."""
+    return SessionArchiver(after_days=30, interval=3600, batch_sessions=10, block_messages=10, compression_level=6)
+
+
+@pytest_asyncio.fixture
+async def cold_session(profile: Profile) -> ChatSession:
+    """A session with 25 messages, inactive since the start of 2024."""
+    async with AsyncSessionLocal() as db:
+        session = ChatSession(
+            session_id=str(uuid.uuid4()),
+            title="Cold chat",
+            user_id=profile.user_id,
+            profile_id=profile.id,
+            last_activity=START
+        )
+        db.add(session)
+        await db.flush()
+        db.add_all([
+            Message(
+                message_id=str(uuid.uuid4()),
+                content=f"message {index}",
+                role="user" if index % 2 == 0 else "assistant",
+                user_id=profile.user_id,
+                session_id=session.id,
+                profile_id=profile.id,
+                created_at=START - timedelta(hours=1) + timedelta(seconds=index)
+            )
+            for index in range(25)
+        ])
+        await db.commit()
+    return session
+
+
+async def stored(session: ChatSession) -> List[str]:
+    """Contents of a session's messages in the messages table."""
+    async with AsyncSessionLocal() as db:
+        return list(await db.scalars(select(Message.content).where(
+            Message.session_id == session.id
+        ).order_by(Message.created_at, Message.id)))
+
+
+async def block_sizes(session: ChatSession) -> List[int]:
+    """Message counts of a session's archive blocks."""
+    async with AsyncSessionLocal() as db:
+        return list(await db.scalars(select(MessageArchive.message_count).where(
+            MessageArchive.session_id == session.id
+        ).order_by(MessageArchive.first_created_at)))
+
+
+async def restore(session: ChatSession) -> None:
+    """Restore a session, as a new turn does."""
+    async with AsyncSessionLocal() as db:
+        session = await db.get(ChatSession, session.id)
+        await archiver_module.get_session_archiver().restore(db, session)
+        await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_cold_sessions_are_archived_in_blocks(archiver, cold_session):
+    assert await archiver.archive_cold_sessions() >= 1
+    
+    assert await stored(cold_session) == []
+    assert await block_sizes(cold_session) == [10, 10, 5]
+    async with AsyncSessionLocal() as db:
+        assert await db.scalar(select(ChatSession.archived_at).where(ChatSession.id == cold_session.id))
+
+
+@pytest.mark.asyncio
+async def test_active_sessions_are_not_archived(archiver, cold_session):
+    cutoff = START - timedelta(days=1)
+    
+    assert not await archiver._archive_session(None, cold_session.id, cutoff)
+    assert len(await stored(cold_session)) == 25
+
+
+@pytest.mark.asyncio
+async def test_archived_history_is_readable_and_restored_intact(api, archiver, cold_session):
+    await archiver._archive_session(None, cold_session.id, datetime.utcnow())
+    url = f"/chat/history/{cold_session.session_id}"
+    expected = [f"message {index}" for index in range(25)]
+    
+    history = (await api.get(url)).json()
+    assert [message["content"] for message in history["messages"]] == expected
+    
+    page = (await api.get(url, params={"limit": 8})).json()
+    assert [message["content"] for message in page["messages"]] == expected[-8:]
+    older = (await api.get(url, params={"limit": 8, "before": page["before_cursor"]})).json()
+    assert [message["content"] for message in older["messages"]] == expected[-16:-8]
+    
+    await restore(cold_session)
+    assert await stored(cold_session) == expected
+    assert await block_sizes(cold_session) == []
+
+
+@pytest.mark.asyncio
+async def test_restore_during_archiving_stops_it(archiver, cold_session, monkeypatch):
+    opened = []
+    
+    @asynccontextmanager
+    async def restoring_after_first_block(*args, **kwargs):
+        # Sessions: the claim, the first block, then the second block
+        opened.append(kwargs)
+        if len(opened) == 3:
+            await restore(cold_session)
+        async with AsyncSessionLocal(*args, **kwargs) as db:
+            yield db
+    
+    monkeypatch.setattr(archiver_module, "AsyncSessionLocal", restoring_after_first_block)
+    assert await archiver._archive_session(None, cold_session.id, datetime.utcnow())
+    
+    assert await stored(cold_session) == [f"message {index}" for index in range(25)]
+    assert await block_sizes(cold_session) == []
+    async with AsyncSessionLocal() as db:
+        assert await db.scalar(select(ChatSession.archived_at).where(ChatSession.id == cold_session.id)) is None
+
+
+@pytest.mark.asyncio
+async def test_messages_written_after_the_claim_are_left_in_place(archiver, cold_session, monkeypatch):
+    opened = []
+    
+    @asynccontextmanager
+    async def replying_after_the_claim(*args, **kwargs):
+        opened.append(kwargs)
+        if len(opened) == 2:
+            # A write-behind reply to the session lands after the claim
+            async with AsyncSessionLocal() as db:
+                db.add(Message(
+                    message_id=str(uuid.uuid4()),
+                    content="late reply",
+                    role="assistant",
+                    user_id=cold_session.user_id,
+                    session_id=cold_session.id,
+                    profile_id=cold_session.profile_id,
+                    created_at=datetime.utcnow()
+                ))
+                await db.commit()
+        async with AsyncSessionLocal(*args, **kwargs) as db:
+            yield db
+    
+    monkeypatch.setattr(archiver_module, "AsyncSessionLocal", replying_after_the_claim)
+    await archiver._archive_session(None, cold_session.id, datetime.utcnow())
+    
+    assert await block_sizes(cold_session) == [10, 10, 5]
+    assert await stored(cold_session) == ["late reply"]
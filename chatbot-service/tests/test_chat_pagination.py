@@ -0,0 +1,140 @@
+"""
+Tests of the session list and chat history endpoints, with and without paging.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+import pytest
+
+from app.database.session import AsyncSessionLocal
+from app.models import Message, Profile, Session as ChatSession
+
+START = datetime(2024, 1, 1)
+
+
+async def create_sessions(profile: Profile, count: int) -> List[str]:
+    """Create sessions active one minute apart, returning their IDs oldest first."""
+    async with AsyncSessionLocal() as db:
+        sessions = [
+            ChatSession(
+                session_id=str(uuid.uuid4()),
+                title=f"Chat {index}",
+                user_id=profile.user_id,
+                profile_id=profile.id,
+                last_activity=START + timedelta(minutes=index)
+            )
+            for index in range(count)
+        ]
+        db.add_all(sessions)
+        await db.commit()
+    return [session.session_id for session in sessions]
+
+
+async def create_messages(session: ChatSession, count: int, same_time: bool = False) -> None:
+    """Store messages a second apart, or all at once to test ties on the timestamp."""
+    async with AsyncSessionLocal() as db:
+        db.add_all([
+            Message(
+                message_id=str(uuid.uuid4()),
+                content=f"message {index}",
+                role="user" if index % 2 == 0 else "assistant",
+                user_id=session.user_id,
+                session_id=session.id,
+                profile_id=session.profile_id,
+                created_at=START if same_time else START + timedelta(seconds=index)
+            )
+            for index in range(count)
+        ])
+        await db.commit()
+
+
+def contents(history: dict) -> List[str]:
+    return [message["content"] for message in history["messages"]]
+
+
+@pytest.mark.asyncio
+async def test_session_list_without_paging_is_a_plain_list(api, profile):
+    session_ids = await create_sessions(profile, 3)
+    
+    response = await api.get("/chat/sessions")
+    
+    assert response.status_code == 200
+    assert [session["session_id"] for session in response.json()] == session_ids[::-1]
+
+
+@pytest.mark.asyncio
+async def test_session_list_pages_in_both_directions(api, profile):
+    session_ids = await create_sessions(profile, 5)
+    newest_first = session_ids[::-1]
+    
+    first = (await api.get("/chat/sessions", params={"limit": 2})).json()
+    assert [session["session_id"] for session in first["sessions"]] == newest_first[:2]
+    assert first["has_more"]
+    
+    second = (await api.get("/chat/sessions", params={"limit": 2, "before": first["before_cursor"]})).json()
+    assert [session["session_id"] for session in second["sessions"]] == newest_first[2:4]
+    
+    last = (await api.get("/chat/sessions", params={"limit": 2, "before": second["before_cursor"]})).json()
+    assert [session["session_id"] for session in last["sessions"]] == newest_first[4:]
+    assert not last["has_more"]
+    
+    back = (await api.get("/chat/sessions", params={"limit": 2, "after": second["after_cursor"]})).json()
+    assert [session["session_id"] for session in back["sessions"]] == newest_first[:2]
+    assert not back["has_more"]
+
+
+@pytest.mark.asyncio
+async def test_history_without_paging_returns_every_message(api, chat_session):
+    await create_messages(chat_session, 7)
+    
+    history = (await api.get(f"/chat/history/{chat_session.session_id}")).json()
+    
+    assert contents(history) == [f"message {index}" for index in range(7)]
+    assert not history["has_more"]
+
+
+@pytest.mark.asyncio
+async def test_history_pages_back_from_the_latest_messages(api, chat_session):
+    await create_messages(chat_session, 7)
+    url = f"/chat/history/{chat_session.session_id}"
+    
+    latest = (await api.get(url, params={"limit": 3})).json()
+    assert contents(latest) == ["message 4", "message 5", "message 6"]
+    assert latest["has_more"]
+    
+    older = (await api.get(url, params={"limit": 3, "before": latest["before_cursor"]})).json()
+    assert contents(older) == ["message 1", "message 2", "message 3"]
+    
+    oldest = (await api.get(url, params={"limit": 3, "before": older["before_cursor"]})).json()
+    assert contents(oldest) == ["message 0"]
+    assert not oldest["has_more"]
+    
+    newer = (await api.get(url, params={"limit": 3, "after": oldest["after_cursor"]})).json()
+    assert contents(newer) == ["message 1", "message 2", "message 3"]
+    assert newer["has_more"]
+
+
+@pytest.mark.asyncio
+async def test_history_pages_messages_with_the_same_timestamp(api, chat_session):
+    await create_messages(chat_session, 5, same_time=True)
+    url = f"/chat/history/{chat_session.session_id}"
+    
+    seen = []
+    page = (await api.get(url, params={"limit": 2})).json()
+    while True:
+        seen = contents(page) + seen
+        if not page["has_more"]:
+            break
+        page = (await api.get(url, params={"limit": 2, "before": page["before_cursor"]})).json()
+    
+    assert seen == [f"message {index}" for index in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_invalid_cursors_are_rejected(api, chat_session):
+    url = f"/chat/history/{chat_session.session_id}"
+    
+    assert (await api.get(url, params={"before": "not a cursor"})).status_code == 400
+    assert (await api.get(url, params={"before": "YQ==", "after": "YQ=="})).status_code == 400
@@ -0,0 +1,132 @@
+"""
+Tests of token-budgeted context assembly.
+"""
+
+from app.services import context_builder as context_builder_module
+from app.services.context_builder import (
+    ContextBuilder,
+    EstimateTokenizer,
+    create_tokenizer,
+    register_tokenizer
+)
+
+
+def builder(max_messages: int = 20, cache_size: int = 100) -> ContextBuilder:
+    """A context builder counting one token per character and one per message."""
+    return ContextBuilder(EstimateTokenizer(1.0), max_messages, message_overhead=1, cache_size=cache_size)
+
+
+def turns(count: int, size: int = 9) -> list:
+    """Alternating user and assistant messages of size + 1 tokens each, oldest first."""
+    return [
+        {
+            "role": "user" if index % 2 == 0 else "assistant",
+            "content": str(index).rjust(size, "x"),
+            "message_id": f"m{index}"
+        }
+        for index in range(count)
+    ]
+
+
+def test_build_keeps_the_most_recent_turns_in_budget():
+    history = turns(10)
+    
+    # 6 tokens of system prompt and room for 4 messages
+    selected = builder().build("sys01", history, budget=6 + 45)
+    
+    assert [message["content"] for message in selected] == [message["content"] for message in history[6:]]
+    assert all(set(message) == {"role", "content"} for message in selected)
+
+
+def test_build_starts_on_a_user_turn():
+    history = turns(10)
+    
+    # Room for 3 messages, the oldest of them a reply
+    selected = builder().build(None, history, budget=30)
+    
+    assert selected[0]["role"] == "user"
+    assert [message["content"] for message in selected] == [message["content"] for message in history[8:]]
+
+
+def test_build_always_keeps_the_latest_message():
+    history = turns(3, size=100)
+    
+    selected = builder().build("system", history, budget=10)
+    
+    assert [message["content"] for message in selected] == [history[-1]["content"]]
+
+
+def test_build_limits_the_history_length():
+    selected = builder(max_messages=4).build(None, turns(10), budget=10_000)
+    
+    assert len(selected) == 4
+
+
+def test_build_leads_with_the_summary_within_budget():
+    history = turns(10)
+    summary = "s" * 10
+    header = "Summary of the earlier conversation:\n"
+    
+    selected = builder().build(None, history, budget=len(header) + 11 + 20, summary=summary)
+    
+    assert selected[0] == {"role": "system", "content": header + summary}
+    assert [message["content"] for message in selected[1:]] == [message["content"] for message in history[8:]]
+
+
+def test_message_counts_are_cached_by_id():
+    counted = []
+    
+    class CountingTokenizer(EstimateTokenizer):
+        def count(self, text: str) -> int:
+            counted.append(text)
+            return super().count(text)
+    
+    context = ContextBuilder(CountingTokenizer(1.0), 20, message_overhead=1, cache_size=2)
+    for message_id in ("a", "b", "a", "c", "a", "b"):
+        assert context.count_message("hello", message_id) == 6
+    
+    # "b" was evicted when "c" came in, "a" was kept as recently used
+    assert len(counted) == 4
+    # Messages without an ID are never cached
+    context.count_message("hello")
+    context.count_message("hello")
+    assert len(counted) == 6
+
+
+def test_budget_for_reserves_the_response(monkeypatch):
+    service_settings = context_builder_module.settings.service
+    monkeypatch.setattr(service_settings, "context_window_tokens", 4096)
+    monkeypatch.setattr(service_settings, "context_model_windows", {"big-model": 32768})
+    context = builder()
+    
+    assert context.budget_for("big-model", 1000) == 31768
+    assert context.budget_for("unknown-model", 1000) == 3096
+    assert context.budget_for(None, None) == 4096
+    assert context.budget_for("unknown-model", 10_000) == 0
+    # A profile's own budget wins
+    assert context.budget_for("big-model", 1000, override=2000) == 2000
+
+
+def test_recall_message_keeps_what_fits():
+    header = "Relevant earlier messages from this conversation:"
+    recalled = [
+        {"role": "user", "content": "a" * 10},
+        {"role": "assistant", "content": "b" * 100},
+        {"role": "user", "content": "c" * 10},
+    ]
+    
+    message = builder().recall_message(recalled, budget=len(header) + 1 + 2 * 17)
+    
+    assert message == {"role": "system", "content": f"{header}\nuser: {'a' * 10}\nuser: {'c' * 10}"}
+    assert builder().recall_message(recalled, budget=len(header) + 5) is None
+
+
+def test_create_tokenizer_falls_back_to_the_estimate(monkeypatch):
+    def missing():
+        raise ImportError("No module named 'tokenizers'")
+    
+    monkeypatch.setattr(context_builder_module, "_TOKENIZERS", dict(context_builder_module._TOKENIZERS))
+    register_tokenizer("missing", missing)
+    
+    assert isinstance(create_tokenizer("missing"), EstimateTokenizer)
+    assert isinstance(create_tokenizer("unknown"), EstimateTokenizer)
@@ -0,0 +1,157 @@
+"""
+Tests of the in-memory recent history cache.
+"""
+
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.database.session import AsyncReadSessionLocal, AsyncSessionLocal
+from app.models import Message, Session as ChatSession
+from app.services import history_cache as history_cache_module
+from app.services.history_cache import HistoryCache
+
+
+class Clock:
+    """Monotonic clock moved by hand."""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(history_cache_module, "time", clock)
+    return clock
+
+
+def cache(**overrides) -> HistoryCache:
+    """An enabled cache of 5 messages per session."""
+    values = dict(enabled=True, max_messages=5, max_bytes=1 << 20, ttl=60.0)
+    values.update(overrides)
+    return HistoryCache(**values)
+
+
+async def store(session: ChatSession, content: str) -> Message:
+    """Commit a user message to a session."""
+    async with AsyncSessionLocal() as db:
+        message = Message(
+            message_id=str(uuid.uuid4()),
+            content=content,
+            role="user",
+            user_id=session.user_id,
+            session_id=session.id,
+            profile_id=session.profile_id,
+            created_at=datetime.utcnow()
+        )
+        db.add(message)
+        await db.commit()
+        return message
+
+
+async def recent(history: HistoryCache, session: ChatSession):
+    """Contents of a session's recent messages, through the cache."""
+    async with AsyncReadSessionLocal() as db:
+        return [message.content for message in await history.recent(db, session.id)]
+
+
+@pytest.mark.asyncio
+async def test_serves_loaded_history_and_appended_messages(chat_session, clock, monkeypatch):
+    history = cache()
+    for index in range(7):
+        await store(chat_session, f"message {index}")
+    
+    assert await recent(history, chat_session) == [f"message {index}" for index in range(2, 7)]
+    
+    # Committed by this process: appended without reading the database
+    history.append(await store(chat_session, "message 7"))
+    monkeypatch.setattr(history, "_load", None)
+    assert await recent(history, chat_session) == [f"message {index}" for index in range(3, 8)]
+
+
+@pytest.mark.asyncio
+async def test_expired_history_is_reloaded_on_read(chat_session, clock):
+    history = cache()
+    await store(chat_session, "first")
+    assert await recent(history, chat_session) == ["first"]
+    
+    # Written by another process, unseen by the cache
+    await store(chat_session, "second")
+    assert await recent(history, chat_session) == ["first"]
+    
+    clock.now += 61
+    assert await recent(history, chat_session) == ["first", "second"]
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used_sessions_beyond_max_bytes(profile, clock):
+    sessions = []
+    async with AsyncSessionLocal() as db:
+        for _ in range(3):
+            session = ChatSession(session_id=str(uuid.uuid4()), user_id=profile.user_id, profile_id=profile.id)
+            db.add(session)
+            sessions.append(session)
+        await db.commit()
+    for session in sessions:
+        await store(session, "x" * 1000)
+    
+    history = cache()
+    await recent(history, sessions[0])
+    # Room for two sessions
+    history.max_bytes = history.size_bytes * 5 // 2
+    for session in sessions[1:]:
+        await recent(history, session)
+    
+    assert list(history._sessions) == [sessions[1].id, sessions[2].id]
+    assert history.size_bytes <= history.max_bytes
+
+
+@pytest.mark.asyncio
+async def test_expired_sessions_are_evicted_from_the_lru_end(profile, clock):
+    sessions = []
+    async with AsyncSessionLocal() as db:
+        for _ in range(3):
+            session = ChatSession(session_id=str(uuid.uuid4()), user_id=profile.user_id, profile_id=profile.id)
+            db.add(session)
+            sessions.append(session)
+        await db.commit()
+    
+    history = cache()
+    await recent(history, sessions[0])
+    clock.now += 30
+    await recent(history, sessions[1])
+    clock.now += 31
+    
+    # Loading another session drops the expired one, keeps the live one
+    await recent(history, sessions[2])
+    assert list(history._sessions) == [sessions[1].id, sessions[2].id]
+
+
+@pytest.mark.asyncio
+async def test_history_loaded_during_a_write_is_not_cached(chat_session, clock, monkeypatch):
+    history = cache()
+    load = history._load
+    
+    async def writing_meanwhile(db, session_id):
+        messages = await load(db, session_id)
+        history.append(await store(chat_session, "committed during the load"))
+        return messages
+    
+    monkeypatch.setattr(history, "_load", writing_meanwhile)
+    assert await recent(history, chat_session) == []
+    assert chat_session.id not in history._sessions
+
+
+@pytest.mark.asyncio
+async def test_disabled_cache_always_reads_the_database(chat_session, clock):
+    history = cache(enabled=False)
+    await recent(history, chat_session)
+    await store(chat_session, "new")
+    
+    assert await recent(history, chat_session) == ["new"]
+    assert history.size_bytes == 0
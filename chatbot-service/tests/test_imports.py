@@ -0,0 +1,24 @@
+"""
+Tests that application packages import on their own, without circular imports.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+PACKAGES = ["app.services", "app.core", "app.core.metrics", "app.database", "app.routers"]
+
+
+@pytest.mark.parametrize("package", PACKAGES)
+def test_package_imports_in_a_fresh_interpreter(package, database):
+    # A fresh interpreter, since this one has already imported everything
+    result = subprocess.run(
+        [sys.executable, "-c", f"import {package}"],
+        env={**os.environ, "DB_URL": f"sqlite:///{database}"},
+        capture_output=True,
+        text=True
+    )
+    
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,271 @@
+"""
+Tests of provider failover, hedging, caching and request coalescing in the LLM service.
+"""
+
+import asyncio
+from typing import List, Optional
+
+import pytest
+
+from app.models import Profile
+from app.routers import chat
+from app.services import llm_service as llm_service_module
+from app.services.llm_service import (
+    LLMProvider,
+    LLMProviderError,
+    LLMRequest,
+    LLMResponse,
+    LLMService
+)
+from app.services.resilience import CircuitOpenError
+
+
+class FakeProvider(LLMProvider):
+    """Provider answering from memory, after a delay or with queued errors."""
+    
+    def __init__(self, name: str, delay: float = 0.0, errors: Optional[List[Exception]] = None):
+        self.name = name
+        self.delay = delay
+        self.errors = list(errors or [])
+        self.calls = 0
+        self.cancelled = 0
+    
+    async def generate_response(self, request: LLMRequest) -> LLMResponse:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.errors:
+            raise self.errors.pop(0)
+        return LLMResponse(content=f"answer from {self.name}", provider=self.name, response_time=self.delay)
+    
+    async def check_health(self) -> bool:
+        return True
+
+
+def unavailable(name: str) -> LLMProviderError:
+    """A transient error of a provider, as for an HTTP 503."""
+    return LLMProviderError(f"{name} unavailable", name, transient=True, status_code=503)
+
+
+@pytest.fixture
+def service(monkeypatch) -> LLMService:
+    """An LLM service with a fake primary and fallback provider."""
+    monkeypatch.setattr(llm_service_module.settings.llm, "retry_max_attempts", 0)
+    
+    def fake_providers(service: LLMService) -> None:
+        service.providers = {"lm_studio": FakeProvider("lm_studio"), "azure_openai": FakeProvider("azure_openai")}
+    
+    monkeypatch.setattr(LLMService, "_initialize_providers", fake_providers)
+    return LLMService()
+
+
+def chat_profile(**overrides) -> Profile:
+    """A profile with a fallback provider that opts in to caching."""
+    values = dict(
+        name="Default",
+        system_instructions="You are a helpful AI assistant.",
+        llm_provider="lm_studio",
+        fallback_providers="azure_openai",
+        hedging_enabled=False,
+        response_cache_enabled=True,
+        temperature=0.0,
+        max_tokens=100
+    )
+    values.update(overrides)
+    return Profile(**values)
+
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+@pytest.mark.asyncio
+async def test_fails_over_to_the_fallback_provider(service):
+    service.providers["lm_studio"].errors = [unavailable("lm_studio")]
+    
+    response = await service.generate_response(MESSAGES, chat_profile(response_cache_enabled=False))
+    
+    assert response.provider == "azure_openai"
+    assert service.providers["lm_studio"].calls == 1
+
+
+@pytest.mark.asyncio
+async def test_non_transient_errors_do_not_open_the_circuit(service):
+    service.providers["azure_openai"].errors = [
+        LLMProviderError("bad request", "azure_openai", status_code=400)
+        for _ in range(10)
+    ]
+    profile = chat_profile(llm_provider="azure_openai", fallback_providers=None, response_cache_enabled=False)
+    
+    for _ in range(10):
+        with pytest.raises(LLMProviderError):
+            await service.generate_response(MESSAGES, profile)
+    
+    assert service.breakers["azure_openai"].state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_fallback_answers_are_not_cached_as_the_primarys(service):
+    profile = chat_profile()
+    service.providers["lm_studio"].errors = [unavailable("lm_studio")]
+    
+    assert (await service.generate_response(MESSAGES, profile)).provider == "azure_openai"
+    
+    # The primary is back: the fallback's answer is not replayed as its own
+    response = await service.generate_response(MESSAGES, profile)
+    assert response.provider == "lm_studio"
+    assert not response.cached
+    
+    response = await service.generate_response(MESSAGES, profile)
+    assert response.provider == "lm_studio"
+    assert response.cached
+
+
+@pytest.mark.asyncio
+async def test_hedges_a_slow_primary_with_the_fallback(service, monkeypatch):
+    monkeypatch.setattr(llm_service_module.settings.llm, "hedge_default_delay", 0.05)
+    service.providers["lm_studio"].delay = 1.0
+    
+    response = await service.generate_response(
+        MESSAGES,
+        chat_profile(hedging_enabled=True, response_cache_enabled=False)
+    )
+    await asyncio.sleep(0)
+    
+    assert response.provider == "azure_openai"
+    # The losing request is cancelled
+    assert service.providers["lm_studio"].cancelled == 1
+
+
+@pytest.mark.asyncio
+async def test_does_not_hedge_a_fast_primary(service, monkeypatch):
+    monkeypatch.setattr(llm_service_module.settings.llm, "hedge_default_delay", 0.5)
+    
+    response = await service.generate_response(
+        MESSAGES,
+        chat_profile(hedging_enabled=True, response_cache_enabled=False)
+    )
+    
+    assert response.provider == "lm_studio"
+    assert service.providers["azure_openai"].calls == 0
+
+
+@pytest.mark.asyncio
+async def test_repeated_deterministic_requests_are_served_from_the_cache(service):
+    profile = chat_profile()
+    
+    first = await service.generate_response(MESSAGES, profile)
+    second = await service.generate_response(MESSAGES, profile)
+    
+    assert not first.cached
+    assert second.cached
+    assert second.content == first.content
+    assert service.providers["lm_studio"].calls == 1
+
+
+@pytest.mark.asyncio
+async def test_sampled_and_opted_out_requests_are_not_cached(service):
+    for profile in (chat_profile(temperature=0.9), chat_profile(response_cache_enabled=False)):
+        await service.generate_response(MESSAGES, profile)
+        assert not (await service.generate_response(MESSAGES, profile)).cached
+    
+    assert service.providers["lm_studio"].calls == 4
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_requests_share_one_call(service):
+    service.providers["lm_studio"].delay = 0.05
+    profile = chat_profile()
+    
+    responses = await asyncio.gather(*(service.generate_response(MESSAGES, profile) for _ in range(5)))
+    
+    assert service.providers["lm_studio"].calls == 1
+    assert {response.content for response in responses} == {"answer from lm_studio"}
+    # Each waiter gets its own copy
+    assert len({id(response) for response in responses}) == 5
+    assert service._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_sampled_concurrent_requests_are_not_shared(service):
+    service.providers["lm_studio"].delay = 0.05
+    profile = chat_profile(temperature=0.9)
+    
+    await asyncio.gather(*(service.generate_response(MESSAGES, profile) for _ in range(3)))
+    
+    assert service.providers["lm_studio"].calls == 3
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_the_shared_call(service):
+    service.providers["lm_studio"].delay = 0.05
+    profile = chat_profile()
+    
+    first = asyncio.create_task(service.generate_response(MESSAGES, profile))
+    second = asyncio.create_task(service.generate_response(MESSAGES, profile))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    
+    assert (await second).content == "answer from lm_studio"
+    assert service.providers["lm_studio"].calls == 1
+    assert service.providers["lm_studio"].cancelled == 0
+
+
+@pytest.mark.asyncio
+async def test_shared_call_errors_reach_every_waiter(service):
+    service.providers["lm_studio"].delay = 0.05
+    service.providers["lm_studio"].errors = [LLMProviderError("bad request", "lm_studio", status_code=400)]
+    profile = chat_profile(fallback_providers=None)
+    
+    results = await asyncio.gather(
+        *(service.generate_response(MESSAGES, profile) for _ in range(3)),
+        return_exceptions=True
+    )
+    
+    assert all(isinstance(result, LLMProviderError) for result in results)
+    assert service.providers["lm_studio"].calls == 1
+    assert service._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_coalescing_can_be_disabled(service, monkeypatch):
+    monkeypatch.setattr(llm_service_module.settings.llm, "coalesce_requests", False)
+    service.providers["lm_studio"].delay = 0.05
+    
+    await asyncio.gather(*(service.generate_response(MESSAGES, chat_profile()) for _ in range(3)))
+    
+    assert service.providers["lm_studio"].calls == 3
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_skips_the_provider(service):
+    profile = chat_profile(response_cache_enabled=False)
+    threshold = service.breakers["lm_studio"].failure_threshold
+    service.providers["lm_studio"].errors = [unavailable("lm_studio") for _ in range(threshold)]
+    for _ in range(threshold):
+        await service.generate_response(MESSAGES, profile)
+    assert service.breakers["lm_studio"].state == "open"
+    
+    response = await service.generate_response(MESSAGES, profile)
+    
+    assert response.provider == "azure_openai"
+    assert service.providers["lm_studio"].calls == threshold
+
+
+@pytest.mark.asyncio
+async def test_every_circuit_open_is_refused_with_retry_after(service, api, monkeypatch):
+    for breaker in service.breakers.values():
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+    
+    with pytest.raises(CircuitOpenError):
+        await service.generate_response(MESSAGES, chat_profile())
+    assert all(provider.calls == 0 for provider in service.providers.values())
+    
+    monkeypatch.setattr(chat, "llm_service", service)
+    response = await api.post("/chat/send-auth", json={"content": "hello"})
+    
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(int(llm_service_module.settings.llm.circuit_recovery_timeout))
@@ -0,0 +1,140 @@
+"""
+Tests of load balancing across a provider's backends.
+"""
+
+import httpx
+import pytest
+
+from app.services import load_balancer as load_balancer_module
+from app.services.load_balancer import LoadBalancer
+
+URLS = ["http://a:1234", "http://b:1234", "http://c:1234"]
+
+
+class Clock:
+    """Monotonic clock moved by hand."""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    """A clock standing in for the module's time."""
+    clock = Clock()
+    monkeypatch.setattr(load_balancer_module, "time", clock)
+    return clock
+
+
+def server_error() -> httpx.HTTPStatusError:
+    """A 503 response error."""
+    request = httpx.Request("POST", "http://a:1234/v1/chat/completions")
+    return httpx.HTTPStatusError("unavailable", request=request, response=httpx.Response(503, request=request))
+
+
+async def fail(balancer: LoadBalancer, error: Exception, affinity_key: str = None) -> str:
+    """Route a request that fails, returning the backend it went to."""
+    with pytest.raises(type(error)):
+        async with balancer.route(affinity_key) as backend:
+            raise error
+    return backend.url
+
+
+def test_least_outstanding_picks_the_least_loaded_backend(clock):
+    balancer = LoadBalancer("test", URLS)
+    balancer.backends[0].outstanding = 2
+    balancer.backends[1].outstanding = 1
+    balancer.backends[2].outstanding = 3
+    
+    assert balancer.select().url == "http://b:1234"
+
+
+def test_latency_weighted_prefers_fast_backends(clock):
+    balancer = LoadBalancer("test", URLS, strategy="latency_weighted")
+    for backend, latency in zip(balancer.backends, (1.0, 0.2, 0.5)):
+        backend.latency = latency
+    
+    assert balancer.select().url == "http://b:1234"
+    
+    # Load counts against a fast backend
+    balancer.backends[1].outstanding = 4
+    assert balancer.select().url == "http://c:1234"
+
+
+@pytest.mark.asyncio
+async def test_backend_is_ejected_after_consecutive_failures(clock):
+    balancer = LoadBalancer("test", URLS[:2], eject_after_failures=2, eject_duration=30)
+    balancer.backends[1].outstanding = 100
+    
+    # Client errors do not count
+    for _ in range(3):
+        with pytest.raises(httpx.HTTPStatusError):
+            async with balancer.route():
+                request = httpx.Request("POST", "http://a:1234")
+                raise httpx.HTTPStatusError("bad", request=request, response=httpx.Response(400, request=request))
+    assert balancer.backends[0].consecutive_failures == 0
+    
+    assert await fail(balancer, server_error()) == "http://a:1234"
+    assert await fail(balancer, httpx.ConnectError("refused")) == "http://a:1234"
+    
+    assert balancer.select().url == "http://b:1234"
+    assert balancer.status()[0]["ejected"]
+    
+    # Re-admitted when the ejection expires
+    clock.now += 31
+    assert balancer.select().url == "http://a:1234"
+
+
+@pytest.mark.asyncio
+async def test_success_resets_the_failure_count(clock):
+    balancer = LoadBalancer("test", URLS[:1], eject_after_failures=2)
+    await fail(balancer, server_error())
+    async with balancer.route():
+        pass
+    await fail(balancer, server_error())
+    
+    assert balancer.backends[0].ejected_until == 0.0
+
+
+def test_successful_health_check_readmits_an_ejected_backend(clock):
+    balancer = LoadBalancer("test", URLS[:2])
+    balancer.backends[0].ejected_until = clock.now + 30
+    balancer.backends[1].outstanding = 100
+    assert balancer.select().url == "http://b:1234"
+    
+    balancer.mark_health(balancer.backends[0], True)
+    assert balancer.select().url == "http://a:1234"
+
+
+def test_least_loaded_backend_is_used_when_none_is_eligible(clock):
+    balancer = LoadBalancer("test", URLS[:2])
+    for backend, outstanding in zip(balancer.backends, (3, 1)):
+        backend.healthy = False
+        backend.outstanding = outstanding
+    
+    assert balancer.select().url == "http://b:1234"
+
+
+@pytest.mark.asyncio
+async def test_affinity_pins_a_session_to_one_backend(clock):
+    balancer = LoadBalancer("test", URLS, session_affinity=True, eject_after_failures=1)
+    pinned = balancer.select("session-1").url
+    
+    # Regardless of load
+    for backend in balancer.backends:
+        backend.outstanding = 10 if backend.url == pinned else 0
+    assert all(balancer.select("session-1").url == pinned for _ in range(10))
+    
+    # Sessions spread over the backends
+    assert len({balancer.select(f"session-{number}").url for number in range(50)}) == 3
+    
+    # An ejected backend's sessions move, and only those
+    others = {f"session-{number}": balancer.select(f"session-{number}").url for number in range(50)}
+    await fail(balancer, server_error(), "session-1")
+    assert balancer.select("session-1").url != pinned
+    for key, url in others.items():
+        if url != pinned:
+            assert balancer.select(key).url == url
@@ -0,0 +1,101 @@
+"""
+Tests of the per-session vector memory index.
+"""
+
+import asyncio
+import uuid
+from typing import List
+
+import pytest
+
+from app.database.session import AsyncSessionLocal
+from app.models import Message, Session as ChatSession
+from app.services.memory_index import MemoryIndex
+
+
+async def store(session: ChatSession, contents: List[str]) -> List[int]:
+    """Commit user messages to a session, returning their primary keys."""
+    async with AsyncSessionLocal() as db:
+        messages = [
+            Message(
+                message_id=str(uuid.uuid4()),
+                content=content,
+                role="user",
+                user_id=session.user_id,
+                session_id=session.id,
+                profile_id=session.profile_id
+            )
+            for content in contents
+        ]
+        db.add_all(messages)
+        await db.commit()
+        return [message.id for message in messages]
+
+
+@pytest.mark.asyncio
+async def test_search_recalls_the_most_similar_message(chat_session):
+    ids = await store(chat_session, ["my cat is called felix", "the weather is sunny", "i like green tea"])
+    index = MemoryIndex(dim=256, max_vectors_per_session=100, max_bytes=1 << 20)
+    
+    async with AsyncSessionLocal() as db:
+        hits = await index.search(db, chat_session.id, "what is my cat called", 1, set(), 0.1)
+    
+    assert [message_id for message_id, _ in hits] == [ids[0]]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_searches_build_the_index_once(chat_session, monkeypatch):
+    await store(chat_session, [f"message {number}" for number in range(20)])
+    index = MemoryIndex(dim=64, max_vectors_per_session=100, max_bytes=1 << 20)
+    builds = []
+    build = index._build
+    
+    def counted(rows):
+        builds.append(len(rows))
+        return build(rows)
+    
+    monkeypatch.setattr(index, "_build", counted)
+    
+    async def search() -> None:
+        async with AsyncSessionLocal() as db:
+            await index.search(db, chat_session.id, "message", 3, set(), 0.0)
+    
+    await asyncio.gather(*(search() for _ in range(5)))
+    
+    assert builds == [20]
+    assert index._build_locks == {}
+
+
+@pytest.mark.asyncio
+async def test_messages_added_during_a_build_are_indexed(chat_session, monkeypatch):
+    await store(chat_session, ["first message"])
+    index = MemoryIndex(dim=64, max_vectors_per_session=100, max_bytes=1 << 20)
+    build = index._build
+    
+    def adding_meanwhile(rows):
+        # A turn stores its message while the rows are being embedded
+        index.add(chat_session.id, 10 ** 9, "a late message about penguins")
+        return build(rows)
+    
+    monkeypatch.setattr(index, "_build", adding_meanwhile)
+    async with AsyncSessionLocal() as db:
+        hits = await index.search(db, chat_session.id, "penguins", 1, set(), 0.1)
+    
+    assert [message_id for message_id, _ in hits] == [10 ** 9]
+
+
+@pytest.mark.asyncio
+async def test_session_removed_during_a_build_is_not_cached(chat_session, monkeypatch):
+    await store(chat_session, ["first message"])
+    index = MemoryIndex(dim=64, max_vectors_per_session=100, max_bytes=1 << 20)
+    build = index._build
+    
+    def removed_meanwhile(rows):
+        index.remove_session(chat_session.id)
+        return build(rows)
+    
+    monkeypatch.setattr(index, "_build", removed_meanwhile)
+    async with AsyncSessionLocal() as db:
+        await index.search(db, chat_session.id, "message", 1, set(), 0.0)
+    
+    assert chat_session.id not in index._sessions
@@ -0,0 +1,147 @@
+"""
+Tests of write-behind persistence of assistant messages.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, select
+
+from app.core.metrics import WRITE_BEHIND_DROPPED
+from app.database.session import AsyncSessionLocal
+from app.models import Message, Session as ChatSession
+from app.services import persistence
+from app.services.persistence import MessageWriter
+
+
+@pytest_asyncio.fixture
+async def writer():
+    """A message writer that batches for a short while."""
+    writer = MessageWriter(max_queue=100, batch_size=10, flush_interval=0.1, max_retries=1, retry_delay=0.01)
+    yield writer
+    await writer.shutdown()
+
+
+def reply(session: ChatSession, content: str, created_at: datetime, message_id: str = None) -> Message:
+    """A transient assistant message of a session."""
+    return Message(
+        message_id=message_id or str(uuid.uuid4()),
+        content=content,
+        role="assistant",
+        is_user_message=False,
+        user_id=session.user_id,
+        session_id=session.id,
+        profile_id=session.profile_id,
+        created_at=created_at
+    )
+
+
+async def stored_contents(session: ChatSession) -> List[str]:
+    """Contents of a session's committed messages, in insertion order."""
+    async with AsyncSessionLocal() as db:
+        result = await db.scalars(select(Message.content).where(
+            Message.session_id == session.id
+        ).order_by(Message.id))
+        return list(result)
+
+
+@pytest.mark.asyncio
+async def test_batch_keeps_submission_order_per_session(writer, chat_session):
+    start = datetime.utcnow()
+    persisted = []
+    for index in range(5):
+        message = reply(chat_session, f"reply {index}", start + timedelta(seconds=index))
+        await writer.submit(chat_session.session_id, message, lambda message: persisted.append(message.content))
+    await writer.wait_for_session(chat_session.session_id)
+    
+    expected = [f"reply {index}" for index in range(5)]
+    assert await stored_contents(chat_session) == expected
+    assert persisted == expected
+    
+    async with AsyncSessionLocal() as db:
+        last_activity = await db.scalar(select(ChatSession.last_activity).where(ChatSession.id == chat_session.id))
+    assert last_activity == start + timedelta(seconds=4)
+
+
+@pytest.mark.asyncio
+async def test_wait_for_session_reads_own_writes(writer, chat_session):
+    await writer.submit(chat_session.session_id, reply(chat_session, "pending", datetime.utcnow()))
+    
+    # Not committed before the batch deadline
+    assert await stored_contents(chat_session) == []
+    
+    await writer.wait_for_session(chat_session.session_id)
+    assert await stored_contents(chat_session) == ["pending"]
+
+
+@pytest.mark.asyncio
+async def test_replies_to_deleted_session_are_dropped(writer, chat_session):
+    persisted = []
+    await writer.submit(
+        chat_session.session_id,
+        reply(chat_session, "orphan", datetime.utcnow()),
+        lambda message: persisted.append(message)
+    )
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(ChatSession).where(ChatSession.id == chat_session.id))
+        await db.commit()
+    
+    await writer.wait_for_session(chat_session.session_id)
+    assert await stored_contents(chat_session) == []
+    assert persisted == []
+
+
+@pytest.mark.asyncio
+async def test_shutdown_flushes_pending_writes(writer, chat_session):
+    writer.flush_interval = 1.0
+    for index in range(3):
+        await writer.submit(chat_session.session_id, reply(chat_session, f"reply {index}", datetime.utcnow()))
+    
+    await writer.shutdown()
+    assert await stored_contents(chat_session) == ["reply 0", "reply 1", "reply 2"]
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_dropped_after_retries(writer, chat_session):
+    dropped = WRITE_BEHIND_DROPPED._value.get()
+    persisted = []
+    duplicate = str(uuid.uuid4())
+    
+    # The second message breaks the unique message ID, failing the whole batch
+    for content in ("first", "second"):
+        await writer.submit(
+            chat_session.session_id,
+            reply(chat_session, content, datetime.utcnow(), message_id=duplicate),
+            lambda message: persisted.append(message)
+        )
+    await writer.wait_for_session(chat_session.session_id)
+    
+    assert await stored_contents(chat_session) == []
+    assert persisted == []
+    assert WRITE_BEHIND_DROPPED._value.get() == dropped + 2
+    
+    # The writer keeps going with later batches
+    await writer.submit(chat_session.session_id, reply(chat_session, "later", datetime.utcnow()))
+    await writer.wait_for_session(chat_session.session_id)
+    assert await stored_contents(chat_session) == ["later"]
+
+
+@pytest.mark.asyncio
+async def test_failed_commit_is_retried(writer, chat_session, monkeypatch):
+    attempts = []
+    
+    def failing_once(*args, **kwargs):
+        attempts.append(len(attempts))
+        if len(attempts) == 1:
+            raise ConnectionError("database unavailable")
+        return AsyncSessionLocal(*args, **kwargs)
+    
+    monkeypatch.setattr(persistence, "AsyncSessionLocal", failing_once)
+    await writer.submit(chat_session.session_id, reply(chat_session, "retried", datetime.utcnow()))
+    await writer.wait_for_session(chat_session.session_id)
+    
+    assert len(attempts) == 2
+    assert await stored_contents(chat_session) == ["retried"]
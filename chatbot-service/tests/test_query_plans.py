@@ -0,0 +1,75 @@
+"""
+Tests that the hot chat queries are served by indexes of the migrated schema.
+
+Each query's SQLite plan must search an index rather than scan the
+messages or sessions table, and must not sort its rows separately.
+"""
+
+from datetime import datetime
+from typing import List
+
+import pytest
+from sqlalchemy import Select, select, tuple_
+
+from app.database.session import engine
+from app.models import Message, Session as ChatSession
+
+CURSOR = (datetime(2024, 1, 1), 100)
+
+
+def session_list(query: Select) -> Select:
+    """Select a page of a user's sessions, as the session list endpoint does."""
+    return query.where(ChatSession.user_id == 1)
+
+
+def history(query: Select) -> Select:
+    """Select a page of a session's messages, as the history endpoint does."""
+    return query.where(Message.session_id == 1)
+
+
+HOT_QUERIES = {
+    "session lookup": select(ChatSession.id, ChatSession.archived_at).where(
+        ChatSession.session_id == "abc",
+        ChatSession.user_id == 1
+    ),
+    "session list": session_list(select(ChatSession.id, ChatSession.title)).order_by(
+        ChatSession.last_activity.desc(), ChatSession.id.desc()
+    ).limit(21),
+    "session list before cursor": session_list(select(ChatSession.id, ChatSession.title)).where(
+        tuple_(ChatSession.last_activity, ChatSession.id) < CURSOR
+    ).order_by(ChatSession.last_activity.desc(), ChatSession.id.desc()).limit(21),
+    "session list after cursor": session_list(select(ChatSession.id, ChatSession.title)).where(
+        tuple_(ChatSession.last_activity, ChatSession.id) > CURSOR
+    ).order_by(ChatSession.last_activity, ChatSession.id).limit(21),
+    "history": history(select(Message.id, Message.content)).order_by(
+        Message.created_at.desc(), Message.id.desc()
+    ).limit(51),
+    "history before cursor": history(select(Message.id, Message.content)).where(
+        tuple_(Message.created_at, Message.id) < CURSOR
+    ).order_by(Message.created_at.desc(), Message.id.desc()).limit(51),
+    "history after cursor": history(select(Message.id, Message.content)).where(
+        tuple_(Message.created_at, Message.id) > CURSOR
+    ).order_by(Message.created_at, Message.id).limit(51),
+    "retention purge": select(ChatSession.id).where(
+        ChatSession.last_activity < CURSOR[0]
+    ).order_by(ChatSession.last_activity, ChatSession.id).limit(100),
+}
+
+
+def query_plan(query: Select) -> List[str]:
+    """Get the details of SQLite's plan for a query."""
+    compiled = query.compile(dialect=engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+    return [row[-1] for row in rows]
+
+
+@pytest.mark.parametrize("name", list(HOT_QUERIES))
+def test_hot_query_uses_index(name):
+    plan = query_plan(HOT_QUERIES[name])
+    
+    for detail in plan:
+        assert not detail.startswith(("SCAN messages", "SCAN sessions", "SCAN TABLE")), plan
+        assert "TEMP B-TREE" not in detail, plan
+    assert any(detail.startswith("SEARCH") for detail in plan), plan
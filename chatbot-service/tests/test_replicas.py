@@ -0,0 +1,216 @@
+"""
+Tests of read replica routing, with a stale SQLite copy of the primary.
+"""
+
+import sqlite3
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, inspect, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import get_settings
+from app.database import replicas as replicas_module
+from app.database import session as session_module
+from app.database.replicas import ReplicaRouter
+from app.database.session import (
+    AsyncReadSessionLocal,
+    AsyncSessionLocal,
+    async_engine,
+    async_read_engine,
+    record_writers
+)
+from app.models import Message, Profile, Session as ChatSession
+
+
+def copy_database(source: str, target: str) -> None:
+    """Overwrite a SQLite database with a consistent copy of another."""
+    source_connection = sqlite3.connect(source)
+    target_connection = sqlite3.connect(target)
+    source_connection.backup(target_connection)
+    target_connection.close()
+    source_connection.close()
+
+
+class StaleReplica:
+    """A read replica that only changes when the primary is copied to it."""
+    
+    def __init__(self, primary: str, path: Path, router: ReplicaRouter):
+        self.primary = primary
+        self.path = path
+        self.router = router
+    
+    def snapshot(self) -> None:
+        """Replay the primary onto the replica."""
+        copy_database(self.primary, str(self.path))
+    
+    def break_down(self) -> None:
+        """Replace the replica with an empty database, so its queries fail."""
+        copy_database(":memory:", str(self.path))
+
+
+@pytest_asyncio.fixture
+async def replica(database, tmp_path, monkeypatch):
+    """
+    A stale SQLite replica of the primary, routed to by read-only sessions.
+    
+    The user write window outlasts the test, so reads of users who wrote
+    stay on the primary.
+    """
+    path = tmp_path / "replica.db"
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    router = ReplicaRouter(async_engine, [engine], max_lag=5.0, check_interval=5.0, read_your_writes=60.0)
+    monkeypatch.setattr(session_module, "replica_engines", [engine])
+    monkeypatch.setattr(session_module, "_replica_router", router)
+    yield StaleReplica(database, path, router)
+    await engine.dispose()
+
+
+async def create_session(profile: Profile) -> str:
+    """Create a chat session on the primary and return its external ID."""
+    session_id = str(uuid.uuid4())
+    async with AsyncSessionLocal() as db:
+        db.add(ChatSession(session_id=session_id, user_id=profile.user_id, profile_id=profile.id))
+        await db.commit()
+    return session_id
+
+
+async def read_session(session_id: str, user_id=None):
+    """Read a chat session through a read-only session, with the replica it used."""
+    async with AsyncReadSessionLocal(info={"user_id": user_id}) as db:
+        found = await db.scalar(select(ChatSession.id).where(ChatSession.session_id == session_id))
+        return found, db.info.get("replica")
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replica_except_own_recent_writes(replica, profile):
+    replica.snapshot()
+    session_id = await create_session(profile)
+    
+    # The writer reads its own write from the primary
+    found, used = await read_session(session_id, user_id=profile.user_id)
+    assert found is not None
+    assert used is None
+    
+    # Other reads hit the stale replica
+    found, used = await read_session(session_id)
+    assert found is None
+    assert used == "0"
+
+
+@pytest.mark.asyncio
+async def test_core_delete_keeps_writer_reads_on_primary(replica, profile):
+    session_id = await create_session(profile)
+    replica.snapshot()
+    replica.router._last_write.clear()
+    
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(ChatSession).where(ChatSession.session_id == session_id))
+        record_writers(db, [profile.user_id])
+        await db.commit()
+    
+    found, used = await read_session(session_id, user_id=profile.user_id)
+    assert found is None
+    assert used is None
+    
+    # The replica still has the deleted session
+    found, used = await read_session(session_id)
+    assert found is not None
+    assert used == "0"
+
+
+@pytest.mark.asyncio
+async def test_failed_replica_read_is_retried_on_primary(replica, profile):
+    replica.snapshot()
+    session_id = await create_session(profile)
+    replica.router._last_write.clear()
+    
+    replica.break_down()
+    
+    found, _ = await read_session(session_id)
+    assert found is not None
+    assert not replica.router.replicas[0].healthy
+    
+    # Later reads skip the failed replica
+    found, used = await read_session(session_id)
+    assert found is not None
+    assert used is None
+
+
+@pytest.mark.asyncio
+async def test_lagging_replica_is_taken_out_of_rotation(replica, profile):
+    await replica.router.check()
+    replica.snapshot()
+    await replica.router.check()
+    assert replica.router.replicas[0].healthy
+    assert replica.router.replicas[0].lag < replica.router.max_lag
+    
+    # The replica stops replaying: its heartbeat falls behind the primary's
+    session_id = await create_session(profile)
+    replica.router._last_write.clear()
+    connection = sqlite3.connect(replica.path)
+    connection.execute(
+        "UPDATE replica_heartbeats SET beat_at = ? WHERE id = 1",
+        ((datetime.utcnow() - timedelta(minutes=1)).isoformat(" "),)
+    )
+    connection.commit()
+    connection.close()
+    await replica.router.check()
+    assert not replica.router.replicas[0].healthy
+    assert replica.router.replicas[0].lag > replica.router.max_lag
+    
+    found, used = await read_session(session_id)
+    assert found is not None
+    assert used is None
+
+
+@pytest.mark.asyncio
+async def test_replica_one_heartbeat_behind_is_healthy_with_default_settings(replica, monkeypatch):
+    settings = get_settings().database
+    router = ReplicaRouter(
+        async_engine,
+        [replica.router.replicas[0].engine],
+        max_lag=settings.replica_max_lag,
+        check_interval=settings.replica_check_interval,
+        read_your_writes=settings.replica_read_your_writes
+    )
+    
+    class Clock(datetime):
+        """Clock of the router, moved forward by the test."""
+        offset = timedelta()
+        
+        @classmethod
+        def utcnow(cls):
+            return datetime.utcnow() + cls.offset
+    
+    monkeypatch.setattr(replicas_module, "datetime", Clock)
+    await router.check()
+    replica.snapshot()
+    
+    # One check interval later, the replica has not replayed the new heartbeat yet
+    Clock.offset = timedelta(seconds=settings.replica_check_interval)
+    await router.check()
+    assert router.replicas[0].healthy
+    assert router.replicas[0].lag < 1.0
+    
+    # A replica that stops replaying falls behind the heartbeats it missed
+    Clock.offset += timedelta(seconds=settings.replica_max_lag + 1)
+    await router.check()
+    assert not router.replicas[0].healthy
+    assert router.replicas[0].lag > settings.replica_max_lag
+
+
+@pytest.mark.asyncio
+async def test_only_read_only_sessions_read_from_the_reader_pool():
+    assert async_read_engine is not None
+    query = select(Message)
+    
+    async with AsyncSessionLocal() as db:
+        # A handler that reads then writes reads from the writer's snapshot
+        assert db.sync_session.get_bind(inspect(Message), clause=query) is async_engine.sync_engine
+    
+    async with AsyncReadSessionLocal() as db:
+        assert db.sync_session.get_bind(inspect(Message), clause=query) is async_read_engine.sync_engine
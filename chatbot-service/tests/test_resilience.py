@@ -0,0 +1,139 @@
+"""
+Tests of the circuit breaker and retry budget of LLM provider calls.
+"""
+
+import pytest
+
+from app.services import resilience as resilience_module
+from app.services.resilience import CircuitBreaker, CircuitOpenError, RetryBudget, backoff_delay
+
+
+class Clock:
+    """Monotonic clock moved by hand."""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    """A clock standing in for the module's time."""
+    clock = Clock()
+    monkeypatch.setattr(resilience_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def breaker(clock) -> CircuitBreaker:
+    """A breaker opening after 3 failures for 30 seconds."""
+    return CircuitBreaker("test", failure_threshold=3, recovery_timeout=30)
+
+
+def open_circuit(breaker: CircuitBreaker) -> None:
+    """Fail calls until the circuit opens."""
+    for _ in range(breaker.failure_threshold):
+        breaker.allow()
+        breaker.record_failure()
+
+
+def test_circuit_opens_after_consecutive_failures(breaker):
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError) as raised:
+        breaker.allow()
+    assert raised.value.retry_after == 30
+    assert raised.value.status_code == 503
+
+
+def test_open_circuit_counts_down_to_a_half_open_probe(breaker, clock):
+    open_circuit(breaker)
+    
+    clock.now += 20.5
+    with pytest.raises(CircuitOpenError) as raised:
+        breaker.allow()
+    assert raised.value.retry_after == 10
+    
+    clock.now += 10
+    assert breaker.state == "half_open"
+    breaker.allow()
+    # One probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+
+def test_successful_probe_closes_the_circuit(breaker, clock):
+    open_circuit(breaker)
+    clock.now += 30
+    breaker.allow()
+    
+    breaker.record_success()
+    
+    assert breaker.to_dict() == {"state": "closed", "consecutive_failures": 0}
+    breaker.allow()
+    breaker.allow()
+
+
+def test_failed_probe_opens_the_circuit_again(breaker, clock):
+    open_circuit(breaker)
+    clock.now += 30
+    breaker.allow()
+    
+    breaker.record_failure()
+    
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError) as raised:
+        breaker.allow()
+    assert raised.value.retry_after == 30
+
+
+@pytest.mark.parametrize("outcome", ["release", "record_cancelled"])
+def test_abandoned_probe_lets_another_through(breaker, clock, outcome):
+    open_circuit(breaker)
+    clock.now += 30
+    breaker.allow()
+    
+    getattr(breaker, outcome)()
+    
+    assert breaker.state == "half_open"
+    breaker.allow()
+
+
+def test_retry_budget_bounds_retries_to_a_fraction_of_traffic(clock):
+    budget = RetryBudget(ratio=0.25, min_per_second=0.0, max_tokens=2)
+    
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw()
+    
+    for _ in range(4):
+        budget.deposit()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+
+def test_retry_budget_refills_over_time_up_to_its_maximum(clock):
+    budget = RetryBudget(ratio=0.1, min_per_second=1.0, max_tokens=3)
+    for _ in range(3):
+        budget.withdraw()
+    assert not budget.withdraw()
+    
+    clock.now += 1
+    assert budget.withdraw()
+    
+    clock.now += 3600
+    assert [budget.withdraw() for _ in range(4)] == [True, True, True, False]
+
+
+def test_backoff_delay_grows_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(resilience_module.random, "uniform", lambda low, high: high)
+    
+    assert [backoff_delay(attempt, 0.5, 3.0) for attempt in range(1, 6)] == [0.5, 1.0, 2.0, 3.0, 3.0]
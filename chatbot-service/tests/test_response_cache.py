@@ -0,0 +1,106 @@
+"""
+Tests of the exact-match LLM response cache.
+"""
+
+import pytest
+
+from app.services import response_cache as response_cache_module
+from app.services.response_cache import MemoryCacheBackend, ResponseCache
+
+
+class Clock:
+    """Monotonic clock moved by hand."""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(response_cache_module, "time", clock)
+    return clock
+
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_their_ttl(clock):
+    backend = MemoryCacheBackend(max_entries=10, max_bytes=1000)
+    await backend.set("a", "value", ttl=60)
+    
+    clock.now += 59
+    assert await backend.get("a") == "value"
+    
+    clock.now += 2
+    assert await backend.get("a") is None
+    assert len(backend) == 0
+    assert backend.size_bytes == 0
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_entries_are_evicted_first(clock):
+    backend = MemoryCacheBackend(max_entries=2, max_bytes=1000)
+    await backend.set("a", "1", ttl=60)
+    await backend.set("b", "2", ttl=60)
+    
+    # Reading "a" makes "b" the least recently used
+    await backend.get("a")
+    await backend.set("c", "3", ttl=60)
+    
+    assert await backend.get("b") is None
+    assert await backend.get("a") == "1"
+    assert await backend.get("c") == "3"
+
+
+@pytest.mark.asyncio
+async def test_memory_bound_evicts_entries_and_skips_oversized_values(clock):
+    backend = MemoryCacheBackend(max_entries=100, max_bytes=10)
+    await backend.set("a", "12345", ttl=60)
+    await backend.set("b", "12345", ttl=60)
+    await backend.set("c", "123", ttl=60)
+    
+    assert await backend.get("a") is None
+    assert backend.size_bytes == 8
+    
+    await backend.set("big", "x" * 11, ttl=60)
+    assert await backend.get("big") is None
+    assert await backend.get("b") == "12345"
+
+
+@pytest.mark.asyncio
+async def test_overwriting_an_entry_keeps_the_size_accounted(clock):
+    backend = MemoryCacheBackend(max_entries=10, max_bytes=1000)
+    await backend.set("a", "12345", ttl=60)
+    await backend.set("a", "12", ttl=60)
+    
+    assert backend.size_bytes == 2
+    assert len(backend) == 1
+
+
+def test_only_opted_in_deterministic_requests_are_cached(monkeypatch):
+    assert ResponseCache.should_cache(0.0, True)
+    assert ResponseCache.should_cache(0.3, True)
+    assert not ResponseCache.should_cache(0.7, True)
+    assert not ResponseCache.should_cache(0.0, False)
+    assert not ResponseCache.should_cache(0.0, None)
+    
+    monkeypatch.setattr(response_cache_module.settings.cache, "enabled", False)
+    assert not ResponseCache.should_cache(0.0, True)
+
+
+def test_keys_normalize_messages_but_not_parameters():
+    key = ResponseCache.make_key("lm_studio", "model", "system", MESSAGES, 0.0, 100)
+    
+    assert key == ResponseCache.make_key(
+        "lm_studio", "model", " system ", [{"role": "User", "content": " hello\r\n"}], 0.0, 100
+    )
+    assert key != ResponseCache.make_key("azure_openai", "model", "system", MESSAGES, 0.0, 100)
+    assert key != ResponseCache.make_key("lm_studio", "other", "system", MESSAGES, 0.0, 100)
+    assert key != ResponseCache.make_key("lm_studio", "model", "system", MESSAGES, 0.1, 100)
+    assert key != ResponseCache.make_key("lm_studio", "model", "system", MESSAGES, 0.0, 200)
+    assert key != ResponseCache.make_key("lm_studio", "model", "system", [{"role": "user", "content": "bye"}], 0.0, 100)
@@ -0,0 +1,169 @@
+"""
+Tests of deleting sessions, by retention purge and by batch delete.
+"""
+
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+
+from app.database.session import AsyncSessionLocal
+from app.models import Message, MessageArchive, Profile, Session as ChatSession, User
+from app.services import retention as retention_module
+from app.services.retention import RetentionPurger
+
+
+@pytest.fixture
+def purger() -> RetentionPurger:
+    """A purger of sessions inactive for 30 days, deleting 4 rows per transaction."""
+    return RetentionPurger(retention_days=30, interval=3600, batch_sessions=2, batch_rows=4)
+
+
+async def new_session(profile: Profile, days_inactive: float, messages: int = 10) -> ChatSession:
+    """A session of the test user with messages and an archive block."""
+    last_activity = datetime.utcnow() - timedelta(days=days_inactive)
+    async with AsyncSessionLocal() as db:
+        session = ChatSession(
+            session_id=str(uuid.uuid4()),
+            title="Chat",
+            user_id=profile.user_id,
+            profile_id=profile.id,
+            last_activity=last_activity
+        )
+        db.add(session)
+        await db.flush()
+        db.add_all([
+            Message(
+                message_id=str(uuid.uuid4()),
+                content=f"message {index}",
+                role="user" if index % 2 == 0 else "assistant",
+                user_id=profile.user_id,
+                session_id=session.id,
+                profile_id=profile.id,
+                created_at=last_activity - timedelta(seconds=messages - index)
+            )
+            for index in range(messages)
+        ])
+        db.add(MessageArchive(
+            session_id=session.id,
+            first_created_at=last_activity,
+            last_created_at=last_activity,
+            first_message_id=0,
+            last_message_id=0,
+            message_count=1,
+            raw_size=0,
+            data=b""
+        ))
+        await db.commit()
+    return session
+
+
+async def other_profile() -> Profile:
+    """A profile of another user."""
+    async with AsyncSessionLocal() as db:
+        name = f"user-{uuid.uuid4().hex[:8]}"
+        user = User(username=name, email=f"{name}@example.com", hashed_password="x")
+        db.add(user)
+        await db.flush()
+        profile = Profile(user_id=user.id, name="Default", system_instructions="s", llm_provider="lm_studio")
+        db.add(profile)
+        await db.commit()
+    return profile
+
+
+async def remaining(session: ChatSession) -> tuple:
+    """Whether a session exists, with its message and archive block counts."""
+    async with AsyncSessionLocal() as db:
+        return (
+            await db.get(ChatSession, session.id) is not None,
+            await db.scalar(select(func.count()).where(Message.session_id == session.id)),
+            await db.scalar(select(func.count()).where(MessageArchive.session_id == session.id))
+        )
+
+
+@pytest_asyncio.fixture
+async def expired(profile: Profile) -> ChatSession:
+    """A session inactive for 100 days."""
+    return await new_session(profile, 100)
+
+
+@pytest.mark.asyncio
+async def test_purge_deletes_expired_sessions_only(purger, profile, expired):
+    others = [await new_session(profile, 100) for _ in range(2)]
+    recent = await new_session(profile, 1)
+    
+    assert await purger.purge_expired() >= 3
+    
+    for session in (expired, *others):
+        assert await remaining(session) == (False, 0, 0)
+    assert await remaining(recent) == (True, 10, 1)
+
+
+@pytest.mark.asyncio
+async def test_purge_deletes_rows_in_short_transactions(purger, expired, monkeypatch):
+    deletes = []
+    
+    @asynccontextmanager
+    async def counting(*args, **kwargs):
+        async with AsyncSessionLocal(*args, **kwargs) as db:
+            yield db
+            deletes.append(db)
+    
+    monkeypatch.setattr(retention_module, "AsyncSessionLocal", counting)
+    assert await purger._purge_session(None, expired.id, expired.user_id, datetime.utcnow() - timedelta(days=30))
+    
+    # 10 messages in 3 chunks, 1 archive block, then the session
+    assert len(deletes) == 5
+    assert await remaining(expired) == (False, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_purge_stops_when_the_session_is_revived(purger, expired, monkeypatch):
+    opened = []
+    
+    @asynccontextmanager
+    async def reviving_after_first_chunk(*args, **kwargs):
+        opened.append(kwargs)
+        if len(opened) == 2:
+            # A new turn in the session
+            async with AsyncSessionLocal() as db:
+                session = await db.get(ChatSession, expired.id)
+                session.last_activity = datetime.utcnow()
+                await db.commit()
+        async with AsyncSessionLocal(*args, **kwargs) as db:
+            yield db
+    
+    monkeypatch.setattr(retention_module, "AsyncSessionLocal", reviving_after_first_chunk)
+    cutoff = datetime.utcnow() - timedelta(days=30)
+    assert not await purger._purge_session(None, expired.id, expired.user_id, cutoff)
+    
+    # Only the first chunk of old messages is gone
+    assert await remaining(expired) == (True, 6, 1)
+
+
+@pytest.mark.asyncio
+async def test_batch_delete_removes_own_sessions(api, profile, expired):
+    kept = await new_session(profile, 1)
+    missing = str(uuid.uuid4())
+    
+    response = await api.post("/chat/sessions/delete", json={
+        "session_ids": [expired.session_id, missing, expired.session_id]
+    })
+    
+    assert response.status_code == 200
+    assert response.json() == {"deleted": [expired.session_id], "not_found": [missing]}
+    assert await remaining(expired) == (False, 0, 0)
+    assert await remaining(kept) == (True, 10, 1)
+
+
+@pytest.mark.asyncio
+async def test_batch_delete_leaves_other_users_sessions(api, expired):
+    other = await new_session(await other_profile(), 1)
+    
+    response = await api.post("/chat/sessions/delete", json={"session_ids": [other.session_id]})
+    
+    assert response.json() == {"deleted": [], "not_found": [other.session_id]}
+    assert await remaining(other) == (True, 10, 1)
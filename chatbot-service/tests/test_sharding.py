@@ -0,0 +1,254 @@
+"""
+Tests of user-hash sharding and online rebalancing, with SQLite shard files.
+"""
+
+import uuid
+from collections import Counter
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, insert, inspect, select
+
+from app.database import migrate, rebalance
+from app.database import session as session_module
+from app.database.session import (
+    AsyncReadSessionLocal,
+    AsyncSessionLocal,
+    SessionLocal,
+    create_async_engines,
+    create_sync_engine,
+    engine,
+    get_db,
+    use_user_shard
+)
+from app.database.sharding import HashRing, IdAllocator, current_shard
+from app.models import Message, MessageArchive, Profile, Session as ChatSession, User
+
+SHARDS = ["0", "1"]
+
+
+@pytest_asyncio.fixture
+async def shards(tmp_path, monkeypatch):
+    """
+    Two migrated SQLite shards, routed to by every session factory.
+    
+    Yields the sync engines of the shards by name.
+    """
+    sync_engines = {name: create_sync_engine(f"sqlite:///{tmp_path}/shard{name}.db") for name in SHARDS}
+    async_engines = {name: create_async_engines(f"sqlite:///{tmp_path}/shard{name}.db") for name in SHARDS}
+    monkeypatch.setattr(migrate, "shard_engines", sync_engines)
+    migrate.run_migrations()
+    
+    ring = HashRing(SHARDS, 64)
+    allocator = IdAllocator(engine, 10)
+    # As at startup, so flushes on the directory do not reserve under its lock
+    allocator.reserve_all()
+    for module in (session_module, rebalance):
+        monkeypatch.setattr(module, "shard_engines", sync_engines)
+        monkeypatch.setattr(module, "shard_ring", ring)
+        monkeypatch.setattr(module, "id_allocator", allocator)
+    monkeypatch.setattr(session_module, "async_shard_engines", async_engines)
+    
+    routed = {
+        name: (writer.sync_engine, reader.sync_engine if reader is not None else None)
+        for name, (writer, reader) in async_engines.items()
+    }
+    for factory in (AsyncSessionLocal, AsyncReadSessionLocal):
+        monkeypatch.setitem(factory.kw, "shards", routed)
+    monkeypatch.setitem(SessionLocal.kw, "shards", {name: (shard, None) for name, shard in sync_engines.items()})
+    
+    yield sync_engines
+    for writer, reader in async_engines.values():
+        await writer.dispose()
+        if reader is not None:
+            await reader.dispose()
+    for shard in sync_engines.values():
+        shard.dispose()
+
+
+def new_user() -> User:
+    """A new user in the directory, without data."""
+    with SessionLocal() as db:
+        name = f"user-{uuid.uuid4().hex[:8]}"
+        user = User(username=name, email=f"{name}@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        db.expunge(user)
+        return user
+
+
+def rows(database, table, *conditions):
+    """IDs of a table's matching rows on a database."""
+    with database.connect() as connection:
+        return set(connection.scalars(select(table.id).where(*conditions)))
+
+
+def test_hash_ring_spreads_users_over_shards():
+    ring = HashRing(["a", "b", "c"], 64)
+    placement = Counter(ring.shard_for(user_id) for user_id in range(3000))
+    
+    assert set(placement) == {"a", "b", "c"}
+    assert min(placement.values()) > 600
+
+
+def test_hash_ring_is_stable_and_moves_few_users_when_growing():
+    ring = HashRing(["a", "b", "c"], 64)
+    assert [ring.shard_for(user_id) for user_id in range(100)] == [
+        HashRing(["a", "b", "c"], 64).shard_for(user_id) for user_id in range(100)
+    ]
+    
+    grown = HashRing(["a", "b", "c", "d"], 64)
+    moved = [user_id for user_id in range(3000) if ring.shard_for(user_id) != grown.shard_for(user_id)]
+    
+    # Only users moving onto the new shard change place
+    assert all(grown.shard_for(user_id) == "d" for user_id in moved)
+    assert len(moved) < 3000 * 0.4
+
+
+def test_id_allocator_hands_out_unique_ids_across_processes():
+    # Two allocators on the same directory, as in two service processes
+    first = IdAllocator(engine, 7)
+    second = IdAllocator(engine, 7)
+    ids = [allocator.next_id("messages") for _ in range(50) for allocator in (first, second)]
+    
+    assert len(set(ids)) == len(ids)
+    with engine.connect() as connection:
+        assert min(ids) > (connection.scalar(select(Message.id).order_by(Message.id.desc()).limit(1)) or 0)
+
+
+@pytest.mark.asyncio
+async def test_id_allocator_prepare_reserves_enough_ids():
+    allocator = IdAllocator(engine, 5)
+    await allocator.prepare({"sessions": 12})
+    
+    assert allocator.available("sessions") >= 12
+
+
+def test_get_bind_routes_sharded_tables_to_current_shard(shards):
+    db = SessionLocal()
+    token = current_shard.set("1")
+    try:
+        assert db.get_bind(inspect(Message)) is shards["1"]
+        assert db.get_bind(inspect(ChatSession)) is shards["1"]
+        # The directory keeps users
+        assert db.get_bind(inspect(User)) is engine
+        
+        # An explicit shard wins over the current user's
+        db.info["shard"] = "0"
+        assert db.get_bind(inspect(Message)) is shards["0"]
+    finally:
+        current_shard.reset(token)
+        db.close()
+
+
+@pytest.mark.asyncio
+async def test_get_db_writes_to_the_users_shard(shards):
+    user = new_user()
+    await use_user_shard(user)
+    shard = user.shard
+    assert shard == session_module.shard_ring.shard_for(user.id)
+    
+    async for db in get_db():
+        profile = Profile(user_id=user.id, name="Default", system_instructions="s", llm_provider="lm_studio")
+        db.add(profile)
+        await db.commit()
+    
+    other = next(name for name in SHARDS if name != shard)
+    assert rows(shards[shard], Profile, Profile.user_id == user.id) == {profile.id}
+    assert rows(shards[other], Profile, Profile.user_id == user.id) == set()
+    assert rows(engine, Profile, Profile.user_id == user.id) == set()
+
+
+def test_rebalance_does_not_resurrect_rows_deleted_during_grace(shards, monkeypatch):
+    # A user whose data is still in the directory, from before sharding
+    user = new_user()
+    with SessionLocal(info={"shard": None}) as db:
+        profile = Profile(user_id=user.id, name="Default", system_instructions="s", llm_provider="lm_studio")
+        db.add(profile)
+        db.flush()
+        kept, deleted = (
+            ChatSession(session_id=str(uuid.uuid4()), user_id=user.id, profile_id=profile.id)
+            for _ in range(2)
+        )
+        db.add_all([kept, deleted])
+        db.flush()
+        messages = [
+            Message(
+                message_id=str(uuid.uuid4()),
+                content=f"message {index}",
+                role="user",
+                user_id=user.id,
+                session_id=session.id,
+                profile_id=profile.id
+            )
+            for session in (kept, deleted)
+            for index in range(3)
+        ]
+        db.add_all(messages)
+        db.commit()
+        kept_id, deleted_id = kept.id, deleted.id
+        archived_id = messages[0].id
+        profile_id = profile.id
+    
+    target = session_module.shard_ring.shard_for(user.id)
+    original_moves = rebalance.get_moves
+    monkeypatch.setattr(rebalance, "get_moves", lambda: [move for move in original_moves() if move[0] == user.id])
+    
+    def during_grace(seconds):
+        with shards[target].begin() as connection:
+            # The user deletes a session on the target
+            connection.execute(delete(Message).where(Message.session_id == deleted_id))
+            connection.execute(delete(ChatSession).where(ChatSession.id == deleted_id))
+            # The target's archiver moves a message into an archive block
+            connection.execute(delete(Message).where(Message.id == archived_id))
+            connection.execute(insert(MessageArchive).values(
+                id=session_module.id_allocator.next_id("message_archives"),
+                session_id=kept_id,
+                first_created_at=datetime.utcnow(),
+                last_created_at=datetime.utcnow(),
+                first_message_id=archived_id,
+                last_message_id=archived_id,
+                message_count=1,
+                raw_size=0,
+                data=b""
+            ))
+        with engine.begin() as connection:
+            # A request that started before the switch writes to the source
+            connection.execute(insert(Message).values(
+                id=session_module.id_allocator.next_id("messages"),
+                message_id=str(uuid.uuid4()),
+                content="late reply",
+                role="assistant",
+                user_id=user.id,
+                session_id=kept_id,
+                profile_id=profile_id,
+                created_at=datetime.utcnow()
+            ))
+            # and to the session deleted on the target meanwhile
+            connection.execute(insert(Message).values(
+                id=session_module.id_allocator.next_id("messages"),
+                message_id=str(uuid.uuid4()),
+                content="orphan reply",
+                role="assistant",
+                user_id=user.id,
+                session_id=deleted_id,
+                profile_id=profile_id,
+                created_at=datetime.utcnow()
+            ))
+    
+    monkeypatch.setattr(rebalance.time, "sleep", during_grace)
+    rebalance.rebalance(dry_run=False, grace=0)
+    
+    with engine.connect() as connection:
+        assert connection.scalar(select(User.shard).where(User.id == user.id)) == target
+    assert rows(shards[target], ChatSession, ChatSession.user_id == user.id) == {kept_id}
+    
+    with shards[target].connect() as connection:
+        contents = set(connection.scalars(select(Message.content).where(Message.user_id == user.id)))
+    assert contents == {"message 1", "message 2", "late reply"}
+    
+    # Source rows are gone
+    assert rows(engine, ChatSession, ChatSession.user_id == user.id) == set()
+    assert rows(engine, Message, Message.user_id == user.id) == set()
@@ -0,0 +1,183 @@
+"""
+Tests of rolling session summaries.
+"""
+
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import update
+
+from app.database.session import AsyncSessionLocal
+from app.models import Message, Profile, Session as ChatSession
+from app.services import llm_service as llm_service_module
+from app.services.summarizer import SessionSummarizer, get_session_summary, is_summarized
+
+START = datetime(2024, 1, 1)
+
+
+class FakeLLMService:
+    """LLM service answering with a numbered summary, recording the prompts."""
+    
+    def __init__(self):
+        self.prompts: List[str] = []
+        self.release = asyncio.Event()
+        self.release.set()
+    
+    async def generate_response(self, messages, profile, session_key=None):
+        self.prompts.append(messages[-1]["content"])
+        await self.release.wait()
+        return SimpleNamespace(content=f" summary {len(self.prompts)} ")
+
+
+@pytest.fixture
+def llm(monkeypatch) -> FakeLLMService:
+    """A fake LLM service used by the summarizer."""
+    llm = FakeLLMService()
+    monkeypatch.setattr(llm_service_module, "get_llm_service", lambda: llm)
+    return llm
+
+
+@pytest.fixture
+def summarizer() -> SessionSummarizer:
+    """A summarizer keeping 4 recent messages, folding 3 to 5 at a time."""
+    return SessionSummarizer(keep_messages=4, min_batch=3, max_batch=5, max_tokens=100)
+
+
+@pytest_asyncio.fixture
+async def summarized_profile(profile: Profile) -> Profile:
+    """The test profile, with summaries enabled."""
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(Profile).where(Profile.id == profile.id).values(summarization_enabled=True))
+        await db.commit()
+    return profile
+
+
+async def add_messages(session: ChatSession, start: int, count: int) -> None:
+    """Add numbered messages to a session, a second apart."""
+    async with AsyncSessionLocal() as db:
+        db.add_all([
+            Message(
+                message_id=str(uuid.uuid4()),
+                content=f"message {index}",
+                role="user" if index % 2 == 0 else "assistant",
+                user_id=session.user_id,
+                session_id=session.id,
+                profile_id=session.profile_id,
+                created_at=START + timedelta(seconds=index)
+            )
+            for index in range(start, start + count)
+        ])
+        await db.commit()
+
+
+async def stored_summary(session: ChatSession):
+    """The committed summary of a session."""
+    async with AsyncSessionLocal() as db:
+        return get_session_summary(await db.get(ChatSession, session.id))
+
+
+@pytest.mark.asyncio
+async def test_update_waits_for_a_full_batch(summarizer, llm, summarized_profile, chat_session):
+    await add_messages(chat_session, 0, 6)
+    
+    # Only 2 messages are outside the recent window
+    assert await summarizer._update(chat_session.id) == "skipped"
+    assert llm.prompts == []
+    assert await stored_summary(chat_session) is None
+
+
+@pytest.mark.asyncio
+async def test_update_folds_older_messages_into_the_summary(summarizer, llm, summarized_profile, chat_session):
+    await add_messages(chat_session, 0, 7)
+    
+    assert await summarizer._update(chat_session.id) == "updated"
+    assert "(none)" in llm.prompts[0]
+    assert "message 2" in llm.prompts[0] and "message 3" not in llm.prompts[0]
+    
+    summary = await stored_summary(chat_session)
+    assert summary["content"] == "summary 1"
+    assert summary["through_created_at"] == (START + timedelta(seconds=2)).isoformat()
+    
+    # The next update starts from the summary
+    await add_messages(chat_session, 7, 3)
+    assert await summarizer._update(chat_session.id) == "updated"
+    assert "summary 1" in llm.prompts[1]
+    assert "message 3" in llm.prompts[1] and "message 5" in llm.prompts[1]
+    assert "message 2" not in llm.prompts[1] and "message 6" not in llm.prompts[1]
+    assert (await stored_summary(chat_session))["content"] == "summary 2"
+
+
+@pytest.mark.asyncio
+async def test_update_keeps_other_metadata(summarizer, llm, summarized_profile, chat_session):
+    await add_messages(chat_session, 0, 7)
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(ChatSession).where(ChatSession.id == chat_session.id).values(
+            session_metadata=json.dumps({"pinned": True})
+        ))
+        await db.commit()
+    
+    await summarizer._update(chat_session.id)
+    
+    async with AsyncSessionLocal() as db:
+        metadata = json.loads((await db.get(ChatSession, chat_session.id)).session_metadata)
+    assert metadata["pinned"] is True
+    assert metadata["summary"]["content"] == "summary 1"
+
+
+@pytest.mark.asyncio
+async def test_update_skips_profiles_without_summaries(summarizer, llm, chat_session):
+    await add_messages(chat_session, 0, 10)
+    
+    assert await summarizer._update(chat_session.id) == "skipped"
+    assert llm.prompts == []
+
+
+@pytest.mark.asyncio
+async def test_schedule_catches_up_on_a_long_backlog(summarizer, llm, summarized_profile, chat_session):
+    await add_messages(chat_session, 0, 16)
+    
+    summarizer.schedule(chat_session.id)
+    # Scheduling during an update does not start another
+    summarizer.schedule(chat_session.id)
+    assert len(summarizer._tasks) == 1
+    await summarizer._tasks[chat_session.id]
+    
+    # 12 messages outside the recent window: 5, then 5, then 2 left below the batch
+    assert len(llm.prompts) == 2
+    summary = await stored_summary(chat_session)
+    assert summary["content"] == "summary 2"
+    assert summary["through_created_at"] == (START + timedelta(seconds=9)).isoformat()
+    assert summarizer._tasks == {}
+
+
+@pytest.mark.asyncio
+async def test_shutdown_cancels_running_updates(summarizer, llm, summarized_profile, chat_session):
+    await add_messages(chat_session, 0, 7)
+    llm.release.clear()
+    
+    summarizer.schedule(chat_session.id)
+    while not llm.prompts:
+        await asyncio.sleep(0.01)
+    await summarizer.shutdown()
+    
+    assert summarizer._tasks == {}
+    assert await stored_summary(chat_session) is None
+
+
+def test_is_summarized_orders_by_time_then_id():
+    summary = {"through_created_at": START.isoformat(), "through_message_id": 10}
+    
+    assert is_summarized(summary, START, 10)
+    assert is_summarized(summary, START - timedelta(seconds=1), 50)
+    assert not is_summarized(summary, START, 11)
+    assert not is_summarized(summary, START + timedelta(seconds=1), 5)
+    
+    # Summaries without a timestamp cover messages by ID
+    assert is_summarized({"through_message_id": 10}, START, 10)
+    assert not is_summarized({"through_message_id": 10}, START, 11)